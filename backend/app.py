@@ -1,17 +1,26 @@
 from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from flask_pymongo import PyMongo
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING
 from datetime import datetime
 import datetime as dt
 import uuid
 import logging
 import json
 import os
+import threading
+import itertools
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 from collections import defaultdict
 import time
-from config import SECRET_KEY, MONGO_URI
+from config import (
+    SECRET_KEY, MONGO_URI,
+    RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL,
+    TITLE_QUEUE_SIZE, FOLLOWUP_CACHE_SIZE, FOLLOWUP_CACHE_TTL, FOLLOWUP_TIMEOUT,
+    SESSION_PREVIEW_CHARS, SESSION_PAGE_MAX, SESSION_COUNT_CACHE_TTL, SEARCH_SNIPPETS_PER_SESSION,
+    SESSION_CACHE_SIZE, SESSION_CACHE_TTL, SESSION_LOCK_TIMEOUT, EXPORT_BATCH_SIZE, EXPORT_MAX_SESSIONS
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,19 +35,24 @@ request_counts = defaultdict(lambda: {"count": 0, "reset_time": time.time()})
 RATE_LIMIT = 20  # requests per minute
 RATE_LIMIT_WINDOW = 60  # seconds
 
+def check_rate_limit(client_ip):
+    """Count a request from ``client_ip``; False once it is over the limit"""
+    current_time = time.time()
+    
+    if current_time - request_counts[client_ip]["reset_time"] > RATE_LIMIT_WINDOW:
+        request_counts[client_ip] = {"count": 0, "reset_time": current_time}
+    
+    if request_counts[client_ip]["count"] >= RATE_LIMIT:
+        return False
+    
+    request_counts[client_ip]["count"] += 1
+    return True
+
 def rate_limit(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        client_ip = request.remote_addr
-        current_time = time.time()
-        
-        if current_time - request_counts[client_ip]["reset_time"] > RATE_LIMIT_WINDOW:
-            request_counts[client_ip] = {"count": 0, "reset_time": current_time}
-        
-        if request_counts[client_ip]["count"] >= RATE_LIMIT:
+        if not check_rate_limit(request.remote_addr):
             return jsonify({"status": "error", "message": "Rate limit exceeded"}), 429
-        
-        request_counts[client_ip]["count"] += 1
         return f(*args, **kwargs)
     return decorated_function
 
@@ -51,10 +65,27 @@ from llm_model import (
     get_retriever_context, 
     add_user_contributions_to_vectorstore, 
     rebuild_vectorstore_with_contributions,
+    adopt_index_build,
     _detect_query_context,
-    get_context_filtered_docs
+    get_context_filtered_docs,
+    get_docs_by_ids
 )
 from user_knowledge import UserKnowledgeManager
+from index_jobs import IndexBuildManager
+from index_writer import abort_index_build
+from metrics import metrics
+from response_cache import SemanticResponseCache
+from title_worker import TitleWorker, placeholder_title
+from followups import FollowupCache, generate_followups, GENERIC_FOLLOWUPS
+from prompt_builder import build_chat_prompt, is_follow_up
+from llm_scheduler import LLMOverloaded
+from llm_resilience import LLMTimeout
+from session_store import SessionStore
+from session_search import SessionSearch
+from session_cache import SessionCache, SessionBusy
+from session_export import (
+    FORMATS, parse_timestamp, session_markdown, session_ndjson, export_query, export_sessions, gzip_stream
+)
 
 # Initialize user knowledge manager
 user_knowledge_manager = None
@@ -62,9 +93,51 @@ user_knowledge_manager = None
 # Initialize LLM model in background thread
 llm_chain = None
 model_status = {"status": "initializing", "message": "Loading model and embeddings..."}
+llm_chain_lock = threading.Lock()
+
+def publish_llm_chain(new_chain):
+    """Atomically swap in a newly built chain unless a newer generation is already live"""
+    global llm_chain
+    with llm_chain_lock:
+        current_generation = llm_chain.get("generation", 0) if llm_chain else 0
+        if new_chain.get("generation", 0) <= current_generation:
+            logging.warning(f"⚠️ Discarding index generation {new_chain.get('generation')} (live: {current_generation})")
+            if new_chain.get("index_writer"):
+                new_chain["index_writer"].close()
+            if new_chain.pop("index_build", None) is not None:
+                abort_index_build()
+            return
+        # Save the new index and replay contributions journaled while it was built
+        try:
+            adopt_index_build(new_chain)
+        except Exception:
+            abort_index_build()
+            raise
+        # Requests already holding the old dict finish on the old generation
+        old_chain, llm_chain = llm_chain, new_chain
+    # The new generation owns the on-disk index; the old writer must not flush over it
+    if old_chain and old_chain.get("index_writer"):
+        old_chain["index_writer"].close()
+    response_cache.invalidate(keep_generation=new_chain.get("generation"))
+    logging.info(f"🔁 Serving index generation {new_chain.get('generation')}")
+
+index_build_manager = IndexBuildManager(on_ready=publish_llm_chain)
+
+# Answers to first-turn questions, reused for near-duplicate queries
+response_cache = SemanticResponseCache(
+    threshold=RESPONSE_CACHE_THRESHOLD,
+    max_entries=RESPONSE_CACHE_SIZE,
+    ttl=RESPONSE_CACHE_TTL
+)
+metrics.register_gauge("response_cache", response_cache.stats)
+
+# Follow-up suggestions, generated speculatively once an answer is complete
+followup_cache = FollowupCache(max_entries=FOLLOWUP_CACHE_SIZE, ttl=FOLLOWUP_CACHE_TTL)
+followup_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="followups")
+metrics.register_gauge("followup_cache", followup_cache.stats)
 
 def init_model_background():
-    global llm_chain, model_status, user_knowledge_manager
+    global model_status, user_knowledge_manager
     try:
         print("🚀 Starting LLM model initialization in background...")
         model_status = {"status": "initializing", "message": "Loading documents and building embeddings..."}
@@ -73,7 +146,7 @@ def init_model_background():
         user_knowledge_manager = UserKnowledgeManager(mongo.db)
         print("✅ User knowledge manager initialized")
         
-        llm_chain = initialize_llm_model(mongo.db)
+        publish_llm_chain(initialize_llm_model(mongo.db, generation=index_build_manager.next_generation()))
         model_status = {"status": "ready", "message": "Model initialized successfully"}
         print("✅ Model initialized successfully!")
     except Exception as e:
@@ -81,13 +154,54 @@ def init_model_background():
         print(f"❌ Model initialization failed: {str(e)}")
 
 # Start initialization in background thread
-import threading
 init_thread = threading.Thread(target=init_model_background, daemon=True)
 init_thread.start()
 print("✅ API server starting... Model initializing in background...")
 
 # Collections
 chat_sessions_collection = mongo.db.chat_sessions
+session_store = SessionStore(chat_sessions_collection, preview_chars=SESSION_PREVIEW_CHARS,
+                             count_ttl=SESSION_COUNT_CACHE_TTL)
+session_search = SessionSearch(chat_sessions_collection, snippets_per_session=SEARCH_SNIPPETS_PER_SESSION)
+
+def load_chat_session(session_id):
+    """Read a session from MongoDB, or None if it doesn't exist"""
+    session_data = chat_sessions_collection.find_one({"session_id": session_id}, {"_id": 0})
+    return session_from_document(session_data) if session_data else None
+
+def session_from_document(session_data):
+    """ChatSession from a stored chat_sessions document"""
+    session = ChatSession(session_data["session_id"])
+    session.messages = session_data.get("messages", [])
+    session.title = session_data.get("title", "New Chat")
+    # Ensure created_at is a datetime object
+    created_at = session_data.get("created_at", datetime.now())
+    if isinstance(created_at, str):
+        session.created_at = dt.datetime.fromisoformat(created_at)
+    else:
+        session.created_at = created_at
+    session.metadata = session_data.get("metadata", {})
+    session.version = session_data.get("version", 0)
+    return session
+
+# Active conversations are served from memory; every write goes through to MongoDB
+session_cache = SessionCache(load_chat_session, max_entries=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL)
+metrics.register_gauge("session_cache", session_cache.stats)
+
+SESSION_BUSY_MESSAGE = "Still answering your previous message, please try again shortly"
+SESSION_CHANGED_MESSAGE = "The conversation changed in the meantime, please try again"
+
+def ensure_session_indexes():
+    """Create the chat session indexes; runs at import so WSGI servers get them too"""
+    try:
+        chat_sessions_collection.create_index([("session_id", ASCENDING)], unique=True)
+        session_store.ensure_indexes()
+        session_search.ensure_index()
+        logging.info("Database indexes created successfully")
+    except Exception as e:
+        logging.warning(f"Index creation warning: {str(e)}")
+
+threading.Thread(target=ensure_session_indexes, daemon=True).start()
 dataset_collection = mongo.db.dataset
 
 class ChatSession:
@@ -98,8 +212,9 @@ class ChatSession:
         self.title = "New Chat"
         self.updated_at = datetime.now()
         self.metadata = {"model": "gemini-2.5-flash", "total_tokens": 0}
+        self.version = 0  # Stored version this copy was read at
 
-    def add_message(self, role, content, message_id=None):
+    def add_message(self, role, content, message_id=None, retrieval=None):
         message = {
             "id": message_id or str(uuid.uuid4()),
             "role": role,
@@ -107,6 +222,9 @@ class ChatSession:
             "timestamp": datetime.now().isoformat(),
             "edited": False
         }
+        if retrieval is not None:
+            # What the answer was generated from, so it can be regenerated without retrieving again
+            message["retrieval"] = retrieval
         self.messages.append(message)
         self.updated_at = datetime.now()
         return message
@@ -153,23 +271,49 @@ def get_chat_session(session_id=None):
     chat_sessions_collection.insert_one(new_session.to_dict())
     return new_session
 
-def save_chat_session(session):
-    chat_sessions_collection.update_one(
-        {'session_id': session.session_id},
-        {'$set': session.to_dict()},
-        upsert=True
-    )
+def lookup_cached_response(chain, user_message, query_context, has_history):
+    """
+    Look up a stored answer: an exact dataset question first, then a semantically
+    equivalent earlier answer. Only first-turn questions are semantically cacheable,
+    since history changes what a good answer is.
+    
+    Returns:
+        (cached_payload or None, query_vector or None)
+    """
+    question_index = chain.get("question_index")
+    exact = question_index.lookup(user_message) if question_index else None
+    if exact:
+        logging.info("⚡ Exact dataset question, answering from the question index")
+        return exact, None
+    if has_history:
+        return None, None
+    try:
+        query_vector = chain["vectorstore"].embeddings.embed_query(user_message)
+    except Exception as e:
+        logging.warning(f"⚠️ Response cache lookup skipped: {e}")
+        return None, None
+    cached = response_cache.lookup(query_vector, query_context, chain.get("generation"))
+    if cached:
+        logging.info(f"⚡ Response cache hit (similarity {cached['similarity']:.3f})")
+    return cached, query_vector
+
+def add_contributions(documents):
+    """Add contributions to the live index; cached answers may now be outdated"""
+    # Never lands on a generation that is being retired, so a publish can't miss it
+    with llm_chain_lock:
+        add_user_contributions_to_vectorstore(llm_chain, documents)
+    response_cache.invalidate()
 
 def generate_creative_title(user_message, bot_response, query_context=None):
     """Generate a creative, contextual title for the chat session using LLM"""
     try:
         if not llm_chain or model_status["status"] != "ready":
-            # Fallback to simple title
-            return user_message[:40] + ("..." if len(user_message) > 40 else "")
+            # Fallback to the placeholder title
+            return placeholder_title(user_message, query_context)
         
         gemini_model = llm_chain.get("gemini_model")
         if not gemini_model:
-            return user_message[:40] + ("..." if len(user_message) > 40 else "")
+            return placeholder_title(user_message, query_context)
         
         # Create prompt for title generation
         context_hint = f" (about {query_context.replace('_', ' ')})" if query_context else ""
@@ -194,7 +338,8 @@ Examples:
 
 Title:"""
 
-        response = gemini_model.generate_content(title_prompt)
+        # Titles are decorative: lowest priority, shed first under load
+        response = gemini_model.generate_content(title_prompt, priority="title")
         title = response.text.strip()
         
         # Clean up the title
@@ -209,8 +354,21 @@ Title:"""
         
     except Exception as e:
         logging.error(f"Error generating title: {str(e)}")
-        # Fallback to simple title
-        return user_message[:40] + ("..." if len(user_message) > 40 else "")
+        # Fallback to the placeholder title
+        return placeholder_title(user_message, query_context)
+
+def apply_generated_title(session_id, placeholder, title):
+    """Replace a session's placeholder title unless the user renamed it meanwhile"""
+    result = chat_sessions_collection.update_one(
+        {"session_id": session_id, "title": placeholder},
+        {"$set": {"title": title}, "$inc": {"version": 1}}
+    )
+    if result.modified_count:
+        session_cache.invalidate(session_id)
+        logging.info(f"💡 Session {session_id} titled '{title}'")
+
+# Creative titles are generated after the first response has been sent
+title_worker = TitleWorker(generate_creative_title, apply_generated_title, max_pending=TITLE_QUEUE_SIZE)
 
 # API Routes
 @app.route('/')
@@ -233,15 +391,204 @@ def health_check():
         'model_status': model_status["status"],
         'model_message': model_status["message"],
         'initialized': llm_chain is not None,
+        'index_generation': llm_chain.get('generation') if llm_chain else None,
         'dataset_count': dataset_collection.count_documents({})
     })
 
+@app.route('/api/metrics')
+def get_metrics():
+    """In-process performance counters, latency summaries and cache statistics"""
+    return jsonify({"status": "success", "metrics": metrics.snapshot()})
+
+def turn_retrieval(chat_prompt, query_context, generation):
+    """Retrieval record persisted on an assistant message: chunk ids in prompt order, topic and index generation"""
+    return {
+        "chunk_ids": [doc.metadata["chunk_id"] for doc in chat_prompt.docs if "chunk_id" in doc.metadata] if chat_prompt else [],
+        "query_context": query_context,
+        "index_generation": generation
+    }
+
+def turn_fields(session, is_first_message):
+    """Session fields a chat turn changes besides its messages"""
+    fields = {"metadata.last_sources": session.metadata.get('last_sources', [])}
+    if is_first_message:
+        fields["title"] = session.title
+    return fields
+
+def iter_response_text(response_chunks):
+    """Non-empty text of streamed LLM chunks"""
+    for response_chunk in response_chunks:
+        try:
+            chunk_text = response_chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. a bare finish reason)
+            continue
+        if chunk_text:
+            yield chunk_text
+
+def start_stream(chunk_texts):
+    """
+    Wait for the first chunk before the SSE response is returned, so a saturated or
+    failing LLM is answered with a real status code instead of an error event in a 200
+    """
+    chunk_texts = iter(chunk_texts)
+    for first_chunk in chunk_texts:
+        return itertools.chain([first_chunk], chunk_texts)
+    return iter(())
+
+def forget_unsaved_turn(session_id):
+    """Drop a cached session whose in-memory turn failed before it was saved"""
+    if session_id:
+        session_cache.invalidate(session_id)
+
+def recent_history(session):
+    """The turns before the current user message, as quoted conversation (empty on a first turn)"""
+    conversation_context = session.get_context(max_messages=6)  # Last 3 exchanges
+    return "\n".join([
+        f"{m['role'].capitalize()}: {m['content']}" 
+        for m in conversation_context[:-1]  # Exclude current message
+    ]) if len(conversation_context) > 1 else ""
+
+def prepare_turn(chain, session, user_message, has_history):
+    """
+    Retrieval and prompt for the turn whose user message was just added to the session.
+    Embedding and index lookups block, so the async server runs this on an executor.
+    
+    Returns:
+        dict with query_context, cached (payload or None), query_vector, source_docs
+        and chat_prompt (None for a cached answer)
+    """
+    # Detect if this is a follow-up question (uses pronouns or incomplete context)
+    follow_up = is_follow_up(user_message)
+    
+    # Detect query context for focused retrieval
+    conversation_text = [msg['content'] for msg in session.messages[-3:]]
+    query_context = _detect_query_context(user_message, conversation_text)
+    
+    # Quote recent conversation if this seems like a follow-up
+    recent_messages = session.messages[-4:] if follow_up and len(session.messages) > 1 else []  # Last 2 Q&A pairs
+    
+    # Reuse an earlier answer to the same first-turn question if we have one
+    cached, query_vector = lookup_cached_response(chain, user_message, query_context, has_history)
+    
+    # Get context-aware relevant documents (not needed for a cached answer)
+    source_docs = [] if cached else get_context_filtered_docs(chain, user_message, query_context, k=5)
+    
+    if query_context:
+        logging.info(f"🎯 Context-aware query detected: {query_context}")
+    
+    # Debug: Log retrieved context
+    logging.info(f"📚 Retrieved {len(source_docs)} documents for query: {user_message} (follow_up: {follow_up}, context: {query_context or 'general'})")
+    for i, doc in enumerate(source_docs[:3]):
+        logging.info(f"  Doc {i+1} preview: {doc.page_content[:150]}...")
+    
+    return {
+        "query_context": query_context,
+        "cached": cached,
+        "query_vector": query_vector,
+        "source_docs": source_docs,
+        # Token-budgeted prompt; the persona goes in the model's system instruction
+        "chat_prompt": None if cached else build_chat_prompt(user_message, source_docs, query_context, recent_messages)
+    }
+
+def complete_turn(chain, session, user_message, turn, response_text, source_names=False):
+    """
+    Record the answer on the session: response cache, assistant message, sources
+    and placeholder title. The caller persists ``session.messages[-2:]``.
+    
+    Args:
+        source_names: Store only source names in last_sources, as streamed answers always have
+    
+    Returns:
+        Whether this was the session's first exchange
+    """
+    cached = turn["cached"]
+    chat_prompt = turn["chat_prompt"]
+    if cached:
+        sources = cached["sources"]
+    else:
+        sources = [
+            {
+                'source': doc.metadata.get('source', 'unknown'),
+                'category': doc.metadata.get('category', 'general')
+            }
+            for doc in chat_prompt.docs[:3]
+        ]
+        if turn["query_vector"] is not None:
+            response_cache.store(turn["query_vector"], turn["query_context"], chain.get("generation"),
+                                 {"response": response_text, "sources": sources})
+    
+    session.add_message("assistant", response_text,
+                        retrieval=turn_retrieval(chat_prompt, turn["query_context"], chain.get("generation")))
+    session.metadata['last_sources'] = [source['source'] for source in sources] if source_names else sources
+    
+    # Placeholder title now; the creative one is generated in the background
+    is_first_message = len(session.messages) == 2  # User + assistant
+    if is_first_message:
+        session.title = placeholder_title(user_message, turn["query_context"])
+    return is_first_message
+
+def record_user_contribution(chain, session, user_message, bot_response):
+    """
+    Detect if user provided new information (corrections NOT allowed) and add it to the knowledge base
+    
+    Returns:
+        Whether new information was detected and accepted
+    """
+    detected_info = False
+    detection_type = None
+    if user_knowledge_manager and chain:
+        detected_info, detection_type = user_knowledge_manager.detect_new_information(user_message)
+        
+        if detected_info:
+            # Auto-approve and immediately add to vector store (only NEW information)
+            contribution_id = user_knowledge_manager.store_user_contribution(
+                content=user_message,
+                session_id=session.session_id,
+                user_question=None,
+                assistant_response=bot_response,
+                detection_type=detection_type,
+                category="general",
+                auto_approve=True  # Auto-approve since corrections are blocked
+            )
+            
+            if contribution_id:
+                logging.info(f"📝 Detected NEW info: auto-approved and adding to knowledge base")
+                
+                # Immediately add to vector store
+                try:
+                    from langchain_core.documents import Document
+                    
+                    user_doc = Document(
+                        page_content=user_message,
+                        metadata={
+                            "source": "user_contribution",
+                            "category": "general",
+                            "session_id": session.session_id
+                        }
+                    )
+                    # Writes go to the live generation, not the one this request pinned
+                    add_contributions([user_doc])
+                    logging.info(f"✅ NEW info immediately available for retrieval")
+                except Exception as e:
+                    logging.error(f"❌ Error adding to vector store: {e}")
+            else:
+                logging.info(f"⛔ Rejected: conflicts with existing data")
+                detected_info = False  # Update flag since it was rejected
+    return detected_info
+
 @app.route('/api/chat', methods=['POST'])
 @rate_limit
 def chat():
+    session_id = None
+    session_lock = None
+    stream_owns_lock = False
     try:
+        # Pin the current index generation for the whole request
+        chain = llm_chain
+        
         # Check if model is ready
-        if not llm_chain:
+        if not chain:
             return jsonify({
                 "status": "error", 
                 "message": f"Model is not ready yet. Status: {model_status['status']} - {model_status['message']}"
@@ -255,260 +602,108 @@ def chat():
         if not user_message:
             return jsonify({"status": "error", "message": "Message cannot be empty"}), 400
 
-        # Get or create session
+        # Get or create session; turns in one session run one at a time
+        session = None
         if session_id:
-            session_data = chat_sessions_collection.find_one({"session_id": session_id})
-            if session_data:
-                session = ChatSession(session_id)
-                session.messages = session_data.get("messages", [])
-                session.title = session_data.get("title", "New Chat")
-                # Ensure created_at is a datetime object
-                created_at = session_data.get("created_at", datetime.now())
-                if isinstance(created_at, str):
-                    session.created_at = dt.datetime.fromisoformat(created_at)
-                else:
-                    session.created_at = created_at
-                session.metadata = session_data.get("metadata", {})
-            else:
-                session = ChatSession()
-        else:
+            session_lock = session_cache.lock(session_id, timeout=SESSION_LOCK_TIMEOUT)
+            session = session_cache.get(session_id)
+        if session is None:
             session = ChatSession()
 
         # Add user message
         user_msg = session.add_message("user", user_message)
 
         # Get conversation history context (for multi-turn conversations)
-        conversation_context = session.get_context(max_messages=6)  # Last 3 exchanges
-        conversation_history = "\n".join([
-            f"{m['role'].capitalize()}: {m['content']}" 
-            for m in conversation_context[:-1]  # Exclude current message
-        ]) if len(conversation_context) > 1 else ""
-
-        # Build query with conversation context
-        if conversation_history:
-            full_query = f"Previous conversation:\n{conversation_history}\n\nCurrent question: {user_message}"
-        else:
-            full_query = user_message
+        conversation_history = recent_history(session)
 
         if stream:
+            stream_started = time.perf_counter()
+            # Use Gemini client
+            gemini_model = chain["gemini_model"]
+            turn = prepare_turn(chain, session, user_message, bool(conversation_history))
+            chat_prompt = turn["chat_prompt"]
+            query_context = turn["query_context"]
+            if not turn["cached"]:
+                chunk_texts = start_stream(iter_response_text(gemini_model.generate_content(
+                    chat_prompt.text, stream=True, system_instruction=chat_prompt.system_instruction)))
+
             def generate():
+                first_chunk_sent = False
                 try:
-                    # Use Gemini client
-                    gemini_model = llm_chain["gemini_model"]
-                    retriever = llm_chain["retriever"]
-                    
-                    # Detect if this is a follow-up question
-                    follow_up_indicators = ['he', 'his', 'him', 'that', 'those', 'them', 'this', 'these', 'it', 'also', 'more', 'tell me more', 'what about', 'and']
-                    is_follow_up = any(word in user_message.lower().split()[:5] for word in follow_up_indicators)
-                    
-                    # Detect query context for focused retrieval
-                    conversation_text = [msg['content'] for msg in session.messages[-3:]]
-                    query_context = _detect_query_context(user_message, conversation_text)
-                    
-                    # Build conversation context if this seems like a follow-up
-                    conv_context = ""
-                    if is_follow_up and len(session.messages) > 1:
-                        recent_messages = session.messages[-4:]  # Last 2 Q&A pairs
-                        conv_context = "\n\nRecent Conversation (for context):\n"
-                        for msg in recent_messages:
-                            role = "User" if msg["role"] == "user" else "Pasupathy"
-                            conv_context += f"{role}: {msg['content'][:200]}...\n"
-                        conv_context += "\n"
-                    
-                    # Get context-aware relevant documents
-                    source_docs = get_context_filtered_docs(retriever, user_message, query_context, k=5)
-                    
-                    if query_context:
-                        logging.info(f"🎯 Context-aware query detected: {query_context}")
-                    context = "\n\n".join([f"Context {i+1}:\n{doc.page_content}" 
-                                          for i, doc in enumerate(source_docs)])
-                    
-                    # Create context-aware prompt for Gemini
-                    context_instruction = f"\n\n**IMPORTANT**: This question is specifically about Arvind's {query_context.replace('_', ' ')} work. ONLY provide information related to {query_context.replace('_', ' ')}. Do NOT mention unrelated projects, skills, or achievements unless explicitly asked." if query_context else ""
-                    
-                    prompt = f"""You are Pasupathy, Arvind's personal AI assistant. You know Arvind personally and answer questions about him naturally.
-
-Instructions:
-1. Answer as if you simply know about Arvind - never mention "documents," "context," or "information provided"
-2. STAY FOCUSED on the current topic - don't list unrelated achievements or switch topics
-3. Use your creativity and reasoning to answer questions even when you're not completely certain
-4. Make educated inferences from what you know about Arvind
-5. When you're uncertain, use phrases like "As far as I know..." or "From what I understand..."
-6. If recent conversation is provided, use it to understand pronouns and references
-7. Provide detailed, thoughtful answers as a personal assistant would
-8. Be conversational and helpful
-9. NEVER say "I don't have information" or reveal your information sources{context_instruction}
-{conv_context}
-Context from Dataset:
-{context}
-
-Question: {user_message}
-
-Take your time to provide a thorough answer:"""
-                    
-                    # Call Gemini
-                    response = gemini_model.generate_content(prompt)
-                    response_text = response.text
+                    if turn["cached"]:
+                        response_text = turn["cached"]["response"]
+                        metrics.observe("chat_ttft_ms", (time.perf_counter() - stream_started) * 1000)
+                        first_chunk_sent = True
+                        yield f"data: {json.dumps({'content': response_text})}\n\n"
+                    else:
+                        # Forward Gemini's chunks as they arrive, keeping the text verbatim
+                        response_parts = []
+                        for chunk_text in chunk_texts:
+                            if not first_chunk_sent:
+                                metrics.observe("chat_ttft_ms", (time.perf_counter() - stream_started) * 1000)
+                                first_chunk_sent = True
+                            response_parts.append(chunk_text)
+                            yield f"data: {json.dumps({'content': chunk_text})}\n\n"
+                        response_text = "".join(response_parts)
+                        metrics.observe("chat_generation_ms", (time.perf_counter() - stream_started) * 1000)
                     
-                    # Stream the response word by word for better UX
-                    words = response_text.split()
-                    for i, word in enumerate(words):
-                        chunk = word + (" " if i < len(words) - 1 else "")
-                        yield f"data: {json.dumps({'content': chunk})}\n\n"
+                    # Start follow-up suggestions while the session is being saved
+                    followups_future = followup_executor.submit(
+                        generate_followups, gemini_model, user_message, response_text, query_context, followup_cache
+                    )
                     
                     # Save complete response with metadata
-                    session.add_message("assistant", response_text)
-                    session.metadata['last_sources'] = [
-                        doc.metadata.get('source', 'unknown') 
-                        for doc in source_docs[:3]
-                    ]
-                    
-                    # Generate creative title for first message
-                    is_first_message = len(session.messages) == 2  # User + assistant
-                    if is_first_message:
-                        session.title = generate_creative_title(user_message, response_text, query_context)
-                    
-                    chat_sessions_collection.update_one(
-                        {"session_id": session.session_id},
-                        {"$set": session.to_dict()},
-                        upsert=True
+                    is_first_message = complete_turn(chain, session, user_message, turn, response_text, source_names=True)
+                    session_cache.store(session, session_store.append_messages(
+                        session, session.messages[-2:], turn_fields(session, is_first_message)))
+                    title_pending = is_first_message and title_worker.submit(
+                        session.session_id, session.title, user_message, response_text, query_context
                     )
-                    yield f"data: {json.dumps({'done': True, 'session_id': session.session_id})}\n\n"
+                    yield f"data: {json.dumps({'done': True, 'session_id': session.session_id, 'title': session.title, 'title_pending': title_pending, 'query_context': query_context, 'index_generation': chain.get('generation'), 'cached': bool(turn['cached'])})}\n\n"
+                    
+                    # Follow-up suggestions close the stream
+                    try:
+                        followups = followups_future.result(timeout=FOLLOWUP_TIMEOUT)
+                    except Exception as e:
+                        logging.error(f"Follow-up generation error: {str(e)}")
+                        followups = GENERIC_FOLLOWUPS
+                    yield f"data: {json.dumps({'followups': followups})}\n\n"
                 except Exception as e:
+                    forget_unsaved_turn(session_id)
                     logging.error(f"Stream error: {str(e)}")
                     yield f"data: {json.dumps({'error': str(e)})}\n\n"
 
-            return Response(stream_with_context(generate()), mimetype='text/event-stream')
+            response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+            if session_lock:
+                # Held until the whole answer has been streamed and saved
+                response.call_on_close(session_lock.release)
+                stream_owns_lock = True
+            return response
         else:
             # Use Gemini client
-            gemini_model = llm_chain["gemini_model"]
-            retriever = llm_chain["retriever"]
-            
-            # Detect if this is a follow-up question (uses pronouns or incomplete context)
-            follow_up_indicators = ['he', 'his', 'him', 'that', 'those', 'them', 'this', 'these', 'it', 'also', 'more', 'tell me more', 'what about', 'and']
-            is_follow_up = any(word in user_message.lower().split()[:5] for word in follow_up_indicators)  # Check first 5 words
-            
-            # Detect query context for focused retrieval
-            conversation_text = [msg['content'] for msg in session.messages[-3:]]
-            query_context = _detect_query_context(user_message, conversation_text)
+            gemini_model = chain["gemini_model"]
+            turn = prepare_turn(chain, session, user_message, bool(conversation_history))
+            chat_prompt = turn["chat_prompt"]
             
-            # Build conversation context if this seems like a follow-up
-            conv_context = ""
-            if is_follow_up and len(session.messages) > 1:
-                recent_messages = session.messages[-4:]  # Last 2 Q&A pairs
-                conv_context = "\n\nRecent Conversation (for context):\n"
-                for msg in recent_messages:
-                    role = "User" if msg["role"] == "user" else "Pasupathy"
-                    conv_context += f"{role}: {msg['content'][:200]}...\n"
-                conv_context += "\n"
-            
-            # Get context-aware relevant documents
-            source_docs = get_context_filtered_docs(retriever, user_message, query_context, k=5)
-            
-            if query_context:
-                logging.info(f"🎯 Context-aware query detected: {query_context}")
-            
-            # Debug: Log retrieved context
-            logging.info(f"📚 Retrieved {len(source_docs)} documents for query: {user_message} (follow_up: {is_follow_up}, context: {query_context or 'general'})")
-            for i, doc in enumerate(source_docs[:3]):
-                logging.info(f"  Doc {i+1} preview: {doc.page_content[:150]}...")
-            
-            context = "\n\n".join([f"Context {i+1}:\n{doc.page_content}" 
-                                  for i, doc in enumerate(source_docs)])
-            
-            # Create context-aware prompt for Gemini
-            context_instruction = f"\n\n**IMPORTANT**: This question is specifically about Arvind's {query_context.replace('_', ' ')} work. ONLY provide information related to {query_context.replace('_', ' ')}. Do NOT mention unrelated projects, skills, or achievements unless explicitly asked." if query_context else ""
-            
-            prompt = f"""You are Pasupathy, Arvind's personal AI assistant. You know Arvind personally and answer questions about him naturally.
-
-Instructions:
-1. Answer as if you simply know about Arvind - never mention "documents," "context," or "information provided"
-2. STAY FOCUSED on the current topic - don't list unrelated achievements or switch topics
-3. Use your creativity and reasoning to answer questions even when you're not completely certain
-4. Make educated inferences from what you know about Arvind
-5. When you're uncertain, use phrases like "As far as I know..." or "From what I understand..."
-6. If recent conversation is provided, use it to understand pronouns and references
-7. Synthesize information naturally when relevant
-8. Provide detailed, thoughtful answers as a personal assistant would
-9. Be conversational and helpful
-10. NEVER say "I don't have information" or reveal your information sources{context_instruction}
-{conv_context}
-Context from Dataset:
-{context}
-
-Question: {user_message}
-
-Take your time to provide a thorough answer:"""
-            
-            # Call Gemini
-            response = gemini_model.generate_content(prompt)
-            bot_response = response.text
-            
-            # Add assistant message
-            session.add_message("assistant", bot_response)
-            
-            # Store sources in metadata
-            session.metadata['last_sources'] = [
-                {
-                    'source': doc.metadata.get('source', 'unknown'),
-                    'category': doc.metadata.get('category', 'general')
-                }
-                for doc in source_docs[:3]
-            ]
+            if turn["cached"]:
+                bot_response = turn["cached"]["response"]
+            else:
+                # Call Gemini
+                response = gemini_model.generate_content(chat_prompt.text, system_instruction=chat_prompt.system_instruction)
+                bot_response = response.text
             
-            # Generate creative title for first message
-            is_first_message = len(session.messages) == 2  # User + assistant
-            if is_first_message:
-                session.title = generate_creative_title(user_message, bot_response, query_context)
-
-            # Save to database
-            chat_sessions_collection.update_one(
-                {"session_id": session.session_id},
-                {"$set": session.to_dict()},
-                upsert=True
+            # Add assistant message, sources and placeholder title
+            is_first_message = complete_turn(chain, session, user_message, turn, bot_response)
+
+            # Save to database: only this turn's messages are written
+            session_cache.store(session, session_store.append_messages(
+                session, session.messages[-2:], turn_fields(session, is_first_message)))
+            title_pending = is_first_message and title_worker.submit(
+                session.session_id, session.title, user_message, bot_response, turn["query_context"]
             )
             
-            # Detect if user provided new information (corrections NOT allowed)
-            detected_info = False
-            detection_type = None
-            if user_knowledge_manager and llm_chain:
-                detected_info, detection_type = user_knowledge_manager.detect_new_information(user_message)
-                
-                if detected_info:
-                    # Auto-approve and immediately add to vector store (only NEW information)
-                    contribution_id = user_knowledge_manager.store_user_contribution(
-                        content=user_message,
-                        session_id=session.session_id,
-                        user_question=None,
-                        assistant_response=bot_response,
-                        detection_type=detection_type,
-                        category="general",
-                        auto_approve=True  # Auto-approve since corrections are blocked
-                    )
-                    
-                    if contribution_id:
-                        logging.info(f"📝 Detected NEW info: auto-approved and adding to knowledge base")
-                        
-                        # Immediately add to vector store
-                        try:
-                            from llm_model import add_user_contributions_to_vectorstore
-                            from langchain_core.documents import Document
-                            
-                            user_doc = Document(
-                                page_content=user_message,
-                                metadata={
-                                    "source": "user_contribution",
-                                    "category": "general",
-                                    "session_id": session.session_id
-                                }
-                            )
-                            add_user_contributions_to_vectorstore(llm_chain, [user_doc])
-                            logging.info(f"✅ NEW info immediately available for retrieval")
-                        except Exception as e:
-                            logging.error(f"❌ Error adding to vector store: {e}")
-                    else:
-                        logging.info(f"⛔ Rejected: conflicts with existing data")
-                        detected_info = False  # Update flag since it was rejected
+            detected_info = record_user_contribution(chain, session, user_message, bot_response)
 
             return jsonify({
                 "status": "success",
@@ -517,15 +712,33 @@ Take your time to provide a thorough answer:"""
                 "message_id": session.messages[-1]["id"],
                 "sources": session.metadata.get('last_sources', []),
                 "session": session.to_dict(),
+                "title_pending": title_pending,
                 "new_info_detected": detected_info,
-                "query_context": query_context  # Include context for frontend
+                "query_context": turn["query_context"],  # Include context for frontend
+                "index_generation": chain.get("generation"),
+                "cached": bool(turn["cached"])
             })
 
+    except LLMOverloaded as e:
+        forget_unsaved_turn(session_id)
+        logging.warning(f"⚠️ Chat rejected, LLM saturated: {str(e)}")
+        return jsonify({"status": "error", "message": "The assistant is busy right now, please try again shortly"}), 503
+    except LLMTimeout as e:
+        forget_unsaved_turn(session_id)
+        logging.warning(f"⚠️ Chat timed out: {str(e)}")
+        return jsonify({"status": "error", "message": "The assistant took too long to answer, please try again"}), 504
+    except SessionBusy as e:
+        logging.warning(f"⚠️ Chat rejected: {str(e)}")
+        return jsonify({"status": "error", "message": SESSION_BUSY_MESSAGE}), 409
     except Exception as e:
+        forget_unsaved_turn(session_id)
         logging.error(f"Chat error: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        if session_lock and not stream_owns_lock:
+            session_lock.release()
 
 @app.route('/api/chat/followup', methods=['POST'])
 def generate_followup_questions():
@@ -542,77 +755,21 @@ def generate_followup_questions():
         if model_status["status"] != "ready" or not llm_chain:
             return jsonify({
                 "status": "success",
-                "questions": [
-                    "Tell me more about that",
-                    "What else should I know?",
-                    "Can you elaborate?"
-                ]
+                "questions": GENERIC_FOLLOWUPS
             })
         
         gemini_model = llm_chain.get("gemini_model")
         if not gemini_model:
             return jsonify({
                 "status": "success",
-                "questions": [
-                    "Tell me more about that",
-                    "What else should I know?",
-                    "Can you elaborate?"
-                ]
+                "questions": GENERIC_FOLLOWUPS
             })
         
-        # Create context-aware prompt for follow-up generation
-        context_hint = f" (in the context of {query_context.replace('_', ' ')})" if query_context else ""
-        
-        followup_prompt = f"""Based on this conversation about Arvind{context_hint}, generate 3 specific, contextual follow-up questions that the user might want to ask next.
-
-User Question: {user_message[:300]}
-Pasupathy's Response: {bot_response[:500]}
-
-Requirements:
-- Each question should be 5-10 words
-- Questions should dig deeper into the current topic
-- Stay focused on the context (e.g., if about computer vision, ask about CV details)
-- Make questions natural and conversational
-- Avoid generic questions like "tell me more"
-
-Examples of good follow-up questions:
-- For education: "What was your major GPA?" or "Which courses did you excel in?"
-- For computer vision: "What datasets did you use?" or "How accurate was your model?"
-- For projects: "What technologies did you use?" or "What challenges did you face?"
-
-Generate 3 follow-up questions, one per line:"""
-
-        response = gemini_model.generate_content(followup_prompt)
-        questions_text = response.text.strip()
-        
-        # Parse questions (split by newline and clean)
-        questions = []
-        for line in questions_text.split('\n'):
-            # Remove numbering, bullets, dashes
-            cleaned = line.strip()
-            for prefix in ['1.', '2.', '3.', '-', '•', '*']:
-                if cleaned.startswith(prefix):
-                    cleaned = cleaned[len(prefix):].strip()
-            
-            if cleaned and len(cleaned) > 10:  # Must be substantial
-                questions.append(cleaned)
-                if len(questions) == 3:
-                    break
-        
-        # Fallback if not enough questions generated
-        if len(questions) < 3:
-            fallback = [
-                "Can you provide more details?",
-                "What else should I know about this?",
-                "How does this relate to other aspects?"
-            ]
-            questions.extend(fallback[:3 - len(questions)])
-        
-        logging.info(f"💡 Generated follow-up questions: {questions}")
+        questions = generate_followups(gemini_model, user_message, bot_response, query_context, cache=followup_cache)
         
         return jsonify({
             "status": "success",
-            "questions": questions[:3]
+            "questions": questions
         })
         
     except Exception as e:
@@ -620,11 +777,7 @@ Generate 3 follow-up questions, one per line:"""
         # Return generic fallback on error
         return jsonify({
             "status": "success",
-            "questions": [
-                "Tell me more about that",
-                "What else should I know?",
-                "Can you elaborate?"
-            ]
+            "questions": GENERIC_FOLLOWUPS
         })
 
     except Exception as e:
@@ -634,26 +787,42 @@ Generate 3 follow-up questions, one per line:"""
 @app.route('/api/chat/regenerate', methods=['POST'])
 @rate_limit
 def regenerate_response():
-    """Regenerate the last assistant response"""
+    """
+    Regenerate the last assistant response from the same retrieved context
+
+    The chunks recorded on the replaced answer are read back from the docstore, so a
+    regenerate costs one LLM call and no retrieval. Turns without a usable record
+    (cached answers, older sessions, chunks gone after a rebuild) retrieve again.
+    """
+    session_id = None
+    session_lock = None
+    stream_owns_lock = False
     try:
+        # Pin the current index generation for the whole request
+        chain = llm_chain
+        if not chain:
+            return jsonify({
+                "status": "error",
+                "message": f"Model is not ready yet. Status: {model_status['status']} - {model_status['message']}"
+            }), 503
+
         data = request.json
         session_id = data.get('session_id')
+        stream = data.get('stream', False)
         
         if not session_id:
             return jsonify({"status": "error", "message": "Session ID required"}), 400
 
-        session_data = chat_sessions_collection.find_one({"session_id": session_id})
-        if not session_data:
+        session_lock = session_cache.lock(session_id, timeout=SESSION_LOCK_TIMEOUT)
+        session = session_cache.get(session_id)
+        if session is None:
             return jsonify({"status": "error", "message": "Session not found"}), 404
 
-        session = ChatSession(session_id)
-        session.messages = session_data.get("messages", [])
-        session.title = session_data.get("title", "New Chat")
-        session.metadata = session_data.get("metadata", {})
-
-        # Remove last assistant message if exists
+        # Remove last assistant message if exists, keeping its retrieval record
+        replaced = None
         if session.messages and session.messages[-1]["role"] == "assistant":
-            session.messages.pop()
+            replaced = session.messages.pop()
+        retrieval = (replaced or {}).get("retrieval") or {}
 
         # Get last user message
         if not session.messages or session.messages[-1]["role"] != "user":
@@ -661,41 +830,105 @@ def regenerate_response():
 
         user_message = session.messages[-1]["content"]
         
-        # Get conversation context
-        conversation_context = session.get_context(max_messages=6)
-        conversation_history = "\n".join([
-            f"{m['role'].capitalize()}: {m['content']}" 
-            for m in conversation_context[:-1]
-        ]) if len(conversation_context) > 1 else ""
-        
-        full_query = f"Previous conversation:\n{conversation_history}\n\nCurrent question: {user_message}" if conversation_history else user_message
-
-        # Use RAG chain
-        bot_response = llm_chain["chain"].invoke(full_query)
-        source_docs = llm_chain["retriever"].get_relevant_documents(full_query)
+        if "query_context" in retrieval:
+            query_context = retrieval["query_context"]
+        else:
+            conversation_text = [msg['content'] for msg in session.messages[-3:]]
+            query_context = _detect_query_context(user_message, conversation_text)
         
-        session.add_message("assistant", bot_response)
-        session.metadata['last_sources'] = [
-            doc.metadata.get('source', 'unknown') 
-            for doc in source_docs[:3]
+        # Rehydrate the original context; retrieve again only if it can't be
+        source_docs = get_docs_by_ids(chain, retrieval.get("chunk_ids"))
+        if source_docs is not None:
+            metrics.increment("regenerate.rehydrated")
+            generation = retrieval.get("index_generation")
+        else:
+            metrics.increment("regenerate.retrieved")
+            source_docs = get_context_filtered_docs(chain, user_message, query_context, k=5)
+            generation = chain.get("generation")
+        
+        follow_up = is_follow_up(user_message)
+        recent_messages = session.messages[-4:] if follow_up and len(session.messages) > 1 else []  # Last 2 Q&A pairs
+        chat_prompt = build_chat_prompt(user_message, source_docs, query_context, recent_messages)
+        gemini_model = chain["gemini_model"]
+        last_sources = [
+            {
+                'source': doc.metadata.get('source', 'unknown'),
+                'category': doc.metadata.get('category', 'general')
+            }
+            for doc in chat_prompt.docs[:3]
         ]
-        
-        chat_sessions_collection.update_one(
-            {"session_id": session.session_id},
-            {"$set": session.to_dict()},
-            upsert=True
-        )
+
+        def save(bot_response):
+            """Write the new answer in place of the old one; None if the session moved on meanwhile"""
+            message = session.add_message("assistant", bot_response,
+                                          retrieval=turn_retrieval(chat_prompt, query_context, generation))
+            session.metadata['last_sources'] = last_sources
+            fields = {"metadata.last_sources": last_sources}
+            if replaced is None:
+                version = session_store.append_messages(session, [message], fields)
+            else:
+                version = session_store.replace_last_message(session.session_id, len(session.messages) - 1,
+                                                             replaced["id"], message, fields)
+            session_cache.store(session, version)
+            return message if version is not None else None
+
+        if stream:
+            chunk_texts = start_stream(iter_response_text(gemini_model.generate_content(
+                chat_prompt.text, stream=True, system_instruction=chat_prompt.system_instruction)))
+
+            def generate():
+                try:
+                    response_parts = []
+                    for chunk_text in chunk_texts:
+                        response_parts.append(chunk_text)
+                        yield f"data: {json.dumps({'content': chunk_text})}\n\n"
+                    message = save("".join(response_parts))
+                    if message is None:
+                        yield f"data: {json.dumps({'error': SESSION_CHANGED_MESSAGE})}\n\n"
+                        return
+                    yield f"data: {json.dumps({'done': True, 'session_id': session.session_id, 'message_id': message['id'], 'sources': last_sources, 'query_context': query_context})}\n\n"
+                except Exception as e:
+                    forget_unsaved_turn(session_id)
+                    logging.error(f"Regenerate stream error: {str(e)}")
+                    yield f"data: {json.dumps({'error': str(e)})}\n\n"
+
+            response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+            response.call_on_close(session_lock.release)
+            stream_owns_lock = True
+            return response
+
+        response = gemini_model.generate_content(chat_prompt.text, system_instruction=chat_prompt.system_instruction)
+        message = save(response.text)
+        if message is None:
+            return jsonify({"status": "error", "message": SESSION_CHANGED_MESSAGE}), 409
 
         return jsonify({
             "status": "success",
-            "response": bot_response,
-            "sources": session.metadata.get('last_sources', []),
+            "response": response.text,
+            "message_id": message["id"],
+            "sources": last_sources,
             "session": session.to_dict()
         })
 
+    except LLMOverloaded as e:
+        forget_unsaved_turn(session_id)
+        logging.warning(f"⚠️ Regenerate rejected, LLM saturated: {str(e)}")
+        return jsonify({"status": "error", "message": "The assistant is busy right now, please try again shortly"}), 503
+    except LLMTimeout as e:
+        forget_unsaved_turn(session_id)
+        logging.warning(f"⚠️ Regenerate timed out: {str(e)}")
+        return jsonify({"status": "error", "message": "The assistant took too long to answer, please try again"}), 504
+    except SessionBusy as e:
+        logging.warning(f"⚠️ Regenerate rejected: {str(e)}")
+        return jsonify({"status": "error", "message": SESSION_BUSY_MESSAGE}), 409
     except Exception as e:
+        forget_unsaved_turn(session_id)
         logging.error(f"Regenerate error: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        if session_lock and not stream_owns_lock:
+            session_lock.release()
 
 @app.route('/api/chat/edit', methods=['PUT'])
 def edit_message():
@@ -709,51 +942,61 @@ def edit_message():
         if not all([session_id, message_id, new_content]):
             return jsonify({"status": "error", "message": "Missing required fields"}), 400
 
-        session_data = chat_sessions_collection.find_one({"session_id": session_id})
-        if not session_data:
-            return jsonify({"status": "error", "message": "Session not found"}), 404
-
-        session = ChatSession(session_id)
-        session.messages = session_data["messages"]
-        
-        if session.edit_message(message_id, new_content):
-            chat_sessions_collection.update_one(
-                {"session_id": session.session_id},
-                {"$set": session.to_dict()}
-            )
-            return jsonify({"status": "success", "session": session.to_dict()})
+        session_lock = session_cache.lock(session_id, timeout=SESSION_LOCK_TIMEOUT)
+        try:
+            session = session_cache.get(session_id)
+            if session is None:
+                return jsonify({"status": "error", "message": "Session not found"}), 404
+            
+            if session.edit_message(message_id, new_content):
+                edited = next(msg for msg in session.messages if msg["id"] == message_id)
+                version = session_store.update_message(session.session_id, message_id, {
+                    "content": edited["content"],
+                    "edited": True,
+                    "edited_at": edited["edited_at"]
+                }, is_last=edited is session.messages[-1])
+                session_cache.store(session, version)
+                if version is None:
+                    # The message is gone from the stored session (e.g. replaced by a regenerate)
+                    return jsonify({"status": "error", "message": SESSION_CHANGED_MESSAGE}), 409
+                return jsonify({"status": "success", "session": session.to_dict()})
+        finally:
+            session_lock.release()
         
         return jsonify({"status": "error", "message": "Message not found"}), 404
 
+    except SessionBusy as e:
+        logging.warning(f"⚠️ Edit rejected: {str(e)}")
+        return jsonify({"status": "error", "message": SESSION_BUSY_MESSAGE}), 409
     except Exception as e:
         logging.error(f"Edit error: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 @app.route('/api/chat/sessions', methods=['GET'])
 def get_sessions():
+    """
+    Session summaries (no messages), newest first
+
+    Pass the returned ``next_cursor`` as ``cursor`` for the next page. The total is
+    an estimate refreshed every SESSION_COUNT_CACHE_TTL seconds.
+    """
     try:
-        page = int(request.args.get('page', 1))
-        limit = int(request.args.get('limit', 20))
-        skip = (page - 1) * limit
+        limit = min(max(int(request.args.get('limit', 20)), 1), SESSION_PAGE_MAX)
+        cursor = request.args.get('cursor')
 
-        sessions = list(chat_sessions_collection.find()
-                       .sort("updated_at", DESCENDING)
-                       .skip(skip)
-                       .limit(limit))
-        
-        total = chat_sessions_collection.count_documents({})
-        
-        for session in sessions:
-            session['_id'] = str(session['_id'])
+        try:
+            sessions, next_cursor = session_store.list_summaries(limit, cursor)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
         
         return jsonify({
             "status": "success",
             "sessions": sessions,
             "pagination": {
-                "page": page,
                 "limit": limit,
-                "total": total,
-                "pages": (total + limit - 1) // limit
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None,
+                "total": session_store.estimated_total()
             }
         })
     except Exception as e:
@@ -776,6 +1019,7 @@ def get_session(session_id):
 def delete_session(session_id):
     try:
         result = chat_sessions_collection.delete_one({"session_id": session_id})
+        session_cache.invalidate(session_id)
         if result.deleted_count > 0:
             return jsonify({"status": "success", "message": "Session deleted"})
         return jsonify({"status": "error", "message": "Session not found"}), 404
@@ -794,8 +1038,9 @@ def rename_session(session_id):
 
         result = chat_sessions_collection.update_one(
             {"session_id": session_id},
-            {"$set": {"title": new_title, "updated_at": datetime.now().isoformat()}}
+            {"$set": {"title": new_title, "updated_at": datetime.now().isoformat()}, "$inc": {"version": 1}}
         )
+        session_cache.invalidate(session_id)
         
         if result.modified_count > 0:
             return jsonify({"status": "success", "message": "Session renamed"})
@@ -806,60 +1051,92 @@ def rename_session(session_id):
 
 @app.route('/api/chat/search', methods=['GET'])
 def search_sessions():
-    """Search through chat sessions"""
+    """Search chat sessions by title and message text, best matches first"""
     try:
         query = request.args.get('q', '').strip()
         if not query:
             return jsonify({"status": "error", "message": "Search query required"}), 400
+        page = max(int(request.args.get('page', 1)), 1)
+        limit = min(max(int(request.args.get('limit', 20)), 1), SESSION_PAGE_MAX)
 
-        # Search in titles and message content
-        sessions = list(chat_sessions_collection.find({
-            "$or": [
-                {"title": {"$regex": query, "$options": "i"}},
-                {"messages.content": {"$regex": query, "$options": "i"}}
-            ]
-        }).sort("updated_at", DESCENDING).limit(50))
-
-        for session in sessions:
-            session['_id'] = str(session['_id'])
+        sessions, total = session_search.search(query, page=page, limit=limit)
 
         return jsonify({
             "status": "success",
             "sessions": sessions,
-            "count": len(sessions)
+            "count": len(sessions),
+            "pagination": {
+                "page": page,
+                "limit": limit,
+                "total": total,
+                "pages": (total + limit - 1) // limit
+            }
         })
     except Exception as e:
         logging.error(f"Search error: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def export_response(chunks, fmt, filename, compress):
+    """Streamed download of ``chunks``, gzipped on request"""
+    mimetype, extension = FORMATS[fmt]
+    filename = f"{filename}.{extension}"
+    if compress:
+        chunks, mimetype, filename = gzip_stream(chunks), "application/gzip", f"{filename}.gz"
+    return Response(chunks, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={filename}", "X-Accel-Buffering": "no"})
+
 @app.route('/api/chat/export/<session_id>', methods=['GET'])
 def export_session(session_id):
-    """Export a chat session as JSON or Markdown"""
+    """Export a chat session as JSON, NDJSON or Markdown (``gzip=true`` to compress the download)"""
     try:
         format_type = request.args.get('format', 'json')
-        session = chat_sessions_collection.find_one({"session_id": session_id})
+        if format_type != 'json' and format_type not in FORMATS:
+            return jsonify({"status": "error", "message": f"Unsupported format: {format_type}"}), 400
+        session = chat_sessions_collection.find_one({"session_id": session_id}, {"_id": 0})
         
         if not session:
             return jsonify({"status": "error", "message": "Session not found"}), 404
 
-        if format_type == 'markdown':
-            md_content = f"# {session['title']}\n\n"
-            md_content += f"Created: {session['created_at']}\n\n"
-            
-            for msg in session['messages']:
-                role = "**User**" if msg['role'] == 'user' else "**Pasupathy**"
-                md_content += f"{role}: {msg['content']}\n\n---\n\n"
-            
-            return Response(md_content, mimetype='text/markdown', 
-                          headers={"Content-Disposition": f"attachment; filename=chat_{session_id}.md"})
-        else:
-            session['_id'] = str(session['_id'])
+        if format_type == 'json':
             return jsonify({"status": "success", "session": session})
+        chunks = session_markdown(session) if format_type == 'markdown' else iter([session_ndjson(session)])
+        return export_response(chunks, format_type, f"chat_{session_id}", request.args.get('gzip') == 'true')
 
     except Exception as e:
         logging.error(f"Export error: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/chat/export', methods=['GET'])
+def export_sessions_bulk():
+    """
+    Stream many sessions as NDJSON (default) or Markdown, oldest update first
+
+    Query parameters:
+        since, until: ISO dates bounding updated_at ([since, until))
+        token: Continuation token from the trailer of a previous export
+        limit: Sessions in this response (at most EXPORT_MAX_SESSIONS)
+        gzip: "true" to compress the download
+    """
+    try:
+        format_type = request.args.get('format', 'ndjson')
+        if format_type not in FORMATS:
+            return jsonify({"status": "error", "message": f"Unsupported format: {format_type}"}), 400
+        limit = min(max(int(request.args.get('limit', EXPORT_MAX_SESSIONS)), 1), EXPORT_MAX_SESSIONS)
+        try:
+            query = export_query(parse_timestamp(request.args.get('since')),
+                                 parse_timestamp(request.args.get('until')),
+                                 request.args.get('token'))
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        chunks = export_sessions(chat_sessions_collection, format_type, query, limit, batch_size=EXPORT_BATCH_SIZE)
+        return export_response(chunks, format_type, f"chats_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                               request.args.get('gzip') == 'true')
+
+    except Exception as e:
+        logging.error(f"Bulk export error: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
 @app.route('/api/dataset/upload', methods=['POST'])
 def upload_dataset():
     """Upload JSON dataset to MongoDB"""
@@ -938,16 +1215,19 @@ def upload_dataset():
         
         logging.info(f"📤 Uploaded {count} documents to dataset")
         
-        # Reinitialize RAG system with new data
-        global llm_chain
-        logging.info("🔄 Reinitializing RAG system with new data...")
-        llm_chain = initialize_llm_model(mongo.db)
+        # Rebuild the RAG index in the background; chats keep using the live generation
+        logging.info("🔄 Queueing RAG index rebuild with new data...")
+        job_id = index_build_manager.submit(
+            "upload",
+            lambda generation: initialize_llm_model(mongo.db, generation=generation)
+        )
         
         return jsonify({
             "status": "success",
-            "message": f"Uploaded {count} documents",
-            "count": count
-        })
+            "message": f"Uploaded {count} documents, index rebuild queued",
+            "count": count,
+            "job_id": job_id
+        }), 202
         
     except Exception as e:
         logging.error(f"Upload error: {str(e)}")
@@ -1005,14 +1285,13 @@ def add_user_knowledge():
         
         # If auto-approved, add to vectorstore immediately
         if auto_approve and llm_chain:
-            from llm_model import add_user_contributions_to_vectorstore
             from langchain_core.documents import Document
             
             user_doc = Document(
                 page_content=content,
                 metadata={"source": "user_contribution", "category": category}
             )
-            add_user_contributions_to_vectorstore(llm_chain, [user_doc])
+            add_contributions([user_doc])
         
         return jsonify({
             "status": "success",
@@ -1064,11 +1343,10 @@ def approve_knowledge(contribution_id):
         
         # Add to vectorstore
         if llm_chain:
-            from llm_model import add_user_contributions_to_vectorstore
             contributions = user_knowledge_manager.get_user_contributions(approved_only=True, limit=1)
             
             if contributions:
-                add_user_contributions_to_vectorstore(llm_chain, contributions)
+                add_contributions(contributions)
         
         return jsonify({
             "status": "success",
@@ -1104,40 +1382,46 @@ def get_knowledge_stats():
 @rate_limit
 def rebuild_knowledge_base():
     """Rebuild entire vectorstore with all approved user contributions"""
-    global llm_chain
-    
     try:
         if not user_knowledge_manager or not llm_chain:
             return jsonify({"status": "error", "message": "System not initialized"}), 503
         
-        from llm_model import rebuild_vectorstore_with_contributions
-        
-        logging.info("🔄 Starting knowledge base rebuild...")
-        llm_chain = rebuild_vectorstore_with_contributions(mongo.db, llm_chain)
+        logging.info("🔄 Queueing knowledge base rebuild...")
+        # Resolve llm_chain when the job runs so it builds on the newest generation
+        job_id = index_build_manager.submit(
+            "rebuild",
+            lambda generation: rebuild_vectorstore_with_contributions(mongo.db, llm_chain, generation)
+        )
         
         stats = user_knowledge_manager.get_stats()
         
         return jsonify({
             "status": "success",
-            "message": "Knowledge base rebuilt successfully",
+            "message": "Knowledge base rebuild queued",
+            "job_id": job_id,
             "stats": stats
-        })
+        }), 202
         
     except Exception as e:
         logging.error(f"Rebuild error: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-if __name__ == '__main__':
-    # Create indexes for better performance
-    try:
-        chat_sessions_collection.create_index([("session_id", ASCENDING)], unique=True)
-        chat_sessions_collection.create_index([("updated_at", DESCENDING)])
-        chat_sessions_collection.create_index([("title", "text"), ("messages.content", "text")])
-        logging.info("Database indexes created successfully")
-    except Exception as e:
-        logging.warning(f"Index creation warning: {str(e)}")
+@app.route('/api/index/jobs/<job_id>', methods=['GET'])
+def get_index_job(job_id):
+    """Get the status of a background index build"""
+    job = index_build_manager.get_job(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
     
+    return jsonify({
+        "status": "success",
+        "job": job,
+        "live_generation": llm_chain.get("generation") if llm_chain else None
+    })
+
+
+if __name__ == '__main__':
     # Use PORT from environment variable (Render sets this)
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,297 @@
+"""
+ASGI Entry Point
+Serves ``POST /api/chat`` and its streaming variant from an asyncio event loop and
+hands every other route to the Flask app. A chat turn awaits Motor for session
+I/O and the async LLM client for generation; only embedding, retrieval and prompt
+building run on a small thread pool. A slow streaming answer therefore holds a
+coroutine rather than a thread, so one process sustains hundreds of them.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from a2wsgi import WSGIMiddleware
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import app as flask_app
+from app import (
+    ChatSession, check_rate_limit, recent_history, prepare_turn, complete_turn, record_user_contribution,
+    turn_fields, session_from_document, forget_unsaved_turn, session_cache, followup_cache, title_worker,
+    SESSION_BUSY_MESSAGE
+)
+from config import MONGO_URI, DATABASE_NAME, ASYNC_RETRIEVAL_WORKERS, SESSION_LOCK_TIMEOUT, FOLLOWUP_TIMEOUT
+from followups import generate_followups_async, GENERIC_FOLLOWUPS
+from llm_resilience import LLMTimeout
+from llm_scheduler import LLMOverloaded
+from metrics import metrics
+from session_cache import SessionBusy
+from session_store import AsyncSessionStore
+
+logger = logging.getLogger(__name__)
+
+# Embedding and FAISS/BM25 lookups are CPU-bound; they never run on the event loop
+retrieval_executor = ThreadPoolExecutor(max_workers=ASYNC_RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+
+# Set up on startup, inside the server's event loop
+motor_client = None
+async_session_store = None
+
+
+async def load_chat_session_async(session_id):
+    """``load_chat_session`` over Motor"""
+    session_data = await motor_client.get_default_database(DATABASE_NAME).chat_sessions.find_one(
+        {"session_id": session_id}, {"_id": 0}
+    )
+    return session_from_document(session_data) if session_data else None
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global motor_client, async_session_store
+    motor_client = AsyncIOMotorClient(MONGO_URI)
+    async_session_store = AsyncSessionStore(
+        motor_client.get_default_database(DATABASE_NAME).chat_sessions,
+        preview_chars=flask_app.session_store.preview_chars
+    )
+    session_cache.async_loader = load_chat_session_async
+    logger.info("⚡ Async chat path ready")
+    try:
+        yield
+    finally:
+        motor_client.close()
+        retrieval_executor.shutdown(wait=False)
+
+
+def error_response(message, status_code):
+    return JSONResponse({"status": "error", "message": message}, status_code=status_code)
+
+
+async def aiter_response_text(response_chunks) -> AsyncIterator[str]:
+    """``iter_response_text`` for an async chunk stream"""
+    async for response_chunk in response_chunks:
+        try:
+            chunk_text = response_chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. a bare finish reason)
+            continue
+        if chunk_text:
+            yield chunk_text
+
+
+async def start_stream_async(chunk_texts: AsyncIterator[str]) -> AsyncIterator[str]:
+    """``start_stream`` for an async chunk stream"""
+    try:
+        first_chunk = await chunk_texts.__anext__()
+    except StopAsyncIteration:
+        first_chunk = None
+
+    async def resumed():
+        if first_chunk is None:
+            return
+        yield first_chunk
+        async for chunk_text in chunk_texts:
+            yield chunk_text
+
+    return resumed()
+
+
+async def save_turn(session, is_first_message):
+    """Append this turn's messages and record the written version"""
+    session_cache.store(session, await async_session_store.append_messages(
+        session, session.messages[-2:], turn_fields(session, is_first_message)))
+
+
+async def chat(request):
+    """Async twin of ``app.chat``: same request, responses and SSE events"""
+    if not check_rate_limit(request.client.host if request.client else None):
+        return error_response("Rate limit exceeded", 429)
+
+    session_id = None
+    session_lock = None
+    stream_owns_lock = False
+    try:
+        # Pin the current index generation for the whole request
+        chain = flask_app.llm_chain
+        if not chain:
+            model_status = flask_app.model_status
+            return error_response(
+                f"Model is not ready yet. Status: {model_status['status']} - {model_status['message']}", 503
+            )
+
+        data = await request.json()
+        user_message = data.get('message', '').strip()
+        session_id = data.get('session_id')
+        stream = data.get('stream', False)
+
+        if not user_message:
+            return error_response("Message cannot be empty", 400)
+
+        # Get or create session; turns in one session run one at a time
+        session = None
+        if session_id:
+            session_lock = await session_cache.lock_async(session_id, timeout=SESSION_LOCK_TIMEOUT)
+            session = await session_cache.get_async(session_id)
+        if session is None:
+            session = ChatSession()
+
+        session.add_message("user", user_message)
+        has_history = bool(recent_history(session))
+        loop = asyncio.get_running_loop()
+        gemini_model = chain["gemini_model"]
+
+        if stream:
+            stream_started = time.perf_counter()
+            turn = await loop.run_in_executor(
+                retrieval_executor, prepare_turn, chain, session, user_message, has_history
+            )
+            chat_prompt = turn["chat_prompt"]
+            query_context = turn["query_context"]
+            if not turn["cached"]:
+                chunk_texts = await start_stream_async(aiter_response_text(await gemini_model.generate_content_async(
+                    chat_prompt.text, stream=True, system_instruction=chat_prompt.system_instruction)))
+
+            async def generate():
+                first_chunk_sent = False
+                try:
+                    if turn["cached"]:
+                        response_text = turn["cached"]["response"]
+                        metrics.observe("chat_ttft_ms", (time.perf_counter() - stream_started) * 1000)
+                        first_chunk_sent = True
+                        yield f"data: {json.dumps({'content': response_text})}\n\n"
+                    else:
+                        response_parts = []
+                        async for chunk_text in chunk_texts:
+                            if not first_chunk_sent:
+                                metrics.observe("chat_ttft_ms", (time.perf_counter() - stream_started) * 1000)
+                                first_chunk_sent = True
+                            response_parts.append(chunk_text)
+                            yield f"data: {json.dumps({'content': chunk_text})}\n\n"
+                        response_text = "".join(response_parts)
+                        metrics.observe("chat_generation_ms", (time.perf_counter() - stream_started) * 1000)
+
+                    # Start follow-up suggestions while the session is being saved
+                    followups_task = asyncio.ensure_future(generate_followups_async(
+                        gemini_model, user_message, response_text, query_context, followup_cache
+                    ))
+
+                    is_first_message = complete_turn(chain, session, user_message, turn, response_text,
+                                                     source_names=True)
+                    await save_turn(session, is_first_message)
+                    title_pending = is_first_message and title_worker.submit(
+                        session.session_id, session.title, user_message, response_text, query_context
+                    )
+                    yield f"data: {json.dumps({'done': True, 'session_id': session.session_id, 'title': session.title, 'title_pending': title_pending, 'query_context': query_context, 'index_generation': chain.get('generation'), 'cached': bool(turn['cached'])})}\n\n"
+
+                    # Follow-up suggestions close the stream
+                    try:
+                        followups = await asyncio.wait_for(followups_task, FOLLOWUP_TIMEOUT)
+                    except Exception as e:
+                        logger.error(f"Follow-up generation error: {str(e)}")
+                        followups = GENERIC_FOLLOWUPS
+                    yield f"data: {json.dumps({'followups': followups})}\n\n"
+                except Exception as e:
+                    forget_unsaved_turn(session_id)
+                    logger.error(f"Stream error: {str(e)}")
+                    yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                finally:
+                    if session_lock:
+                        session_lock.release()
+
+            # Held until the whole answer has been streamed and saved; the background
+            # task covers a client that disconnects before the stream starts
+            stream_owns_lock = True
+            return StreamingResponse(
+                generate(), media_type='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+                background=BackgroundTask(session_lock.release) if session_lock else None
+            )
+
+        turn = await loop.run_in_executor(retrieval_executor, prepare_turn, chain, session, user_message, has_history)
+        chat_prompt = turn["chat_prompt"]
+        if turn["cached"]:
+            bot_response = turn["cached"]["response"]
+        else:
+            response = await gemini_model.generate_content_async(
+                chat_prompt.text, system_instruction=chat_prompt.system_instruction
+            )
+            bot_response = response.text
+
+        is_first_message = complete_turn(chain, session, user_message, turn, bot_response)
+        await save_turn(session, is_first_message)
+        title_pending = is_first_message and title_worker.submit(
+            session.session_id, session.title, user_message, bot_response, turn["query_context"]
+        )
+
+        # Knowledge-base writes use the synchronous driver and index
+        detected_info = await loop.run_in_executor(
+            retrieval_executor, record_user_contribution, chain, session, user_message, bot_response
+        )
+
+        return JSONResponse({
+            "status": "success",
+            "response": bot_response,
+            "session_id": session.session_id,
+            "message_id": session.messages[-1]["id"],
+            "sources": session.metadata.get('last_sources', []),
+            "session": session.to_dict(),
+            "title_pending": title_pending,
+            "new_info_detected": detected_info,
+            "query_context": turn["query_context"],
+            "index_generation": chain.get("generation"),
+            "cached": bool(turn["cached"])
+        })
+
+    except LLMOverloaded as e:
+        forget_unsaved_turn(session_id)
+        logger.warning(f"⚠️ Chat rejected, LLM saturated: {str(e)}")
+        return error_response("The assistant is busy right now, please try again shortly", 503)
+    except LLMTimeout as e:
+        forget_unsaved_turn(session_id)
+        logger.warning(f"⚠️ Chat timed out: {str(e)}")
+        return error_response("The assistant took too long to answer, please try again", 504)
+    except SessionBusy as e:
+        logger.warning(f"⚠️ Chat rejected: {str(e)}")
+        return error_response(SESSION_BUSY_MESSAGE, 409)
+    except Exception as e:
+        forget_unsaved_turn(session_id)
+        logger.error(f"Chat error: {str(e)}")
+        return error_response(str(e), 500)
+    finally:
+        if session_lock and not stream_owns_lock:
+            session_lock.release()
+
+
+chat_api = Starlette(
+    routes=[Route('/api/chat', chat, methods=['POST'])],
+    # Same policy as flask_cors' defaults on the Flask routes
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+flask_api = WSGIMiddleware(flask_app.app)
+
+
+async def app(scope, receive, send):
+    """Route /api/chat (and server lifespan) to the async app, everything else to Flask"""
+    if scope["type"] == "lifespan" or (scope["type"] == "http" and scope["path"] == '/api/chat'):
+        await chat_api(scope, receive, send)
+    else:
+        await flask_api(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,96 @@
+"""
+BM25 Index
+In-memory inverted index over the chunks in the FAISS store, keyed by the same
+FAISS ids, for exact-token lookups (names, places, dates) that dense embeddings
+rank poorly
+"""
+import math
+import re
+import threading
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.casefold())
+
+
+class BM25Index:
+    """Okapi BM25 over consecutive FAISS ids, supporting appends"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> (ids, term frequencies); ids are appended in increasing order
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._doc_lengths = array("I")
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add_many(self, start_id: int, texts: Iterable[str]):
+        """Index texts under consecutive FAISS ids starting at ``start_id``"""
+        with self._lock:
+            for offset, text in enumerate(texts):
+                doc_id = start_id + offset
+                if doc_id < len(self._doc_lengths):
+                    # Already indexed (e.g. a replayed addition)
+                    continue
+                while len(self._doc_lengths) < doc_id:
+                    self._doc_lengths.append(0)
+                tokens = tokenize(text)
+                frequencies = {}
+                for token in tokens:
+                    frequencies[token] = frequencies.get(token, 0) + 1
+                for term, tf in frequencies.items():
+                    ids, tfs = self._postings.setdefault(term, (array("I"), array("I")))
+                    ids.append(doc_id)
+                    tfs.append(tf)
+                self._doc_lengths.append(len(tokens))
+                self._total_length += len(tokens)
+
+    def search(self, query: str, k: int, allowed: Optional[Callable[[int], bool]] = None) -> List[Tuple[int, float]]:
+        """
+        Top ``k`` (faiss_id, score) pairs for ``query``
+
+        Args:
+            query: Query text
+            k: Number of results
+            allowed: Optional predicate restricting which ids may be returned
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._doc_lengths)
+            if not n or not terms:
+                return []
+            avg_length = self._total_length / n or 1.0
+            scores: Dict[int, float] = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if posting is None:
+                    continue
+                ids, tfs = posting
+                idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+                for doc_id, tf in zip(ids, tfs):
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        if allowed is not None:
+            scores = {doc_id: score for doc_id, score in scores.items() if allowed(doc_id)}
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"documents": len(self._doc_lengths), "terms": len(self._postings)}
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
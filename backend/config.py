@@ -20,9 +20,17 @@ DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/llm_chat')
 DATABASE_NAME = os.getenv('DATABASE_NAME', 'llm_chat')
 
+# Async serving (asgi.py): /api/chat on an asyncio event loop, every other route on Flask
+ASYNC_RETRIEVAL_WORKERS = int(os.getenv('ASYNC_RETRIEVAL_WORKERS', 8))  # Threads for embedding, retrieval and prompt building
+
+# LLM provider: "gemini", or "local" for the deterministic offline stand-in (load tests, CI)
+LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'gemini').lower()
+
 # Google Gemini API configuration
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '').strip('"\'')
-if not GOOGLE_API_KEY:
+if LLM_PROVIDER == 'local':
+    logger.info("🧪 LLM_PROVIDER=local: using the offline LLM stand-in")
+elif not GOOGLE_API_KEY:
     logger.error("❌ GOOGLE_API_KEY not set! AI features will not work.")
     logger.info("💡 Set GOOGLE_API_KEY in your .env file or environment variables")
 else:
@@ -33,15 +41,83 @@ EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 GEMINI_MODEL = "gemini-2.5-flash"  # Free tier model (1.5M requests/month)
 TEMPERATURE = 0.7  # Creative responses
 
+LLM_COALESCE_REQUESTS = os.getenv('LLM_COALESCE_REQUESTS', 'True').lower() == 'true'  # One upstream call per identical in-flight prompt
+
+# Local LLM stand-in (LLM_PROVIDER=local)
+LOCAL_LLM_LATENCY_DISTRIBUTION = os.getenv('LOCAL_LLM_LATENCY_DISTRIBUTION', 'lognormal')  # fixed, uniform or lognormal
+LOCAL_LLM_LATENCY_MS = float(os.getenv('LOCAL_LLM_LATENCY_MS', 800))  # Median time to first token
+LOCAL_LLM_LATENCY_SPREAD = float(os.getenv('LOCAL_LLM_LATENCY_SPREAD', 0.5))  # Lognormal sigma, or +/- fraction for uniform
+LOCAL_LLM_CHUNK_INTERVAL_MS = float(os.getenv('LOCAL_LLM_CHUNK_INTERVAL_MS', 40))  # Delay between streamed chunks
+LOCAL_LLM_CHUNK_WORDS = int(os.getenv('LOCAL_LLM_CHUNK_WORDS', 4))  # Words per streamed chunk
+LOCAL_LLM_RESPONSE_WORDS = int(os.getenv('LOCAL_LLM_RESPONSE_WORDS', 120))  # Length of a generated answer
+LOCAL_LLM_ERROR_RATE = float(os.getenv('LOCAL_LLM_ERROR_RATE', 0.0))  # Fraction of calls that fail
+LOCAL_LLM_SEED = int(os.getenv('LOCAL_LLM_SEED', 0))
+
 # RAG Configuration
-SEARCH_K = 25  # Number of documents to retrieve (increased for comprehensive coverage)
+SEARCH_K = 10  # Number of documents to retrieve (hybrid BM25 + dense ranking needs less oversampling)
+SEARCH_FETCH_K = 30  # Candidates per retriever before fusion and MMR
+RRF_K = 60  # Reciprocal-rank fusion constant
+BM25_K1 = 1.5  # BM25 term-frequency saturation
+BM25_B = 0.75  # BM25 document-length normalization
 CHUNK_SIZE = 1000  # Size of text chunks
 CHUNK_OVERLAP = 200  # Overlap between chunks
 MAX_CONTEXT_MESSAGES = 6  # For conversation history
+PROMPT_TOKEN_BUDGET = 3000  # Estimated input tokens per chat prompt, system instruction included
+CONVERSATION_TOKEN_BUDGET = 400  # Share of the prompt budget for quoted recent conversation
+FAISS_INDEX_PATH = os.getenv('FAISS_INDEX_PATH', '/app/faiss_index')
+EMBEDDING_CACHE_BATCH_SIZE = 512  # Cache keys fetched/written per MongoDB round trip
+QUERY_EMBEDDING_CACHE_SIZE = 2048  # Distinct queries whose embeddings are kept in memory
+QUERY_EMBEDDING_CACHE_TTL = 3600  # Seconds
+CONTRIBUTION_FLUSH_BATCH_SIZE = 20  # Flush buffered contributions to disk after this many...
+CONTRIBUTION_FLUSH_INTERVAL = 30  # ...or this many seconds after the first unflushed one
+TITLE_QUEUE_SIZE = 100  # Pending background title generations before new ones keep their placeholder
+FOLLOWUP_CACHE_SIZE = 1000  # Follow-up suggestions cached by (query_context, answer hash)
+FOLLOWUP_CACHE_TTL = 3600  # Seconds
+FOLLOWUP_TIMEOUT = 10  # Seconds the stream waits for follow-up suggestions
+SESSION_PREVIEW_CHARS = 100  # Last-message excerpt stored on each session for listings
+SESSION_PAGE_MAX = 100  # Largest page of session summaries
+SESSION_COUNT_CACHE_TTL = 60  # Seconds the estimated session total is reused
+SEARCH_SNIPPETS_PER_SESSION = 3  # Matching messages shown per session search result
+SESSION_CACHE_SIZE = 1000  # Active sessions kept in memory (write-through)
+SESSION_CACHE_TTL = 300  # Seconds a cached session is trusted without a confirming write
+SESSION_LOCK_TIMEOUT = 60  # Seconds a turn waits for the previous turn in the same session
+EXPORT_BATCH_SIZE = 100  # Sessions per MongoDB cursor batch while exporting
+EXPORT_MAX_SESSIONS = 10000  # Sessions per bulk export response; the trailer token continues from there
+
+# Semantic response cache (first-turn questions only)
+RESPONSE_CACHE_THRESHOLD = float(os.getenv('RESPONSE_CACHE_THRESHOLD', 0.95))  # Min cosine similarity for a hit
+RESPONSE_CACHE_SIZE = 1000  # Cached answers
+RESPONSE_CACHE_TTL = 3600  # Seconds
+
+# Vector index configuration
+INDEX_TYPE = os.getenv('INDEX_TYPE', 'flat')  # flat | hnsw | ivf_flat | ivf_pq | ivf_sq8
+HNSW_M = 32  # Graph neighbours per node
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 128  # Higher = better recall, slower queries
+IVF_NLIST = int(os.getenv('IVF_NLIST', 0))  # Number of IVF cells (0 = ~4*sqrt(corpus size))
+IVF_NPROBE = int(os.getenv('IVF_NPROBE', 16))  # Cells scanned per query
+PQ_M = 48  # PQ sub-quantizers; must divide the embedding dimension (384 for MiniLM)
+PQ_NBITS = 8
+RECALL_CHECK_QUERIES = 200  # Sample queries for the build-time recall self-check
+RECALL_CHECK_K = 10
+RECALL_CHECK_MIN = 0.9  # Warn when recall@k vs exact search falls below this
 
 # API Configuration
-MAX_RETRIES = 3
-RETRY_DELAY = 1
-REQUEST_TIMEOUT = 30
+MAX_RETRIES = 3  # LLM retries after the first attempt (jittered exponential backoff)
+RETRY_DELAY = 1  # Base backoff in seconds
+REQUEST_TIMEOUT = 30  # Deadline per LLM call, retries included; for streams, per gap between chunks
+LLM_STREAM_TIMEOUT = 300  # Provider-side cap on one streamed attempt, so an abandoned stream frees its slot
+
+# Hedged LLM requests: a slow call gets one duplicate, first answer wins
+LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'True').lower() == 'true'
+LLM_HEDGE_PERCENTILE = 95 if LLM_HEDGE_ENABLED else None  # Hedge once a call is slower than this latency percentile
+LLM_HEDGE_MIN_DELAY_MS = 500  # Never hedge earlier than this
+LLM_HEDGE_MAX_RATIO = float(os.getenv('LLM_HEDGE_MAX_RATIO', 0.05))  # Extra load cap: hedges per call
+LLM_HEDGE_PRIORITIES = ("chat",)  # Only user-facing answers are worth duplicating
+
+# Outbound LLM call scheduling (priority: chat > followup > title)
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))  # LLM calls in flight at once
+LLM_QUEUE_LIMITS = {"chat": 64, "followup": 16, "title": 8}  # Waiting calls per class before fast rejection
+LLM_QUEUE_TIMEOUT = 30  # Seconds a call may wait for a slot
 
 logger.info("✅ Configuration loaded successfully")
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+Embedding Cache
+Persists chunk embeddings in MongoDB keyed by a hash of the chunk text and the
+embedding model name, so index builds only embed chunks they have never seen.
+Query embeddings are kept in a bounded in-process LRU so repeat questions skip
+the transformer forward pass.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from bson.binary import Binary
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from langchain_core.embeddings import Embeddings
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbeddingCache:
+    """Bounded, thread-safe LRU cache of normalized query -> embedding vector with a TTL"""
+
+    def __init__(self, max_size: int = 2048, ttl: float = 3600.0):
+        """
+        Args:
+            max_size: Maximum number of cached queries
+            ttl: Seconds an entry stays valid
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Casefold and collapse whitespace; the MiniLM tokenizer is uncased anyway"""
+        return " ".join(query.casefold().split())
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                metrics.increment("query_embedding_cache.misses")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        metrics.increment("query_embedding_cache.hits")
+        return entry[0]
+
+    def put(self, key: str, vector: List[float]):
+        with self._lock:
+            self._entries[key] = (vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves document vectors from a persistent cache"""
+
+    def __init__(self, underlying: Embeddings, db, model_name: str, batch_size: int = 512,
+                 query_cache: Optional[QueryEmbeddingCache] = None):
+        """
+        Args:
+            underlying: The real embedding model (e.g. HuggingFaceEmbeddings)
+            db: MongoDB database connection
+            model_name: Embedding model name, part of every cache key
+            batch_size: Number of keys fetched/written per MongoDB round trip
+            query_cache: In-process cache for query embeddings (None disables it)
+        """
+        self.underlying = underlying
+        self.query_cache = query_cache
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.collection = db.embedding_cache
+        self.stats = {"hits": 0, "misses": 0}
+
+    def cache_key(self, text: str) -> str:
+        """Content hash of a chunk for the configured embedding model"""
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _load_cached(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Fetch cached vectors for the given keys in batches"""
+        vectors = {}
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            for doc in self.collection.find({"_id": {"$in": batch}}, {"vector": 1}):
+                vectors[doc["_id"]] = np.frombuffer(doc["vector"], dtype=np.float32).tolist()
+        return vectors
+
+    def _store(self, new_vectors: Dict[str, List[float]]):
+        """Write freshly computed vectors; concurrent builds may race on the same keys"""
+        items = list(new_vectors.items())
+        for start in range(0, len(items), self.batch_size):
+            ops = [
+                UpdateOne(
+                    {"_id": key},
+                    {"$setOnInsert": {
+                        "model": self.model_name,
+                        "vector": Binary(np.asarray(vector, dtype=np.float32).tobytes())
+                    }},
+                    upsert=True
+                )
+                for key, vector in items[start:start + self.batch_size]
+            ]
+            try:
+                self.collection.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                logger.warning(f"⚠️ Some embedding cache writes failed: {e.details.get('writeErrors', [])[:1]}")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, only running the model on texts missing from the cache"""
+        keys = [self.cache_key(text) for text in texts]
+        try:
+            vectors = self._load_cached(list(dict.fromkeys(keys)))
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding cache unavailable, embedding everything: {e}")
+            vectors = {}
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+
+        self.stats["hits"] += len(texts) - len(missing)
+        self.stats["misses"] += len(missing)
+        logger.info(f"🧠 Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} to embed")
+
+        if missing:
+            computed = self.underlying.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), computed))
+            vectors.update(new_vectors)
+            try:
+                self._store(new_vectors)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not persist embeddings: {e}")
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Queries are cached in memory only, keyed by their normalized text"""
+        if self.query_cache is None:
+            return self.underlying.embed_query(text)
+        key = QueryEmbeddingCache.normalize(text)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            with metrics.timer("query_embedding_ms"):
+                vector = self.underlying.embed_query(key)
+            self.query_cache.put(key, vector)
+        return list(vector)
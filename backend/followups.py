@@ -0,0 +1,156 @@
+"""
+Follow-up Questions
+Builds, parses and caches the follow-up question suggestions shown after an answer
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+GENERIC_FOLLOWUPS = [
+    "Tell me more about that",
+    "What else should I know?",
+    "Can you elaborate?"
+]
+
+FALLBACK_FOLLOWUPS = [
+    "Can you provide more details?",
+    "What else should I know about this?",
+    "How does this relate to other aspects?"
+]
+
+
+def build_followup_prompt(user_message: str, bot_response: str, query_context: Optional[str] = None) -> str:
+    """Prompt asking the LLM for three follow-up questions"""
+    context_hint = f" (in the context of {query_context.replace('_', ' ')})" if query_context else ""
+
+    return f"""Based on this conversation about Arvind{context_hint}, generate 3 specific, contextual follow-up questions that the user might want to ask next.
+
+User Question: {user_message[:300]}
+Pasupathy's Response: {bot_response[:500]}
+
+Requirements:
+- Each question should be 5-10 words
+- Questions should dig deeper into the current topic
+- Stay focused on the context (e.g., if about computer vision, ask about CV details)
+- Make questions natural and conversational
+- Avoid generic questions like "tell me more"
+
+Examples of good follow-up questions:
+- For education: "What was your major GPA?" or "Which courses did you excel in?"
+- For computer vision: "What datasets did you use?" or "How accurate was your model?"
+- For projects: "What technologies did you use?" or "What challenges did you face?"
+
+Generate 3 follow-up questions, one per line:"""
+
+
+def parse_followup_questions(questions_text: str) -> List[str]:
+    """Three cleaned questions from the LLM output, padded with fallbacks"""
+    questions = []
+    for line in questions_text.strip().split('\n'):
+        # Remove numbering, bullets, dashes
+        cleaned = line.strip()
+        for prefix in ['1.', '2.', '3.', '-', '•', '*']:
+            if cleaned.startswith(prefix):
+                cleaned = cleaned[len(prefix):].strip()
+
+        if cleaned and len(cleaned) > 10:  # Must be substantial
+            questions.append(cleaned)
+            if len(questions) == 3:
+                break
+
+    # Fallback if not enough questions generated
+    if len(questions) < 3:
+        questions.extend(FALLBACK_FOLLOWUPS[:3 - len(questions)])
+    return questions[:3]
+
+
+class FollowupCache:
+    """Bounded LRU/TTL cache of follow-up questions keyed by (query_context, answer hash)"""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(query_context: Optional[str], answer: str) -> tuple:
+        return (query_context or "general", hashlib.sha256(answer.encode("utf-8")).hexdigest())
+
+    def get(self, query_context: Optional[str], answer: str) -> Optional[List[str]]:
+        key = self._key(query_context, answer)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+        metrics.increment("followup_cache.hits" if entry else "followup_cache.misses")
+        return list(entry[1]) if entry else None
+
+    def put(self, query_context: Optional[str], answer: str, questions: List[str]):
+        key = self._key(query_context, answer)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), list(questions))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_entries": self.max_entries}
+
+
+def generate_followups(gemini_model, user_message: str, bot_response: str,
+                       query_context: Optional[str] = None, cache: Optional[FollowupCache] = None) -> List[str]:
+    """
+    Follow-up questions for an answer, from ``cache`` when the same answer was seen
+    in the same context before
+
+    Raises:
+        Exception: Whatever the LLM call raises; callers fall back to generic questions
+    """
+    if cache is not None:
+        cached = cache.get(query_context, bot_response)
+        if cached:
+            return cached
+
+    with metrics.timer("followup_generation_ms"):
+        response = gemini_model.generate_content(
+            build_followup_prompt(user_message, bot_response, query_context), priority="followup"
+        )
+    questions = parse_followup_questions(response.text)
+    logger.info(f"💡 Generated follow-up questions: {questions}")
+
+    if cache is not None:
+        cache.put(query_context, bot_response, questions)
+    return questions
+
+
+async def generate_followups_async(gemini_model, user_message: str, bot_response: str,
+                                   query_context: Optional[str] = None,
+                                   cache: Optional[FollowupCache] = None) -> List[str]:
+    """``generate_followups`` over ``generate_content_async``"""
+    if cache is not None:
+        cached = cache.get(query_context, bot_response)
+        if cached:
+            return cached
+
+    with metrics.timer("followup_generation_ms"):
+        response = await gemini_model.generate_content_async(
+            build_followup_prompt(user_message, bot_response, query_context), priority="followup"
+        )
+    questions = parse_followup_questions(response.text)
+    logger.info(f"💡 Generated follow-up questions: {questions}")
+
+    if cache is not None:
+        cache.put(query_context, bot_response, questions)
+    return questions
@@ -0,0 +1,165 @@
+"""
+Index Factory
+Builds the FAISS index type selected in config.py (exact flat, HNSW or IVF with
+flat/PQ/SQ8 storage), trains it, applies search knobs and checks its recall
+against exact search at build time
+"""
+import logging
+import math
+
+import faiss
+import numpy as np
+
+from config import (
+    INDEX_TYPE, HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH,
+    IVF_NLIST, IVF_NPROBE, PQ_M, PQ_NBITS,
+    RECALL_CHECK_QUERIES, RECALL_CHECK_K, RECALL_CHECK_MIN
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "ivf_sq8")
+
+# FAISS warns below ~39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+MAX_POINTS_PER_CENTROID = 256
+
+
+def _nlist_for(n: int) -> int:
+    """Number of IVF cells: configured, or ~4*sqrt(n) capped by the training set size"""
+    nlist = IVF_NLIST or int(4 * math.sqrt(n))
+    return max(1, min(nlist, n // MIN_POINTS_PER_CENTROID))
+
+
+def _create_index(index_type: str, d: int, n: int):
+    """Instantiate an untrained index of the requested type"""
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+
+    nlist = _nlist_for(n)
+    quantizer = faiss.IndexFlatL2(d)
+    if index_type == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, d, nlist)
+    if index_type == "ivf_pq":
+        if d % PQ_M:
+            raise ValueError(f"PQ_M={PQ_M} must divide the embedding dimension {d}")
+        return faiss.IndexIVFPQ(quantizer, d, nlist, PQ_M, PQ_NBITS)
+    if index_type == "ivf_sq8":
+        return faiss.IndexIVFScalarQuantizer(quantizer, d, nlist, faiss.ScalarQuantizer.QT_8bit)
+    return faiss.IndexFlatL2(d)
+
+
+def _min_training_points(index_type: str) -> int:
+    if index_type == "ivf_pq":
+        # Each PQ sub-quantizer trains 2^nbits centroids
+        return max(MIN_POINTS_PER_CENTROID, MIN_POINTS_PER_CENTROID * (1 << PQ_NBITS))
+    if index_type in ("ivf_flat", "ivf_sq8"):
+        return MIN_POINTS_PER_CENTROID
+    return 0
+
+
+def apply_search_params(index):
+    """Set query-time knobs (nprobe / efSearch); these are not always persisted with the index"""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return
+    ivf.nprobe = min(IVF_NPROBE, ivf.nlist)
+    # MMR reconstructs candidate vectors by id
+    if ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+
+
+def search_parameters(index, selector=None):
+    """
+    Per-query search parameters restricting results to ``selector``. Passing
+    parameters overrides the index defaults, so nprobe/efSearch are carried over.
+    """
+    if selector is None:
+        return None
+    if isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = index.hnsw.efSearch
+    else:
+        try:
+            ivf = faiss.extract_index_ivf(index)
+            params = faiss.SearchParametersIVF()
+            params.nprobe = ivf.nprobe
+        except RuntimeError:
+            params = faiss.SearchParameters()
+    params.sel = selector
+    return params
+
+
+def build_index(vectors: np.ndarray, index_type: str = INDEX_TYPE):
+    """
+    Build, train and fill a FAISS index for ``vectors`` (float32, shape n x d)
+
+    Falls back to an exact flat index when the corpus is too small to train the
+    requested type.
+    """
+    n, d = vectors.shape
+    if index_type not in INDEX_TYPES:
+        logger.warning(f"⚠️ Unknown INDEX_TYPE '{index_type}', using flat")
+        index_type = "flat"
+    if n < _min_training_points(index_type):
+        logger.info(f"📐 {n} vectors is too few to train '{index_type}', using flat")
+        index_type = "flat"
+
+    index = _create_index(index_type, d, n)
+    if not index.is_trained:
+        nlist = faiss.extract_index_ivf(index).nlist
+        sample_size = min(n, max(nlist * MAX_POINTS_PER_CENTROID, _min_training_points(index_type)))
+        sample = vectors[np.random.default_rng(0).choice(n, sample_size, replace=False)]
+        logger.info(f"🏋️ Training '{index_type}' index (nlist={nlist}) on {sample_size} vectors...")
+        index.train(sample)
+
+    index.add(vectors)
+    apply_search_params(index)
+    logger.info(f"📐 Built '{index_type}' index with {index.ntotal} vectors")
+
+    if index_type != "flat":
+        check_recall(index, vectors)
+    return index
+
+
+def _recall_queries(vectors: np.ndarray, count: int) -> np.ndarray:
+    """
+    Sample queries near the corpus but not in it. A corpus vector finds itself at
+    distance zero, which flatters recall, so each sampled vector is moved half-way
+    to its nearest neighbour in a random direction.
+    """
+    rng = np.random.default_rng(1)
+    sample = vectors[rng.choice(vectors.shape[0], count, replace=False)]
+    if vectors.shape[0] < 2:
+        return sample
+    distances, _ = faiss.knn(sample, vectors, 2)
+    radius = np.sqrt(np.maximum(distances[:, 1:2], 0)) / 2
+    # Exact duplicates have no gap to their neighbour; use a typical one
+    radius[radius == 0] = np.median(radius) if np.any(radius) else 1e-3
+    direction = rng.standard_normal(sample.shape).astype(np.float32)
+    direction /= np.linalg.norm(direction, axis=1, keepdims=True)
+    return (sample + direction * radius).astype(np.float32)
+
+
+def check_recall(index, vectors: np.ndarray, k: int = RECALL_CHECK_K, queries: int = RECALL_CHECK_QUERIES) -> float:
+    """Recall@k of ``index`` against exact search, on queries perturbed off the corpus vectors"""
+    n = vectors.shape[0]
+    if not queries or n == 0:
+        return 1.0
+    k = min(k, n)
+    sample = _recall_queries(vectors, min(queries, n))
+    _, exact = faiss.knn(sample, vectors, k)
+    _, approx = index.search(sample, k)
+    hits = sum(len(set(e) & set(a)) for e, a in zip(exact, approx))
+    recall = hits / float(exact.size)
+    if recall < RECALL_CHECK_MIN:
+        logger.warning(f"⚠️ Index recall@{k} is {recall:.3f} (< {RECALL_CHECK_MIN}); raise nprobe/efSearch")
+    else:
+        logger.info(f"🎯 Index recall@{k} vs exact search: {recall:.3f}")
+    return recall
@@ -0,0 +1,85 @@
+"""
+Index Build Jobs
+Rebuilds the knowledge index off the request thread and hot-swaps the result
+"""
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class IndexBuildManager:
+    """Runs index builds on a single background worker and publishes each new generation"""
+
+    def __init__(self, on_ready: Callable[[Dict], None], max_jobs: int = 50):
+        """
+        Args:
+            on_ready: Called with the freshly built chain dict once a build succeeds
+            max_jobs: Number of finished jobs kept for status lookups
+        """
+        self._on_ready = on_ready
+        self._max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-build")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def next_generation(self) -> int:
+        """Reserve the next index generation number"""
+        with self._lock:
+            self._generation += 1
+            return self._generation
+
+    def submit(self, kind: str, build_fn: Callable[[int], Dict]) -> str:
+        """
+        Queue a build. ``build_fn`` receives the generation number reserved for it
+        and must return a complete chain dict; it never mutates the live one.
+
+        Returns:
+            str: Job id for status polling
+        """
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "kind": kind,
+                "status": "queued",
+                "generation": None,
+                "created_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None
+            }
+            while len(self._jobs) > self._max_jobs:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job_id, build_fn)
+        logger.info(f"🗂️ Queued index {kind} job {job_id}")
+        return job_id
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id: str, build_fn: Callable[[int], Dict]):
+        generation = self.next_generation()
+        self._update(job_id, status="running", generation=generation, started_at=datetime.now().isoformat())
+        try:
+            chain = build_fn(generation)
+            self._on_ready(chain)
+            self._update(job_id, status="completed", finished_at=datetime.now().isoformat())
+            logger.info(f"✅ Index job {job_id} published generation {generation}")
+        except Exception as e:
+            logger.error(f"❌ Index job {job_id} failed: {e}")
+            self._update(job_id, status="failed", error=str(e), finished_at=datetime.now().isoformat())
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of a job's status"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
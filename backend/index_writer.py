@@ -0,0 +1,321 @@
+"""
+Index Writer
+Write-behind buffering for incremental additions to the FAISS vectorstore.
+Additions are searchable immediately, journaled to a small append log and
+flushed to disk in coalesced batches instead of one full rewrite per document.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+APPEND_LOG_NAME = "append.log"
+MANIFEST_NAME = "manifest.json"
+STAGING_INDEX_NAME = "index.staging"
+
+# Serializes writers of the on-disk index and tracks which vectorstore owns it,
+# so a retired generation can never overwrite the files of a newer one
+index_file_lock = threading.Lock()
+_disk_owner = None
+# Owner to restore if the build in progress fails or is discarded
+_owner_before_build = None
+
+
+def read_log(index_path: str) -> List[dict]:
+    """Journaled additions in the append log, oldest first"""
+    log_path = os.path.join(index_path, APPEND_LOG_NAME)
+    if not os.path.exists(log_path):
+        return []
+    entries = []
+    with open(log_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn final line from a crash mid-append
+                continue
+    return entries
+
+
+def _rewrite_log(log_path: str, drop_ids: set):
+    """Remove the entries with ``drop_ids`` from the append log"""
+    if not os.path.exists(log_path):
+        return
+    tmp_path = log_path + ".tmp"
+    with open(log_path, encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+        for line in src:
+            try:
+                if json.loads(line)["id"] in drop_ids:
+                    continue
+            except ValueError:
+                continue
+            dst.write(line)
+    os.replace(tmp_path, log_path)
+
+
+def save_index_files(vectorstore, index_path: str):
+    """
+    Save the index next to the live one and move it into place, so a reader never
+    sees a half-written index. Caller holds index_file_lock.
+    """
+    vectorstore.save_local(index_path, index_name=STAGING_INDEX_NAME)
+    for ext in ("faiss", "pkl"):
+        os.replace(
+            os.path.join(index_path, f"{STAGING_INDEX_NAME}.{ext}"),
+            os.path.join(index_path, f"index.{ext}")
+        )
+
+
+def _update_manifest_chunk_count(index_path: str, chunk_count: int):
+    """Keep the manifest's chunk count in step with a flushed index"""
+    manifest_path = os.path.join(index_path, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        # No manifest: the index is already treated as stale
+        return
+    manifest["chunk_count"] = chunk_count
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def begin_index_build(index_path: str) -> frozenset:
+    """
+    Freeze the on-disk index while a new generation is built. The live generation
+    stops flushing, so every addition it takes meanwhile stays in the append log
+    until the build is published (``claim_index_files``) or abandoned
+    (``abort_index_build``).
+
+    Returns:
+        Ids journaled so far; the build reads its corpus afterwards, so it contains them
+    """
+    global _disk_owner, _owner_before_build
+    with index_file_lock:
+        if _disk_owner is not None:
+            _owner_before_build = _disk_owner
+        _disk_owner = None
+        return frozenset(entry["id"] for entry in read_log(index_path))
+
+
+def abort_index_build():
+    """Give the on-disk index back to the generation that owned it before a failed or discarded build"""
+    global _disk_owner
+    with index_file_lock:
+        if _disk_owner is None:
+            _disk_owner = _owner_before_build
+
+
+def claim_index_files(vectorstore, index_path: str, clear_log: bool = False, drop_ids: Optional[set] = None):
+    """
+    Make ``vectorstore`` the owner of the on-disk index. Caller holds index_file_lock.
+
+    Args:
+        clear_log: Discard the whole append log
+        drop_ids: Discard just these journal entries (already part of ``vectorstore``)
+    """
+    global _disk_owner
+    _disk_owner = vectorstore
+    log_path = os.path.join(index_path, APPEND_LOG_NAME)
+    if clear_log:
+        if os.path.exists(log_path):
+            os.remove(log_path)
+    elif drop_ids:
+        _rewrite_log(log_path, drop_ids)
+
+
+class ReadWriteLock:
+    """Many concurrent readers or a single writer; waiting writers block new readers"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read_locked(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write_locked(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class IndexWriter:
+    """Guards a vectorstore with a reader/writer lock and flushes additions write-behind"""
+
+    def __init__(self, vectorstore, index_path: str, flush_batch_size: int = 20, flush_interval: float = 30.0,
+                 on_added: Optional[Callable[[int, List[Document]], None]] = None):
+        """
+        Args:
+            vectorstore: LangChain FAISS vectorstore being served
+            index_path: Folder holding the on-disk index and append log
+            flush_batch_size: Flush as soon as this many additions are pending
+            flush_interval: Flush pending additions at most this many seconds after the first one
+            on_added: Called under the write lock with the first new FAISS id and the
+                added documents, to keep side indexes in step with the vectorstore
+        """
+        self.vectorstore = vectorstore
+        self.on_added = on_added
+        self.index_path = index_path
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval = flush_interval
+        self.lock = ReadWriteLock()
+        self._log_path = os.path.join(index_path, APPEND_LOG_NAME)
+        self._state_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending_ids = []
+        self._first_pending_at = None
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="index-flush")
+        self._flusher.start()
+
+    def _append_to_log(self, entries: List[dict]):
+        os.makedirs(self.index_path, exist_ok=True)
+        with open(self._log_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def add_documents(self, documents: List[Document]) -> List[str]:
+        """Journal documents, make them searchable right away and schedule a flush"""
+        ids = [str(uuid.uuid4()) for _ in documents]
+        self._append_to_log([
+            {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata}
+            for doc_id, doc in zip(ids, documents)
+        ])
+        self._add_in_memory(documents, ids)
+        return ids
+
+    def _add_in_memory(self, documents: List[Document], ids: List[str]):
+        # Embed outside the lock so searches are only blocked for the index append
+        embeddings = self.vectorstore.embeddings.embed_documents([doc.page_content for doc in documents])
+        with self.lock.write_locked():
+            start_id = self.vectorstore.index.ntotal
+            self.vectorstore.add_embeddings(
+                list(zip([doc.page_content for doc in documents], embeddings)),
+                metadatas=[doc.metadata for doc in documents],
+                ids=ids
+            )
+            if self.on_added:
+                self.on_added(start_id, documents)
+        with self._state_lock:
+            self._pending_ids.extend(ids)
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            if len(self._pending_ids) >= self.flush_batch_size:
+                self._wakeup.set()
+
+    def replay_log(self) -> int:
+        """Re-apply journaled additions that never reached the on-disk index"""
+        known_ids = set(self.vectorstore.index_to_docstore_id.values())
+        documents, ids = [], []
+        for entry in read_log(self.index_path):
+            if entry["id"] in known_ids:
+                continue
+            known_ids.add(entry["id"])
+            documents.append(Document(page_content=entry["page_content"], metadata=entry.get("metadata", {})))
+            ids.append(entry["id"])
+        if documents:
+            self._add_in_memory(documents, ids)
+            logger.info(f"♻️ Replayed {len(documents)} journaled additions into the index")
+        return len(documents)
+
+    @contextmanager
+    def read_locked(self):
+        """Hold while searching the vectorstore"""
+        with self.lock.read_locked():
+            yield
+
+    def _flush_due(self) -> bool:
+        with self._state_lock:
+            if not self._pending_ids:
+                return False
+            return (len(self._pending_ids) >= self.flush_batch_size or
+                    time.monotonic() - self._first_pending_at >= self.flush_interval)
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(timeout=max(1.0, self.flush_interval / 4))
+            self._wakeup.clear()
+            if self._closed:
+                break
+            if self._flush_due():
+                self.flush()
+
+    def flush(self) -> bool:
+        """Write the whole index to disk once for every addition pending so far"""
+        with self._flush_lock:
+            with self._state_lock:
+                flushed_ids = list(self._pending_ids)
+            if not flushed_ids:
+                return True
+            try:
+                with index_file_lock:
+                    if self._closed or _disk_owner is not self.vectorstore:
+                        # Retired, or a build is in progress; the append log keeps the additions
+                        logger.info("⏭️ Skipping flush: this generation does not own the on-disk index")
+                        return False
+                    with self.lock.read_locked():
+                        save_index_files(self.vectorstore, self.index_path)
+                        chunk_count = self.vectorstore.index.ntotal
+                    _update_manifest_chunk_count(self.index_path, chunk_count)
+                    self._compact_log(set(flushed_ids))
+            except Exception as e:
+                logger.error(f"❌ Error flushing index: {e}")
+                return False
+            with self._state_lock:
+                flushed = set(flushed_ids)
+                self._pending_ids = [i for i in self._pending_ids if i not in flushed]
+                self._first_pending_at = time.monotonic() if self._pending_ids else None
+            logger.info(f"💾 Flushed {len(flushed_ids)} additions to disk in one write")
+            return True
+
+    def _compact_log(self, flushed_ids: set):
+        """Drop journal entries that are now part of the on-disk index"""
+        _rewrite_log(self._log_path, flushed_ids)
+
+    def pending_count(self) -> int:
+        with self._state_lock:
+            return len(self._pending_ids)
+
+    def close(self, flush: bool = False):
+        """Stop the flusher; retired generations close without flushing"""
+        if flush:
+            self.flush()
+        self._closed = True
+        self._wakeup.set()
@@ -0,0 +1,86 @@
+"""
+Keyword Matcher
+Finds every label whose keywords occur in a text in one pass. The keyword set
+is compiled once into a trie-shaped regular expression, so the scan walks a
+shared-prefix automaton in C instead of testing each keyword separately.
+"""
+import re
+from typing import Dict, Iterable, List
+
+# Keywords this short must match a whole word ('cv' must not hit 'cvs', 'ml' not 'html')
+SHORT_KEYWORD_LENGTH = 3
+_WORD_CHARS = "a-z0-9"
+
+
+class KeywordMatcher:
+    """Multi-pattern matcher mapping keywords to labels with word-boundary awareness"""
+
+    def __init__(self, keywords_by_label: Dict[str, Iterable[str]], whole_words: bool = False):
+        """
+        Args:
+            keywords_by_label: Ordered mapping of label -> keywords. Matches are
+                returned in this label order.
+            whole_words: Every keyword must end at a word boundary, however long
+
+        Every match must start at a word boundary. Short keywords must also end
+        at one; longer keywords match word prefixes ('robot' matches 'robotics').
+        """
+        # Keywords up to this length must end at a word boundary
+        self._whole_word_length = float("inf") if whole_words else SHORT_KEYWORD_LENGTH
+        self._label_order = {label: i for i, label in enumerate(keywords_by_label)}
+        labels_by_keyword = {}
+        for label, keywords in keywords_by_label.items():
+            for keyword in keywords:
+                labels_by_keyword.setdefault(keyword.casefold(), set()).add(label)
+
+        # Only the longest keyword at each start position is captured, so each
+        # keyword also carries the labels of shorter keywords it contains as a prefix
+        self._labels = {}
+        for keyword in labels_by_keyword:
+            labels = set()
+            for other, other_labels in labels_by_keyword.items():
+                if keyword.startswith(other) and self._ends_ok(other, keyword[len(other):len(other) + 1]):
+                    labels |= other_labels
+            self._labels[keyword] = labels
+
+        trie = {}
+        for keyword in labels_by_keyword:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[""] = True
+        self._pattern = re.compile(
+            f"(?<![{_WORD_CHARS}])(?=({self._trie_pattern(trie, 0)}))"
+        )
+
+    def _ends_ok(self, keyword: str, next_char: str) -> bool:
+        if len(keyword) > self._whole_word_length or not next_char:
+            return True
+        return not re.match(f"[{_WORD_CHARS}]", next_char)
+
+    def _trie_pattern(self, node: dict, depth: int) -> str:
+        """Regex for a trie node; longer continuations are tried before ending here"""
+        alternatives = [
+            re.escape(ch) + self._trie_pattern(child, depth + 1)
+            for ch, child in sorted(node.items()) if ch
+        ]
+        if "" in node:
+            alternatives.append(f"(?![{_WORD_CHARS}])" if depth <= self._whole_word_length else "")
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    def match(self, text: str) -> List[str]:
+        """All labels with a keyword in ``text``, in declaration order"""
+        found = set()
+        for m in self._pattern.finditer(text.casefold()):
+            found |= self._labels[m.group(1)]
+        return sorted(found, key=self._label_order.__getitem__)
+
+    def first(self, text: str):
+        """The first label (in declaration order) with a keyword in ``text``, or None"""
+        labels = self.match(text)
+        return labels[0] if labels else None
+
+    def matches(self, text: str) -> bool:
+        return self._pattern.search(text.casefold()) is not None
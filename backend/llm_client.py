@@ -0,0 +1,385 @@
+"""
+LLM Client
+The text-generation interface stored in ``llm_chain["gemini_model"]``: Google
+Gemini in production, or a deterministic local stand-in for offline load tests.
+Both record call latency and token usage in the metrics registry.
+"""
+import asyncio
+import functools
+from abc import ABC, abstractmethod
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import AsyncIterator, Iterator, Optional
+
+from config import (
+    LLM_PROVIDER, GOOGLE_API_KEY, GEMINI_MODEL,
+    LOCAL_LLM_LATENCY_DISTRIBUTION, LOCAL_LLM_LATENCY_MS, LOCAL_LLM_LATENCY_SPREAD,
+    LOCAL_LLM_CHUNK_INTERVAL_MS, LOCAL_LLM_CHUNK_WORDS, LOCAL_LLM_RESPONSE_WORDS,
+    LOCAL_LLM_ERROR_RATE, LOCAL_LLM_SEED
+)
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _record_usage(usage_metadata):
+    if usage_metadata is None:
+        return
+    metrics.increment("llm.prompt_tokens", getattr(usage_metadata, "prompt_token_count", 0) or 0)
+    metrics.increment("llm.output_tokens", getattr(usage_metadata, "candidates_token_count", 0) or 0)
+
+
+class LLMClient(ABC):
+    """
+    Interface every client implements, mirroring ``genai.GenerativeModel``:
+    ``generate_content(prompt)`` returns a response with ``.text`` and
+    ``.usage_metadata``; with ``stream=True`` it returns an iterator of such chunks.
+    ``system_instruction`` carries a static prefix that is not resent as prompt text.
+    ``timeout`` (seconds) makes the provider give up on the call, or on the whole
+    stream, so an attempt the caller has abandoned cannot run forever.
+    ``generate_content_async`` is the awaitable counterpart used by the async server.
+    """
+
+    model_name = None
+
+    @abstractmethod
+    def generate_content(self, prompt: str, stream: bool = False, system_instruction: Optional[str] = None,
+                         timeout: Optional[float] = None, **kwargs):
+        """Generate a response, or an iterator of chunks with ``stream=True``"""
+
+    async def generate_content_async(self, prompt: str, stream: bool = False,
+                                     system_instruction: Optional[str] = None, timeout: Optional[float] = None,
+                                     **kwargs):
+        """
+        Awaitable ``generate_content``; with ``stream=True`` it returns an async iterator
+        of chunks. This default runs the blocking call on the loop's executor, so
+        clients with a native async API override it.
+        """
+        call = functools.partial(self.generate_content, prompt, stream=stream,
+                                 system_instruction=system_instruction, timeout=timeout, **kwargs)
+        response = await asyncio.get_running_loop().run_in_executor(None, call)
+        return _iterate_in_executor(response) if stream else response
+
+
+async def _iterate_in_executor(chunks: Iterator) -> AsyncIterator:
+    """Drain a blocking iterator one ``next`` at a time on the loop's executor"""
+    loop = asyncio.get_running_loop()
+    done = object()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(None, next, chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            try:
+                close()
+            except ValueError:
+                # Cancelled while ``next`` still runs on the executor; it is dropped when that returns
+                pass
+
+
+class GeminiClient(LLMClient):
+    """Google Gemini through google.generativeai"""
+
+    def __init__(self, model_name: str = GEMINI_MODEL, api_key: str = GOOGLE_API_KEY):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.model_name = model_name
+        # One model per system instruction, so each static prefix is set up once
+        self._models = {None: genai.GenerativeModel(model_name)}
+        self._models_lock = threading.Lock()
+
+    def _model_for(self, system_instruction: Optional[str]):
+        with self._models_lock:
+            model = self._models.get(system_instruction)
+            if model is None:
+                model = self._models[system_instruction] = self._genai.GenerativeModel(
+                    self.model_name, system_instruction=system_instruction
+                )
+            return model
+
+    @staticmethod
+    def _request_options(timeout: Optional[float], kwargs) -> dict:
+        if timeout is not None:
+            kwargs["request_options"] = {**kwargs.get("request_options", {}), "timeout": timeout}
+        return kwargs
+
+    def generate_content(self, prompt: str, stream: bool = False, system_instruction: Optional[str] = None,
+                         timeout: Optional[float] = None, **kwargs):
+        metrics.increment("llm.calls")
+        started = time.perf_counter()
+        try:
+            response = self._model_for(system_instruction).generate_content(
+                prompt, stream=stream, **self._request_options(timeout, kwargs)
+            )
+        except Exception:
+            metrics.increment("llm.errors")
+            raise
+        if stream:
+            return self._stream(response, started)
+        metrics.observe("llm_latency_ms", (time.perf_counter() - started) * 1000)
+        _record_usage(getattr(response, "usage_metadata", None))
+        return response
+
+    def _stream(self, response, started) -> Iterator:
+        usage_metadata = None
+        try:
+            for chunk in response:
+                usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+                yield chunk
+        except Exception:
+            metrics.increment("llm.errors")
+            raise
+        metrics.observe("llm_latency_ms", (time.perf_counter() - started) * 1000)
+        _record_usage(usage_metadata)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False,
+                                     system_instruction: Optional[str] = None, timeout: Optional[float] = None,
+                                     **kwargs):
+        """Native async call through the SDK's grpc.aio transport; no thread per call"""
+        metrics.increment("llm.calls")
+        started = time.perf_counter()
+        try:
+            response = await self._model_for(system_instruction).generate_content_async(
+                prompt, stream=stream, **self._request_options(timeout, kwargs)
+            )
+        except Exception:
+            metrics.increment("llm.errors")
+            raise
+        if stream:
+            return self._stream_async(response, started)
+        metrics.observe("llm_latency_ms", (time.perf_counter() - started) * 1000)
+        _record_usage(getattr(response, "usage_metadata", None))
+        return response
+
+    async def _stream_async(self, response, started) -> AsyncIterator:
+        usage_metadata = None
+        try:
+            async for chunk in response:
+                usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+                yield chunk
+        except Exception:
+            metrics.increment("llm.errors")
+            raise
+        metrics.observe("llm_latency_ms", (time.perf_counter() - started) * 1000)
+        _record_usage(usage_metadata)
+
+
+class LocalLLMError(Exception):
+    """Failure injected by the local stand-in"""
+
+
+class LocalLLMTimeout(TimeoutError):
+    """The local stand-in gave up at the caller's timeout, as the provider would"""
+
+
+class LocalLLMClient(LLMClient):
+    """
+    Offline stand-in with Gemini's call shape. Output text is a pure function of the
+    prompt; latency and injected errors come from a seeded generator, so a load test
+    replays the same sequence every run.
+    """
+
+    _VOCABULARY = (
+        "arvind built computer vision projects with python and opencv during his studies "
+        "the robotics work used ros sensors and autonomous navigation on real hardware "
+        "he trained deep learning models for object detection tracking and segmentation "
+        "at university he focused on machine learning research and published results"
+    ).split()
+
+    def __init__(self, latency_distribution: str = LOCAL_LLM_LATENCY_DISTRIBUTION,
+                 latency_ms: float = LOCAL_LLM_LATENCY_MS, latency_spread: float = LOCAL_LLM_LATENCY_SPREAD,
+                 chunk_interval_ms: float = LOCAL_LLM_CHUNK_INTERVAL_MS, chunk_words: int = LOCAL_LLM_CHUNK_WORDS,
+                 response_words: int = LOCAL_LLM_RESPONSE_WORDS, error_rate: float = LOCAL_LLM_ERROR_RATE,
+                 seed: int = LOCAL_LLM_SEED):
+        """
+        Args:
+            latency_distribution: "fixed", "uniform" or "lognormal" time to first token
+            latency_ms: Median time to first token
+            latency_spread: Lognormal sigma, or the +/- fraction of a uniform spread
+            chunk_interval_ms: Delay between streamed chunks
+            chunk_words: Words per streamed chunk
+            response_words: Words in a generated answer
+            error_rate: Fraction of calls that raise LocalLLMError
+            seed: Seed for latency and error sampling
+        """
+        self.model_name = "local-stand-in"
+        self.latency_distribution = latency_distribution
+        self.latency_ms = latency_ms
+        self.latency_spread = latency_spread
+        self.chunk_interval_ms = chunk_interval_ms
+        self.chunk_words = max(1, chunk_words)
+        self.response_words = response_words
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _sample_call(self):
+        """(first-token latency in seconds, chunk index to fail at or None)"""
+        with self._rng_lock:
+            if self.latency_distribution == "fixed":
+                latency_ms = self.latency_ms
+            elif self.latency_distribution == "uniform":
+                latency_ms = self.latency_ms * self._rng.uniform(1 - self.latency_spread, 1 + self.latency_spread)
+            else:
+                latency_ms = self.latency_ms * math.exp(self._rng.gauss(0, self.latency_spread))
+            fail_at = None
+            if self._rng.random() < self.error_rate:
+                # Half the injected failures happen mid-stream
+                fail_at = 0 if self._rng.random() < 0.5 else self._rng.randint(1, 8)
+        return max(0.0, latency_ms) / 1000, fail_at
+
+    def _text_for(self, prompt: str) -> str:
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        words = lambda n: [rng.choice(self._VOCABULARY) for _ in range(n)]
+        tail = prompt.rstrip()
+        if tail.endswith("Title:"):
+            return " ".join(word.capitalize() for word in words(3))
+        if tail.endswith("one per line:"):
+            return "\n".join(f"{' '.join(words(6)).capitalize()}?" for _ in range(3))
+        paragraphs, remaining = [], self.response_words
+        while remaining > 0:
+            size = min(remaining, 40)
+            paragraphs.append(" ".join(words(size)).capitalize() + ".")
+            remaining -= size
+        return "\n\n".join(paragraphs)
+
+    @staticmethod
+    def _response(text: str, prompt_tokens: int, output_tokens: int):
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens
+            )
+        )
+
+    def _prepare(self, prompt: str, system_instruction: Optional[str]):
+        """(prompt as billed, answer text, first-token latency, chunk index to fail at)"""
+        metrics.increment("llm.calls")
+        latency, fail_at = self._sample_call()
+        text = self._text_for(prompt)
+        if system_instruction:
+            # Counted as input, as the provider would
+            prompt = f"{system_instruction}\n{prompt}"
+        return prompt, text, latency, fail_at
+
+    def _total_delay(self, text: str, latency: float) -> float:
+        return latency + self.chunk_interval_ms / 1000 * (len(text.split()) // self.chunk_words)
+
+    @staticmethod
+    def _expires_within(delay: float, deadline: Optional[float]) -> Optional[float]:
+        """Seconds until ``deadline`` if it passes before ``delay`` has elapsed"""
+        if deadline is not None and time.monotonic() + delay > deadline:
+            return max(0.0, deadline - time.monotonic())
+        return None
+
+    def _sleep(self, delay: float, deadline: Optional[float]):
+        """Wait ``delay`` seconds, or give up at ``deadline`` as the provider would"""
+        expires = self._expires_within(delay, deadline)
+        if expires is not None:
+            time.sleep(expires)
+            metrics.increment("llm.errors")
+            raise LocalLLMTimeout("Local LLM call exceeded its timeout")
+        time.sleep(delay)
+
+    async def _sleep_async(self, delay: float, deadline: Optional[float]):
+        expires = self._expires_within(delay, deadline)
+        if expires is not None:
+            await asyncio.sleep(expires)
+            metrics.increment("llm.errors")
+            raise LocalLLMTimeout("Local LLM call exceeded its timeout")
+        await asyncio.sleep(delay)
+
+    def _finish(self, prompt: str, text: str, fail_at, started: float):
+        if fail_at is not None:
+            metrics.increment("llm.errors")
+            raise LocalLLMError("Injected LLM failure")
+        response = self._response(text, estimate_tokens(prompt), estimate_tokens(text))
+        metrics.observe("llm_latency_ms", (time.perf_counter() - started) * 1000)
+        _record_usage(response.usage_metadata)
+        return response
+
+    def _chunk(self, prompt: str, text: str, fail_at, index: int, start: int, words, started: float):
+        """Streamed chunk ``index`` covering ``words[start:]``"""
+        if fail_at is not None and index >= fail_at:
+            metrics.increment("llm.errors")
+            raise LocalLLMError("Injected LLM failure")
+        piece = " ".join(words[start:start + self.chunk_words])
+        if start + self.chunk_words < len(words):
+            return self._response(piece + " ", 0, 0)
+        # Like Gemini, the final chunk carries the usage totals
+        final = self._response(piece, estimate_tokens(prompt), estimate_tokens(text))
+        metrics.observe("llm_latency_ms", (time.perf_counter() - started) * 1000)
+        _record_usage(final.usage_metadata)
+        return final
+
+    def generate_content(self, prompt: str, stream: bool = False, system_instruction: Optional[str] = None,
+                         timeout: Optional[float] = None, **kwargs):
+        prompt, text, latency, fail_at = self._prepare(prompt, system_instruction)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        if stream:
+            return self._stream(prompt, text, latency, fail_at, deadline)
+
+        started = time.perf_counter()
+        self._sleep(self._total_delay(text, latency), deadline)
+        return self._finish(prompt, text, fail_at, started)
+
+    def _stream(self, prompt: str, text: str, latency: float, fail_at, deadline: Optional[float]) -> Iterator:
+        started = time.perf_counter()
+        # Split on spaces only so newlines and markdown survive chunking
+        words = text.split(" ")
+        self._sleep(latency, deadline)
+        for index, start in enumerate(range(0, len(words), self.chunk_words)):
+            if index:
+                self._sleep(self.chunk_interval_ms / 1000, deadline)
+            yield self._chunk(prompt, text, fail_at, index, start, words, started)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False,
+                                     system_instruction: Optional[str] = None, timeout: Optional[float] = None,
+                                     **kwargs):
+        """Same output and timing as ``generate_content``, waiting with asyncio.sleep"""
+        prompt, text, latency, fail_at = self._prepare(prompt, system_instruction)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        if stream:
+            return self._stream_async(prompt, text, latency, fail_at, deadline)
+
+        started = time.perf_counter()
+        await self._sleep_async(self._total_delay(text, latency), deadline)
+        return self._finish(prompt, text, fail_at, started)
+
+    async def _stream_async(self, prompt: str, text: str, latency: float, fail_at,
+                            deadline: Optional[float]) -> AsyncIterator:
+        started = time.perf_counter()
+        words = text.split(" ")
+        await self._sleep_async(latency, deadline)
+        for index, start in enumerate(range(0, len(words), self.chunk_words)):
+            if index:
+                await self._sleep_async(self.chunk_interval_ms / 1000, deadline)
+            yield self._chunk(prompt, text, fail_at, index, start, words, started)
+
+
+def create_llm_client(provider: str = LLM_PROVIDER) -> LLMClient:
+    """LLM client selected by LLM_PROVIDER"""
+    if provider == "local":
+        logger.info("🧪 Using the local LLM stand-in")
+        return LocalLLMClient()
+    if provider != "gemini":
+        logger.warning(f"⚠️ Unknown LLM_PROVIDER '{provider}', using Gemini")
+    return GeminiClient()
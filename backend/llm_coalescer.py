@@ -0,0 +1,207 @@
+"""
+LLM Request Coalescing
+Single-flight wrapper around an LLM client: concurrent identical prompts share
+one upstream call. Blocking callers share the response; streaming callers each
+replay the shared chunk sequence from the start, at their own pace. Coroutines
+coalesce with each other on their event loop.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import AsyncIterator, Dict, Iterator
+
+from llm_client import LLMClient
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One upstream call and everything it has produced so far"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.chunks = []
+        self.response = None
+        self.error = None
+        self.done = False
+        self.subscribers = 1
+
+    def finish(self, response=None, error=None):
+        with self.cond:
+            self.response = response
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+    def wait(self):
+        with self.cond:
+            while not self.done:
+                self.cond.wait()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    def replay(self) -> Iterator:
+        """Yield every chunk from the first, waiting for new ones until the call ends"""
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                if index < len(self.chunks):
+                    chunk = self.chunks[index]
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            index += 1
+            yield chunk
+
+
+class _AsyncFlight:
+    """``_Flight`` for coroutines on one event loop"""
+
+    def __init__(self):
+        self.chunks = []
+        self.response = None
+        self.error = None
+        self.done = False
+        self.subscribers = 1
+        self.task = None  # Keeps the upstream task referenced until it lands
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        # Wake everyone waiting now; later waiters wait on a fresh event
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def add_chunk(self, chunk):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, response=None, error=None):
+        self.response = response
+        self.error = error
+        self.done = True
+        self._notify()
+
+    async def wait(self):
+        while not self.done:
+            await self._changed.wait()
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    async def replay(self) -> AsyncIterator:
+        index = 0
+        while True:
+            while index >= len(self.chunks) and not self.done:
+                await self._changed.wait()
+            if index < len(self.chunks):
+                chunk = self.chunks[index]
+            elif self.error is not None:
+                raise self.error
+            else:
+                return
+            index += 1
+            yield chunk
+
+
+class SingleFlightLLM(LLMClient):
+    """Coalesces identical in-flight ``generate_content`` calls on a wrapped client"""
+
+    def __init__(self, client: LLMClient):
+        self._client = client
+        self.model_name = client.model_name
+        self._flights: Dict[tuple, _Flight] = {}
+        self._lock = threading.Lock()
+        metrics.register_gauge("llm_inflight", self.stats)
+
+    @staticmethod
+    def _key(prompt, stream: bool, kwargs: dict) -> tuple:
+        digest = hashlib.sha256(str(prompt).encode("utf-8"))
+        digest.update(repr(sorted(kwargs.items())).encode("utf-8"))
+        return (digest.hexdigest(), stream)
+
+    def _join(self, key, flight_type=_Flight):
+        """(flight, is_leader) for ``key``"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.subscribers += 1
+                metrics.increment("llm.coalesced")
+                return flight, False
+            flight = self._flights[key] = flight_type()
+            return flight, True
+
+    def _land(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if flight.subscribers > 1:
+            logger.info(f"🛬 One LLM call served {flight.subscribers} identical requests")
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        key = self._key(prompt, stream, kwargs)
+        flight, is_leader = self._join(key)
+        if stream:
+            if is_leader:
+                # The upstream stream is drained on its own thread, so a subscriber
+                # that disconnects early never stalls the others
+                threading.Thread(
+                    target=self._pump, args=(key, flight, prompt, kwargs), daemon=True, name="llm-stream"
+                ).start()
+            return flight.replay()
+
+        if is_leader:
+            try:
+                flight.finish(response=self._client.generate_content(prompt, **kwargs))
+            except Exception as e:
+                flight.finish(error=e)
+            finally:
+                self._land(key, flight)
+        return flight.wait()
+
+    def _pump(self, key, flight, prompt, kwargs):
+        try:
+            for chunk in self._client.generate_content(prompt, stream=True, **kwargs):
+                with flight.cond:
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+            flight.finish()
+        except Exception as e:
+            flight.finish(error=e)
+        finally:
+            self._land(key, flight)
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        # Async flights are bound to their loop, so they never mix with threaded ones
+        key = self._key(prompt, stream, kwargs) + (id(asyncio.get_running_loop()),)
+        flight, is_leader = self._join(key, _AsyncFlight)
+        if is_leader:
+            # The upstream call runs as its own task, so a caller that is cancelled
+            # (e.g. a disconnected client) never strands the others
+            flight.task = asyncio.ensure_future(self._run_async(key, flight, prompt, stream, kwargs))
+        return flight.replay() if stream else await flight.wait()
+
+    async def _run_async(self, key, flight, prompt, stream, kwargs):
+        try:
+            if stream:
+                async for chunk in await self._client.generate_content_async(prompt, stream=True, **kwargs):
+                    flight.add_chunk(chunk)
+                flight.finish()
+            else:
+                flight.finish(response=await self._client.generate_content_async(prompt, **kwargs))
+        except Exception as e:
+            flight.finish(error=e)
+        finally:
+            self._land(key, flight)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "flights": len(self._flights),
+                "waiters": sum(flight.subscribers for flight in self._flights.values())
+            }
@@ -8,257 +8,573 @@ import faiss
 # LangChain and Gemini imports
 from langchain_community.vectorstores import FAISS as LCFAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
-import google.generativeai as genai
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableParallel
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from config import (
     CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL, 
-    SEARCH_K, GOOGLE_API_KEY, GEMINI_MODEL, TEMPERATURE
+    SEARCH_K, SEARCH_FETCH_K, RRF_K, BM25_K1, BM25_B,
+    TEMPERATURE, LLM_COALESCE_REQUESTS,
+    LLM_MAX_CONCURRENCY, LLM_QUEUE_LIMITS, LLM_QUEUE_TIMEOUT,
+    MAX_RETRIES, RETRY_DELAY, REQUEST_TIMEOUT, LLM_STREAM_TIMEOUT,
+    LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_DELAY_MS, LLM_HEDGE_MAX_RATIO, LLM_HEDGE_PRIORITIES,
+    FAISS_INDEX_PATH, EMBEDDING_CACHE_BATCH_SIZE,
+    CONTRIBUTION_FLUSH_BATCH_SIZE, CONTRIBUTION_FLUSH_INTERVAL, INDEX_TYPE,
+    QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL
 )
+from embedding_cache import CachedEmbeddings, QueryEmbeddingCache
+from metrics import metrics
+from index_factory import build_index, apply_search_params, search_parameters
+from keyword_matcher import KeywordMatcher
+from prompt_builder import is_follow_up
+from tag_index import TagIndex
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from question_index import QuestionIndex
+from llm_client import create_llm_client
+from llm_coalescer import SingleFlightLLM
+from llm_scheduler import LLMScheduler, ScheduledLLM
+from llm_resilience import ResilientLLM
+from index_writer import (
+    IndexWriter, index_file_lock, claim_index_files, begin_index_build, abort_index_build, read_log,
+    save_index_files, MANIFEST_NAME
+)
+import hashlib
 import logging
+from contextlib import nullcontext
 from typing import List, Optional
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 
 logger = logging.getLogger(__name__)
 
+# Shared across index generations: query vectors only depend on the embedding model
+query_embedding_cache = QueryEmbeddingCache(
+    max_size=QUERY_EMBEDDING_CACHE_SIZE,
+    ttl=QUERY_EMBEDDING_CACHE_TTL
+)
+metrics.register_gauge("query_embedding_cache", query_embedding_cache.stats)
+
+# One concurrency budget for every outbound LLM call, across index generations
+llm_scheduler = LLMScheduler(
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    queue_limits=LLM_QUEUE_LIMITS,
+    queue_timeout=LLM_QUEUE_TIMEOUT
+)
+metrics.register_gauge("llm_scheduler", llm_scheduler.stats)
+
+# Keywords used to tag chunks at ingest time
+CONTEXT_TAG_KEYWORDS = {
+    'computer_vision': ['computer vision', 'cv', 'object detection', 'yolo', 'image processing', 'opencv', 'cnn', 'rcnn', 'segmentation', 'face detection', 'tracking'],
+    'machine_learning': ['machine learning', 'ml', 'deep learning', 'neural network', 'tensorflow', 'pytorch', 'model training', 'classification', 'regression'],
+    'robotics': ['robot', 'robotics', 'autonomous', 'navigation', 'ros', 'arduino', 'sensor', 'actuator'],
+    'education': ['education', 'degree', 'university', 'college', 'gpa', 'course', 'academic', 'studied', 'graduated'],
+    'experience': ['experience', 'intern', 'work', 'job', 'company', 'role', 'position', 'worked at', 'employed'],
+    'projects': ['project', 'developed', 'built', 'created', 'implemented', 'designed', 'application'],
+    'skills': ['skill', 'proficient', 'programming', 'language', 'framework', 'tool', 'python', 'javascript', 'react'],
+    'research': ['research', 'paper', 'publication', 'study', 'analysis', 'experiment'],
+    'achievements': ['award', 'achievement', 'recognition', 'certificate', 'win', 'winner', 'competition'],
+    'nlp': ['nlp', 'natural language', 'text processing', 'sentiment', 'chatbot', 'language model'],
+    'web_development': ['web', 'website', 'frontend', 'backend', 'api', 'react', 'flask', 'django'],
+    'data_science': ['data science', 'data analysis', 'visualization', 'pandas', 'numpy', 'analytics']
+}
+
+# Keywords used to route a query to a context
+QUERY_CONTEXT_KEYWORDS = {
+    'computer_vision': ['computer vision', 'cv', 'object detection', 'yolo', 'image', 'vision', 'detect', 'tracking', 'opencv'],
+    'machine_learning': ['machine learning', 'ml', 'deep learning', 'model', 'training', 'neural', 'ai'],
+    'robotics': ['robot', 'robotics', 'autonomous', 'navigation', 'ros', 'sensor'],
+    'education': ['education', 'degree', 'university', 'study', 'academic', 'gpa', 'college', 'school'],
+    'experience': ['experience', 'work', 'intern', 'job', 'company', 'worked'],
+    'projects': ['project', 'built', 'developed', 'created', 'application'],
+    'skills': ['skill', 'programming', 'language', 'framework', 'proficient', 'know'],
+    'research': ['research', 'paper', 'publication', 'study'],
+    'achievements': ['award', 'achievement', 'win', 'certificate', 'competition'],
+    'nlp': ['nlp', 'natural language', 'text', 'chatbot', 'language model'],
+    'web_development': ['web', 'website', 'frontend', 'backend', 'api', 'development'],
+    'data_science': ['data', 'analysis', 'analytics', 'visualization']
+}
+
+# Compiled once at import; each match is a single pass over the text
+_context_tag_matcher = KeywordMatcher(CONTEXT_TAG_KEYWORDS)
+_query_context_matcher = KeywordMatcher(QUERY_CONTEXT_KEYWORDS)
+
 def _detect_context_tags(text):
     """Auto-detect context tags from text content for filtering"""
-    text_lower = text.lower()
-    
-    context_keywords = {
-        'computer_vision': ['computer vision', 'cv', 'object detection', 'yolo', 'image processing', 'opencv', 'cnn', 'rcnn', 'segmentation', 'face detection', 'tracking'],
-        'machine_learning': ['machine learning', 'ml', 'deep learning', 'neural network', 'tensorflow', 'pytorch', 'model training', 'classification', 'regression'],
-        'robotics': ['robot', 'robotics', 'autonomous', 'navigation', 'ros', 'arduino', 'sensor', 'actuator'],
-        'education': ['education', 'degree', 'university', 'college', 'gpa', 'course', 'academic', 'studied', 'graduated'],
-        'experience': ['experience', 'intern', 'work', 'job', 'company', 'role', 'position', 'worked at', 'employed'],
-        'projects': ['project', 'developed', 'built', 'created', 'implemented', 'designed', 'application'],
-        'skills': ['skill', 'proficient', 'programming', 'language', 'framework', 'tool', 'python', 'javascript', 'react'],
-        'research': ['research', 'paper', 'publication', 'study', 'analysis', 'experiment'],
-        'achievements': ['award', 'achievement', 'recognition', 'certificate', 'win', 'winner', 'competition'],
-        'nlp': ['nlp', 'natural language', 'text processing', 'sentiment', 'chatbot', 'language model'],
-        'web_development': ['web', 'website', 'frontend', 'backend', 'api', 'react', 'flask', 'django'],
-        'data_science': ['data science', 'data analysis', 'visualization', 'pandas', 'numpy', 'analytics']
-    }
-    
-    detected_tags = []
-    for tag, keywords in context_keywords.items():
-        if any(keyword in text_lower for keyword in keywords):
-            detected_tags.append(tag)
-    
+    detected_tags = _context_tag_matcher.match(text)
     return detected_tags if detected_tags else ['general']
 
 def _detect_query_context(query, conversation_history=None):
     """Detect the contextual domain of a query"""
-    query_lower = query.lower()
-    
-    context_patterns = {
-        'computer_vision': ['computer vision', 'cv', 'object detection', 'yolo', 'image', 'vision', 'detect', 'tracking', 'opencv'],
-        'machine_learning': ['machine learning', 'ml', 'deep learning', 'model', 'training', 'neural', 'ai'],
-        'robotics': ['robot', 'robotics', 'autonomous', 'navigation', 'ros', 'sensor'],
-        'education': ['education', 'degree', 'university', 'study', 'academic', 'gpa', 'college', 'school'],
-        'experience': ['experience', 'work', 'intern', 'job', 'company', 'worked'],
-        'projects': ['project', 'built', 'developed', 'created', 'application'],
-        'skills': ['skill', 'programming', 'language', 'framework', 'proficient', 'know'],
-        'research': ['research', 'paper', 'publication', 'study'],
-        'achievements': ['award', 'achievement', 'win', 'certificate', 'competition'],
-        'nlp': ['nlp', 'natural language', 'text', 'chatbot', 'language model'],
-        'web_development': ['web', 'website', 'frontend', 'backend', 'api', 'development'],
-        'data_science': ['data', 'analysis', 'analytics', 'visualization']
-    }
-    
     # Check conversation history for context continuity
     if conversation_history:
-        recent_text = ' '.join(conversation_history[-3:]).lower()
-        for context, keywords in context_patterns.items():
-            if any(keyword in recent_text for keyword in keywords):
-                # Check if current query is a follow-up (doesn't specify new context)
-                follow_up_indicators = ['more', 'also', 'what about that', 'tell me more', 'and', 'his', 'that', 'those']
-                if any(indicator in query_lower for indicator in follow_up_indicators):
-                    return context
+        recent_context = _query_context_matcher.first(' '.join(conversation_history[-3:]))
+        # Check if current query is a follow-up (doesn't specify new context)
+        if recent_context and is_follow_up(query):
+            return recent_context
     
     # Check current query
-    for context, keywords in context_patterns.items():
-        if any(keyword in query_lower for keyword in keywords):
-            return context
-    
-    return None
+    return _query_context_matcher.first(query)
+
+def _document_tags(doc):
+    """Context tags a chunk can be filtered by, including contexts named in its category"""
+    tags = set(doc.metadata.get('context_tags') or _detect_context_tags(doc.page_content))
+    category = f"{doc.metadata.get('category', '')} {doc.metadata.get('subcategory', '')}".lower()
+    tags.update(context for context in QUERY_CONTEXT_KEYWORDS if context in category)
+    return tags
+
+def _create_embeddings(db):
+    """Create the embedding model wrapped in the persistent content-hash cache"""
+    return CachedEmbeddings(
+        HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
+        db,
+        model_name=EMBEDDING_MODEL,
+        batch_size=EMBEDDING_CACHE_BATCH_SIZE,
+        query_cache=query_embedding_cache
+    )
+
+def _corpus_fingerprint(chunks):
+    """Hash of every chunk's text and metadata, used to detect a stale on-disk index"""
+    digest = hashlib.sha256(f"{EMBEDDING_MODEL}\x00{INDEX_TYPE}".encode("utf-8"))
+    for chunk in chunks:
+        digest.update(chunk.page_content.encode("utf-8"))
+        digest.update(json.dumps(chunk.metadata, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+def _read_index_fingerprint(faiss_index_path):
+    """Fingerprint recorded when the on-disk index was built, if any"""
+    try:
+        with open(os.path.join(faiss_index_path, MANIFEST_NAME)) as f:
+            return json.load(f).get("fingerprint")
+    except (OSError, ValueError):
+        return None
+
+def _write_index_manifest(faiss_index_path, fingerprint, chunk_count):
+    """Record which corpus the on-disk index was built from"""
+    with open(os.path.join(faiss_index_path, MANIFEST_NAME), "w") as f:
+        json.dump({
+            "fingerprint": fingerprint,
+            "chunk_count": chunk_count,
+            "embedding_model": EMBEDDING_MODEL,
+            "index_type": INDEX_TYPE
+        }, f)
+
+def _chunk_ids(chunks):
+    """
+    Docstore ids derived from each chunk's source and text, so recorded chunk ids
+    survive a rebuild; repeats of the same chunk are told apart by occurrence
+    """
+    occurrences = {}
+    ids = []
+    for chunk in chunks:
+        digest = hashlib.sha1(
+            f"{chunk.metadata.get('source', '')}\x00{chunk.page_content}".encode("utf-8")
+        ).hexdigest()
+        occurrence = occurrences.get(digest, 0)
+        occurrences[digest] = occurrence + 1
+        ids.append(digest if occurrence == 0 else f"{digest}-{occurrence}")
+    return ids
+
+def _build_vectorstore(chunks, embeddings):
+    """Embed chunks and index them with the FAISS index type selected in config"""
+    vectors = np.asarray(embeddings.embed_documents([chunk.page_content for chunk in chunks]), dtype=np.float32)
+    index = build_index(vectors)
+    ids = _chunk_ids(chunks)
+    return LCFAISS(
+        embeddings,
+        index,
+        InMemoryDocstore(dict(zip(ids, chunks))),
+        dict(enumerate(ids))
+    )
+
+def _persist_vectorstore(vectorstore, fingerprint, chunk_count):
+    """
+    Save the index next to the live one and move it into place, so a reader never
+    sees a half-written index. The manifest is removed first and written last,
+    which makes an interrupted swap look stale rather than current. Ownership
+    and the append log are settled by ``adopt_index_build`` at publish time.
+    """
+    manifest_path = os.path.join(FAISS_INDEX_PATH, MANIFEST_NAME)
+    with index_file_lock:
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        save_index_files(vectorstore, FAISS_INDEX_PATH)
+        _write_index_manifest(FAISS_INDEX_PATH, fingerprint, chunk_count)
+
+def _create_tag_index(vectorstore):
+    """Build tag -> FAISS id bitmaps for every vector in the store"""
+    tag_index = TagIndex(capacity=vectorstore.index.ntotal)
+    tag_index.add_many(0, [
+        _document_tags(vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]))
+        for i in range(vectorstore.index.ntotal)
+    ])
+    logging.info(f"🏷️ Tag index built: {tag_index.stats()}")
+    return tag_index
+
+def _create_bm25_index(vectorstore):
+    """Build the BM25 inverted index over every chunk, keyed by FAISS id"""
+    bm25_index = BM25Index(k1=BM25_K1, b=BM25_B)
+    bm25_index.add_many(0, [
+        vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]).page_content
+        for i in range(vectorstore.index.ntotal)
+    ])
+    logging.info(f"🔤 BM25 index built: {bm25_index.stats()}")
+    return bm25_index
+
+def _index_added_documents(tag_index, bm25_index):
+    """Callback keeping the side indexes in step with vectorstore additions"""
+    def on_added(start_id, documents):
+        tag_index.add_many(start_id, [_document_tags(doc) for doc in documents])
+        bm25_index.add_many(start_id, [doc.page_content for doc in documents])
+    return on_added
+
+def _create_question_index(documents, user_docs=()):
+    """Index dataset question/answer pairs (and approved Q&A contributions) for exact lookups"""
+    question_index = QuestionIndex()
+    for doc in documents:
+        question_index.add(
+            doc.get('question') or doc.get('prompt'),
+            doc.get('answer'),
+            source=doc.get('source', 'dataset'),
+            category=doc.get('category', 'general')
+        )
+    for doc in user_docs:
+        question_index.add(
+            doc.get('user_question'),
+            doc.get('content'),
+            source='user_contribution',
+            category=doc.get('category', 'general')
+        )
+    logging.info(f"❓ Question index built with {len(question_index)} questions")
+    return question_index
+
+def _create_index_writer(vectorstore, tag_index, bm25_index):
+    """Attach a write-behind writer; it flushes once ``adopt_index_build`` hands it the on-disk index"""
+    return IndexWriter(
+        vectorstore,
+        FAISS_INDEX_PATH,
+        flush_batch_size=CONTRIBUTION_FLUSH_BATCH_SIZE,
+        flush_interval=CONTRIBUTION_FLUSH_INTERVAL,
+        on_added=_index_added_documents(tag_index, bm25_index)
+    )
+
+def adopt_index_build(qa_chain):
+    """
+    Hand the on-disk index to a chain that is being published. Call it under the
+    chain swap lock so no contribution reaches the previous generation afterwards.
+
+    A freshly built index is persisted first. Additions journaled after the build
+    read its corpus are replayed into the new generation; those the build already
+    contains (journaled before it started, or stored in the DB in time) are dropped
+    from the log.
+    """
+    build = qa_chain.pop("index_build", None)
+    if build is None:
+        return
+    vectorstore = qa_chain["vectorstore"]
+    if build["persist"]:
+        _persist_vectorstore(vectorstore, build["fingerprint"], build["chunk_count"])
+    with index_file_lock:
+        indexed_texts = {
+            vectorstore.docstore.search(doc_id).page_content
+            for doc_id in vectorstore.index_to_docstore_id.values()
+        }
+        drop_ids = set(build["journaled"])
+        drop_ids.update(
+            entry["id"] for entry in read_log(FAISS_INDEX_PATH)
+            if entry["page_content"] in indexed_texts
+        )
+        claim_index_files(vectorstore, FAISS_INDEX_PATH, drop_ids=drop_ids)
+    qa_chain["index_writer"].replay_log()
 
-def get_context_filtered_docs(retriever, query, context_filter=None, k=5):
+def _mmr_select(relevance, vectors, k, lambda_mult=0.7):
+    """Greedy MMR over candidates scored by ``relevance``, penalizing cosine similarity to picks"""
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+    selected = [int(np.argmax(relevance))]
+    while len(selected) < min(k, len(relevance)):
+        redundancy = similarity[:, selected].max(axis=1)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        selected.append(int(np.argmax(scores)))
+    return selected
+
+def _hybrid_search(qa_chain, query, k, context_filter=None):
+    """
+    Dense (FAISS) and BM25 candidates fused by reciprocal rank, then diversified
+    with MMR. With ``context_filter`` both retrievers only consider vectors
+    carrying that tag.
+    """
+    vectorstore = qa_chain['vectorstore']
+    tag_index = qa_chain.get('tag_index')
+    bm25_index = qa_chain.get('bm25_index')
+    selector = allowed = None
+    if context_filter:
+        selector = tag_index.selector(context_filter) if tag_index else None
+        if selector is None:
+            return []
+        allowed = lambda faiss_id: tag_index.contains(context_filter, faiss_id)
+
+    query_vector = np.asarray([vectorstore.embeddings.embed_query(query)], dtype=np.float32)
+    index_writer = qa_chain.get('index_writer')
+    with index_writer.read_locked() if index_writer else nullcontext():
+        index = vectorstore.index
+        _, dense_ids = index.search(query_vector, SEARCH_FETCH_K, params=search_parameters(index, selector))
+        dense_ids = [int(i) for i in dense_ids[0] if i != -1]
+        sparse_ids = [i for i, _ in bm25_index.search(query, SEARCH_FETCH_K, allowed=allowed)] if bm25_index else []
+        fused = reciprocal_rank_fusion([dense_ids, sparse_ids], k=RRF_K)[:SEARCH_FETCH_K]
+        if not fused:
+            return []
+        ids = [i for i, _ in fused]
+        candidates = np.vstack([index.reconstruct(i) for i in ids])
+        chunk_ids = [vectorstore.index_to_docstore_id[i] for i in ids]
+        docs = [vectorstore.docstore.search(chunk_id) for chunk_id in chunk_ids]
+
+    relevance = np.array([score for _, score in fused])
+    selected = _mmr_select(relevance / relevance.max(), candidates, k)
+    dense_set = set(dense_ids)
+    metrics.increment("retrieval.bm25_only_results", sum(1 for i in selected if ids[i] not in dense_set))
+    # Copies tagged with their docstore id so a turn can record exactly what it saw
+    return [Document(page_content=docs[i].page_content, metadata={**docs[i].metadata, "chunk_id": chunk_ids[i]})
+            for i in selected]
+
+def _create_retriever(vectorstore):
+    """Create retriever with MMR (Maximum Marginal Relevance) for diversity"""
+    return vectorstore.as_retriever(
+        search_type="mmr",  # Use MMR instead of pure similarity
+        search_kwargs={
+            "k": SEARCH_K,
+            "fetch_k": SEARCH_FETCH_K,  # Fetch more candidates
+            "lambda_mult": 0.7  # Balance between relevance and diversity
+        }
+    )
+
+def get_context_filtered_docs(qa_chain, query, context_filter=None, k=5):
     """Retrieve documents with optional context filtering"""
     try:
-        # Get more candidates for filtering
-        all_docs = retriever.get_relevant_documents(query)
-        
-        if not context_filter or not all_docs:
-            return all_docs[:k]
+        if not context_filter:
+            return _hybrid_search(qa_chain, query, k)
         
-        # Filter by context tags
-        filtered_docs = []
-        for doc in all_docs:
-            metadata = doc.metadata
-            context_tags = metadata.get('context_tags', [])
-            
-            # Match if context is in tags or in other metadata
-            if (context_filter in context_tags or 
-                context_filter in str(metadata.get('category', '')).lower() or
-                context_filter in str(metadata.get('subcategory', '')).lower()):
-                filtered_docs.append(doc)
-                if len(filtered_docs) >= k:
-                    break
+        # Search only the vectors tagged with the context
+        filtered_docs = _hybrid_search(qa_chain, query, k, context_filter=context_filter)
+        matched = len(filtered_docs)
         
         # If not enough context-specific docs, add high-relevance docs
         if len(filtered_docs) < k:
-            for doc in all_docs:
-                if doc not in filtered_docs:
+            seen = {doc.metadata["chunk_id"] for doc in filtered_docs}
+            for doc in _hybrid_search(qa_chain, query, k):
+                if doc.metadata["chunk_id"] not in seen:
+                    seen.add(doc.metadata["chunk_id"])
                     filtered_docs.append(doc)
                     if len(filtered_docs) >= k:
                         break
         
-        logging.info(f"🎯 Context filter '{context_filter}': {len(filtered_docs)} docs selected from {len(all_docs)} candidates")
+        logging.info(f"🎯 Context filter '{context_filter}': {matched} of {len(filtered_docs)} docs from the filtered index")
         return filtered_docs
         
     except Exception as e:
         logging.error(f"Error in context filtering: {str(e)}")
-        return retriever.get_relevant_documents(query)[:k]
+        return _hybrid_search(qa_chain, query, k)
+
+def _dataset_document(doc):
+    """LangChain Document for a dataset row"""
+    # Extract text content - handle different formats
+    # Priority: text > prompt+answer > content > description
+    if doc.get('text'):
+        content = doc.get('text')
+    elif doc.get('prompt') and doc.get('answer'):
+        # Handle prompt/answer format
+        content = f"Question: {doc.get('prompt')}\n\nAnswer: {doc.get('answer')}"
+    elif doc.get('question') and doc.get('answer'):
+        # Handle question/answer format
+        content = f"Question: {doc.get('question')}\n\nAnswer: {doc.get('answer')}"
+    else:
+        content = doc.get('content') or doc.get('description') or str(doc)
+    
+    # Add comprehensive metadata with context tags for filtering
+    metadata = {
+        'source': doc.get('source', 'unknown'),
+        'category': doc.get('category', 'general'),
+        'subcategory': doc.get('subcategory', ''),
+        'difficulty': doc.get('difficulty', ''),
+        'question': doc.get('question') or doc.get('prompt', ''),
+        'answer': doc.get('answer', ''),
+        '_id': str(doc.get('_id', ''))
+    }
+    
+    # Auto-detect context tags from content for better filtering
+    metadata['context_tags'] = _detect_context_tags(content)
+    
+    # Remove empty metadata fields
+    metadata = {k: v for k, v in metadata.items() if v}
+    return Document(page_content=content, metadata=metadata)
 
-def initialize_llm_model(db):
-    """Initialize the AGENTIC RAG system with FAISS vector store and ReAct agent"""
+def _contribution_document(doc):
+    """LangChain Document for an approved user_knowledge row"""
+    content = doc["content"]
+    if doc.get("user_question"):
+        content = f"Question: {doc['user_question']}\n\nAnswer: {content}"
+    
+    metadata = {
+        "source": "user_contribution",
+        "category": doc.get("category", "general"),
+        "created_at": doc.get("created_at")
+    }
+    return Document(page_content=content, metadata=metadata)
+
+def _load_corpus(db):
+    """
+    Dataset rows plus approved user contributions, split with the configured chunking.
+    Every index build reads the corpus through here, so the index persisted by a
+    rebuild and the one checked at the next start fingerprint the same chunks.
+    
+    Returns:
+        (dataset rows, approved contribution rows, chunks)
+    """
+    documents = list(db.dataset.find())
+    user_docs = list(db.user_knowledge.find({"approved": True}))
+    text_docs = [_dataset_document(doc) for doc in documents]
+    text_docs.extend(_contribution_document(doc) for doc in user_docs)
+    logging.info(f"📚 Loaded {len(text_docs)} documents (including {len(user_docs)} user contributions)")
+    
+    # Split documents into chunks
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""],
+        length_function=len
+    )
+    chunks = text_splitter.split_documents(text_docs)
+    logging.info(f"✂️ Split into {len(chunks)} chunks")
+    return documents, user_docs, chunks
+
+def initialize_llm_model(db, generation=1):
+    """
+    Initialize the AGENTIC RAG system with FAISS vector store and ReAct agent
+    
+    Returns a new chain dict tagged with ``generation``; callers publish it by
+    swapping their reference, never by mutating the live dict, and call
+    ``adopt_index_build`` on it while doing so.
+    """
+    # Additions journaled from here on are replayed into this generation at publish
+    journaled = begin_index_build(FAISS_INDEX_PATH)
     try:
         logging.info("🔄 Loading documents from MongoDB...")
-        
-        # Load documents from MongoDB dataset collection
-        dataset_collection = db.dataset
-        documents = list(dataset_collection.find())
+        documents, user_docs, chunks = _load_corpus(db)
         
         if not documents:
             logging.warning("⚠️ No documents found in dataset. RAG will return empty responses.")
             logging.warning("Upload data using POST /api/dataset/upload")
         
-        # Convert MongoDB documents to LangChain Document objects
-        text_docs = []
-        for doc in documents:
-            # Extract text content - handle different formats
-            # Priority: text > prompt+answer > content > description
-            if doc.get('text'):
-                content = doc.get('text')
-            elif doc.get('prompt') and doc.get('answer'):
-                # Handle prompt/answer format
-                content = f"Question: {doc.get('prompt')}\n\nAnswer: {doc.get('answer')}"
-            elif doc.get('question') and doc.get('answer'):
-                # Handle question/answer format
-                content = f"Question: {doc.get('question')}\n\nAnswer: {doc.get('answer')}"
-            else:
-                content = doc.get('content') or doc.get('description') or str(doc)
-            
-            # Add comprehensive metadata with context tags for filtering
-            metadata = {
-                'source': doc.get('source', 'unknown'),
-                'category': doc.get('category', 'general'),
-                'subcategory': doc.get('subcategory', ''),
-                'difficulty': doc.get('difficulty', ''),
-                'question': doc.get('question') or doc.get('prompt', ''),
-                'answer': doc.get('answer', ''),
-                '_id': str(doc.get('_id', ''))
-            }
-            
-            # Auto-detect context tags from content for better filtering
-            metadata['context_tags'] = _detect_context_tags(content)
-            
-            # Remove empty metadata fields
-            metadata = {k: v for k, v in metadata.items() if v}
-            
-            text_docs.append(Document(page_content=content, metadata=metadata))
-        
-        logging.info(f"📚 Loaded {len(text_docs)} documents")
-        
-        # Split documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        chunks = text_splitter.split_documents(text_docs)
-        logging.info(f"✂️ Split into {len(chunks)} chunks")
-        
-        # Create embeddings
+        # Create embeddings (cached by chunk content hash)
         logging.info(f"🧠 Creating embeddings with {EMBEDDING_MODEL}...")
-        embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL
-        )
+        embeddings = _create_embeddings(db)
         
-        # Check if FAISS index already exists
-        faiss_index_path = "/app/faiss_index"
+        # Reuse the on-disk FAISS index only if it was built from this exact corpus
+        faiss_index_path = FAISS_INDEX_PATH
+        fingerprint = _corpus_fingerprint(chunks)
+        vectorstore = None
+        persist = False
         if os.path.exists(faiss_index_path):
-            logging.info("📂 Found existing FAISS index, loading from disk...")
-            try:
-                vectorstore = LCFAISS.load_local(
-                    faiss_index_path, 
-                    embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                logging.info("✅ FAISS index loaded successfully from disk!")
-            except Exception as e:
-                logging.warning(f"⚠️ Failed to load FAISS index: {str(e)}. Rebuilding...")
-                vectorstore = None
-        else:
-            vectorstore = None
+            if _read_index_fingerprint(faiss_index_path) == fingerprint:
+                logging.info("📂 Found up-to-date FAISS index, loading from disk...")
+                try:
+                    vectorstore = LCFAISS.load_local(
+                        faiss_index_path, 
+                        embeddings,
+                        allow_dangerous_deserialization=True
+                    )
+                    apply_search_params(vectorstore.index)
+                    # The saved index predates the log; replay every entry it lacks
+                    journaled = frozenset()
+                    logging.info("✅ FAISS index loaded successfully from disk!")
+                except Exception as e:
+                    logging.warning(f"⚠️ Failed to load FAISS index: {str(e)}. Rebuilding...")
+            else:
+                logging.info("♻️ FAISS index on disk is stale, rebuilding from embedding cache...")
         
-        # Build FAISS vector store if not loaded
+        # Build FAISS vector store if not loaded; only unseen chunks hit the model
         if vectorstore is None:
             logging.info("🗄️ Building FAISS vector store...")
             if chunks:
-                vectorstore = LCFAISS.from_documents(chunks, embeddings)
-                # Save to disk for future use
-                logging.info("💾 Saving FAISS index to disk...")
-                vectorstore.save_local(faiss_index_path)
-                logging.info("✅ FAISS index saved successfully!")
+                vectorstore = _build_vectorstore(chunks, embeddings)
+                # Saved to disk for future use when the chain is published
+                persist = True
             else:
                 # Create empty vectorstore if no documents
                 vectorstore = LCFAISS.from_texts(["No data available"], embeddings)
                 logging.warning("⚠️ Created empty vector store")
         
-        # Initialize Google Gemini client
-        logging.info(f"🤖 Initializing Gemini ({GEMINI_MODEL})...")
-        genai.configure(api_key=GOOGLE_API_KEY)
-        gemini_model = genai.GenerativeModel(GEMINI_MODEL)
+        # Initialize the LLM client (Gemini, or the local stand-in per LLM_PROVIDER)
+        gemini_model = ScheduledLLM(create_llm_client(), llm_scheduler)
+        # Deadline, retries and hedging sit above the scheduler so every attempt takes its own slot
+        gemini_model = ResilientLLM(
+            gemini_model,
+            timeout=REQUEST_TIMEOUT,
+            stream_timeout=LLM_STREAM_TIMEOUT,
+            max_retries=MAX_RETRIES,
+            retry_delay=RETRY_DELAY,
+            hedge_percentile=LLM_HEDGE_PERCENTILE,
+            hedge_min_delay_ms=LLM_HEDGE_MIN_DELAY_MS,
+            hedge_max_ratio=LLM_HEDGE_MAX_RATIO,
+            hedge_priorities=LLM_HEDGE_PRIORITIES
+        )
+        if LLM_COALESCE_REQUESTS:
+            # Identical concurrent prompts (e.g. a shared link's opening question) share one call
+            gemini_model = SingleFlightLLM(gemini_model)
+        logging.info(f"🤖 Initialized LLM client ({gemini_model.model_name})")
         
         # Create retriever with MMR (Maximum Marginal Relevance) for diversity
-        retriever = vectorstore.as_retriever(
-            search_type="mmr",  # Use MMR instead of pure similarity
-            search_kwargs={
-                "k": SEARCH_K,
-                "fetch_k": SEARCH_K * 3,  # Fetch more candidates
-                "lambda_mult": 0.7  # Balance between relevance and diversity
-            }
-        )
+        retriever = _create_retriever(vectorstore)
+        
+        # Tag bitmaps let context-filtered searches skip non-matching vectors
+        tag_index = _create_tag_index(vectorstore)
+        
+        # Exact-token retrieval fused with the dense results
+        bm25_index = _create_bm25_index(vectorstore)
+        
+        # Exact repeats of dataset questions are answered without retrieval or Gemini
+        question_index = _create_question_index(documents, user_docs)
+        
+        # Incremental additions are buffered and flushed to disk in batches
+        index_writer = _create_index_writer(vectorstore, tag_index, bm25_index)
         
         # ============= SIMPLE RAG WITHOUT AGENT (due to proxy issues) =============
         # We'll use direct OpenAI calls instead of LangChain's ChatOpenAI wrapper
         
-        logging.info("✅ RAG system initialized successfully with Gemini!")
+        logging.info(f"✅ RAG system initialized successfully with Gemini! (index generation {generation})")
         
         return {
             "gemini_model": gemini_model,
             "retriever": retriever,
             "vectorstore": vectorstore,
-            "model_name": GEMINI_MODEL,
-            "is_agentic": False
+            "index_writer": index_writer,
+            "tag_index": tag_index,
+            "bm25_index": bm25_index,
+            "question_index": question_index,
+            "model_name": gemini_model.model_name,
+            "is_agentic": False,
+            "generation": generation,
+            "index_build": {
+                "journaled": journaled,
+                "persist": persist,
+                "fingerprint": fingerprint,
+                "chunk_count": len(chunks)
+            }
         }
         
     except Exception as e:
+        abort_index_build()
         logging.error(f"❌ Error initializing LLM model: {str(e)}")
         raise
 
 def get_retriever_context(qa_chain, query, k=3):
     """Get relevant context from vector store without generating answer"""
     try:
-        retriever = qa_chain.get('retriever')
-        if not retriever:
+        if not qa_chain.get('retriever'):
             return "", []
-        docs = retriever.get_relevant_documents(query)[:k]
+        docs = _hybrid_search(qa_chain, query, k)
         context = "\n\n".join([doc.page_content for doc in docs])
         sources = [doc.metadata.get('source', 'unknown') for doc in docs]
         return context, sources
@@ -267,6 +583,26 @@ def get_retriever_context(qa_chain, query, k=3):
         return "", []
 
 
+def get_docs_by_ids(qa_chain, chunk_ids: List[str]) -> Optional[List[Document]]:
+    """
+    Documents for chunk ids recorded by an earlier retrieval, in the same order
+
+    Returns:
+        The documents, or None if any id is gone (e.g. the index was rebuilt since)
+    """
+    vectorstore = qa_chain.get('vectorstore')
+    if not vectorstore or not chunk_ids:
+        return None
+    docs = []
+    for chunk_id in chunk_ids:
+        doc = vectorstore.docstore.search(chunk_id)
+        if not isinstance(doc, Document):
+            # InMemoryDocstore returns an error string for unknown ids
+            return None
+        docs.append(Document(page_content=doc.page_content, metadata={**doc.metadata, "chunk_id": chunk_id}))
+    return docs
+
+
 def add_user_contributions_to_vectorstore(qa_chain, user_documents: List[Document]):
     """
     Add user-contributed documents to the existing FAISS vectorstore
@@ -290,13 +626,14 @@ def add_user_contributions_to_vectorstore(qa_chain, user_documents: List[Documen
         
         logging.info(f"➕ Adding {len(user_documents)} user contributions to vectorstore...")
         
-        # Add documents to existing vectorstore
-        vectorstore.add_documents(user_documents)
-        
-        # Save updated index to disk
-        faiss_index_path = "/app/faiss_index"
-        vectorstore.save_local(faiss_index_path)
-        logging.info("✅ User contributions added and index saved!")
+        # Searchable immediately; the disk write is batched by the index writer
+        index_writer = qa_chain.get('index_writer')
+        if index_writer:
+            index_writer.add_documents(user_documents)
+            logging.info(f"✅ User contributions added ({index_writer.pending_count()} pending flush)")
+        else:
+            vectorstore.add_documents(user_documents)
+            logging.info("✅ User contributions added (in memory only)")
         
         return True
         
@@ -305,98 +642,54 @@ def add_user_contributions_to_vectorstore(qa_chain, user_documents: List[Documen
         return False
 
 
-def rebuild_vectorstore_with_contributions(db, qa_chain):
+def rebuild_vectorstore_with_contributions(db, qa_chain, generation=None):
     """
     Rebuild entire vectorstore including original data + user contributions
     Use this for periodic full refreshes
     
     Args:
         db: MongoDB database connection
-        qa_chain: Current QA chain to update
+        qa_chain: Current QA chain; left untouched so in-flight requests keep working
+        generation: Generation number for the rebuilt index
     
     Returns:
-        Updated qa_chain dict
+        New qa_chain dict sharing the LLM client with the old one; saved to disk
+        by ``adopt_index_build`` when it is published
     """
+    # Contributions journaled from here on are replayed into the new index at publish
+    journaled = begin_index_build(FAISS_INDEX_PATH)
     try:
         logging.info("🔄 Rebuilding vectorstore with user contributions...")
         
-        # Load original documents from dataset
-        dataset_collection = db.dataset
-        documents = list(dataset_collection.find())
-        
-        text_docs = []
-        for doc in documents:
-            if doc.get('text'):
-                content = doc.get('text')
-            elif doc.get('prompt') and doc.get('answer'):
-                content = f"Question: {doc.get('prompt')}\n\nAnswer: {doc.get('answer')}"
-            elif doc.get('question') and doc.get('answer'):
-                content = f"Question: {doc.get('question')}\n\nAnswer: {doc.get('answer')}"
-            elif doc.get('content'):
-                content = doc.get('content')
-            else:
-                continue
-            
-            metadata = {
-                "source": doc.get('source', 'dataset'),
-                "category": doc.get('category', 'general')
-            }
-            text_docs.append(Document(page_content=content, metadata=metadata))
-        
-        # Add user contributions
-        user_knowledge_collection = db.user_knowledge
-        user_docs = list(user_knowledge_collection.find({"approved": True}))
-        
-        for doc in user_docs:
-            content = doc["content"]
-            if doc.get("user_question"):
-                content = f"Question: {doc['user_question']}\n\nAnswer: {content}"
-            
-            metadata = {
-                "source": "user_contribution",
-                "category": doc.get("category", "general"),
-                "created_at": doc.get("created_at")
-            }
-            text_docs.append(Document(page_content=content, metadata=metadata))
-        
-        logging.info(f"📚 Total documents: {len(text_docs)} (including {len(user_docs)} user contributions)")
-        
-        # Split into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        chunks = text_splitter.split_documents(text_docs)
-        
-        # Create embeddings
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-        
-        # Build new vectorstore
-        vectorstore = LCFAISS.from_documents(chunks, embeddings)
-        
-        # Save to disk
-        faiss_index_path = "/app/faiss_index"
-        vectorstore.save_local(faiss_index_path)
-        
-        # Update retriever
-        retriever = vectorstore.as_retriever(
-            search_type="mmr",
-            search_kwargs={
-                "k": SEARCH_K,
-                "fetch_k": SEARCH_K * 3,
-                "lambda_mult": 0.7
-            }
-        )
-        
-        # Update qa_chain
-        qa_chain['vectorstore'] = vectorstore
-        qa_chain['retriever'] = retriever
+        documents, user_docs, chunks = _load_corpus(db)
+        
+        # Create embeddings (cached by chunk content hash)
+        embeddings = _create_embeddings(db)
+        
+        # Build new vectorstore; only chunks not seen before are embedded
+        vectorstore = _build_vectorstore(chunks, embeddings)
+        
+        # Build a new chain dict; the caller swaps it in atomically
+        new_chain = dict(qa_chain)
+        new_chain['vectorstore'] = vectorstore
+        new_chain['retriever'] = _create_retriever(vectorstore)
+        new_chain['tag_index'] = _create_tag_index(vectorstore)
+        new_chain['bm25_index'] = _create_bm25_index(vectorstore)
+        new_chain['question_index'] = _create_question_index(documents, user_docs)
+        new_chain['index_writer'] = _create_index_writer(vectorstore, new_chain['tag_index'], new_chain['bm25_index'])
+        new_chain['generation'] = generation if generation is not None else qa_chain.get('generation', 0) + 1
+        new_chain['index_build'] = {
+            "journaled": journaled,
+            "persist": True,
+            "fingerprint": _corpus_fingerprint(chunks),
+            "chunk_count": len(chunks)
+        }
         
-        logging.info("✅ Vectorstore rebuilt successfully with user contributions!")
-        return qa_chain
+        logging.info(f"✅ Vectorstore rebuilt successfully with user contributions! (generation {new_chain['generation']})")
+        return new_chain
         
     except Exception as e:
+        abort_index_build()
         logging.error(f"❌ Error rebuilding vectorstore: {e}")
-        return qa_chain
+        raise
 
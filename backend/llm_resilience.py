@@ -0,0 +1,411 @@
+"""
+LLM Resilience
+Deadlines, jittered retries and capped hedging for LLM calls. A call that has not
+answered by the configured latency percentile gets one duplicate request; the
+first to answer wins. Hedges are budgeted as a fraction of all calls so they can
+never add more than a fixed share of extra load. The async path does the same with
+tasks, and cancels the attempts that lose.
+"""
+import asyncio
+import logging
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+from typing import AsyncIterator, Iterator, Optional
+
+from llm_client import LLMClient
+from llm_scheduler import LLMOverloaded
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LLMTimeout(TimeoutError):
+    """An LLM call did not finish within its deadline"""
+
+
+def _run_in_thread(fn, *args, **kwargs) -> Future:
+    """Run ``fn`` on a daemon thread; an abandoned attempt never blocks shutdown"""
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, daemon=True, name="llm-attempt").start()
+    return future
+
+
+class ResilientLLM(LLMClient):
+    """Wraps a client with per-call deadlines, retries and hedged requests"""
+
+    # Failures a retry cannot fix: saturation is deliberate back-pressure
+    NON_RETRYABLE = (LLMOverloaded, ValueError, TypeError)
+
+    def __init__(self, client: LLMClient, timeout: float = 30.0, max_retries: int = 3, retry_delay: float = 1.0,
+                 hedge_percentile: Optional[float] = 95, hedge_min_delay_ms: float = 500,
+                 hedge_max_ratio: float = 0.05, hedge_priorities=("chat",), min_samples: int = 50,
+                 stream_timeout: Optional[float] = 300.0):
+        """
+        Args:
+            client: Client to wrap
+            timeout: Deadline in seconds for a whole call, retries included; for a
+                stream it bounds the first chunk and every gap between chunks
+            max_retries: Retries after the first attempt
+            retry_delay: Base backoff in seconds (full jitter, doubling per retry)
+            hedge_percentile: Latency percentile after which a hedge is sent (None disables hedging)
+            hedge_min_delay_ms: Never hedge earlier than this
+            hedge_max_ratio: Hedges allowed as a fraction of calls
+            hedge_priorities: Priority classes that may be hedged
+            min_samples: Latency samples needed before hedging starts
+            stream_timeout: Provider-side cap on one streamed attempt. Attempts of a
+                plain call get the time left before the deadline, so one abandoned
+                for the deadline or a winning hedge gives back its scheduler slot
+        """
+        self._client = client
+        self.model_name = client.model_name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.hedge_max_ratio = hedge_max_ratio
+        self.hedge_priorities = set(hedge_priorities)
+        self.min_samples = min_samples
+        self.stream_timeout = stream_timeout
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._hedges = 0
+        self._samples = {}
+
+    # ---- hedging budget and delay ----
+
+    def _hedge_delay(self, metric: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None if there is no reliable estimate yet"""
+        if self.hedge_percentile is None or self._samples.get(metric, 0) < self.min_samples:
+            return None
+        delay_ms = metrics.percentile(metric, self.hedge_percentile)
+        if delay_ms is None:
+            return None
+        return max(delay_ms, self.hedge_min_delay_ms) / 1000
+
+    def _observe(self, metric: str, started: float):
+        metrics.observe(metric, (time.perf_counter() - started) * 1000)
+        with self._lock:
+            self._samples[metric] = self._samples.get(metric, 0) + 1
+
+    def _take_hedge_token(self, priority: str) -> bool:
+        if priority not in self.hedge_priorities:
+            return False
+        with self._lock:
+            if self._hedges + 1 > self.hedge_max_ratio * self._calls:
+                return False
+            self._hedges += 1
+        metrics.increment("llm.hedges")
+        return True
+
+    def _backoff_delay(self, retry: int, deadline: float) -> float:
+        """Full-jitter backoff before retry ``retry``; raise if the deadline would pass first"""
+        delay = random.uniform(0, self.retry_delay * (2 ** retry))
+        if time.monotonic() + delay >= deadline:
+            metrics.increment("llm.timeouts")
+            raise LLMTimeout("LLM deadline exceeded before retry")
+        metrics.increment("llm.retries")
+        return delay
+
+    def _backoff(self, retry: int, deadline: float):
+        time.sleep(self._backoff_delay(retry, deadline))
+
+    def _retryable(self, error: BaseException, retry: int, deadline: float) -> bool:
+        return (not isinstance(error, self.NON_RETRYABLE) and retry < self.max_retries
+                and time.monotonic() < deadline)
+
+    # ---- blocking calls ----
+
+    def generate_content(self, prompt, stream: bool = False, priority: str = "chat", **kwargs):
+        with self._lock:
+            self._calls += 1
+        kwargs["priority"] = priority
+        if stream:
+            return self._stream(prompt, priority, kwargs)
+
+        deadline = time.monotonic() + self.timeout
+        metric = f"llm_attempt_ms.{priority}"
+        retry = 0
+        while True:
+            try:
+                return self._attempt(prompt, priority, kwargs, deadline, metric)
+            except LLMTimeout:
+                metrics.increment("llm.timeouts")
+                raise
+            except Exception as e:
+                if not self._retryable(e, retry, deadline):
+                    raise
+                logger.warning(f"⚠️ LLM call failed ({e}), retrying ({retry + 1}/{self.max_retries})")
+                self._backoff(retry, deadline)
+                retry += 1
+
+    def _attempt(self, prompt, priority, kwargs, deadline, metric):
+        """One attempt, plus at most one hedge; the first success wins"""
+        started = time.perf_counter()
+        pending = {_run_in_thread(self._client.generate_content, prompt,
+                                  timeout=deadline - time.monotonic(), **kwargs)}
+        hedge_delay = self._hedge_delay(metric)
+        hedged = False
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMTimeout(f"LLM call exceeded {self.timeout}s deadline")
+            wait_for = remaining
+            if not hedged and hedge_delay is not None:
+                wait_for = min(remaining, max(0.0, hedge_delay - (time.perf_counter() - started)))
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if hedged and future is not first:
+                        metrics.increment("llm.hedge_wins")
+                    self._observe(metric, started)
+                    return future.result()
+                error = future.exception()
+            if not done and not hedged and hedge_delay is not None:
+                hedged = True
+                first = next(iter(pending))
+                if self._take_hedge_token(priority):
+                    pending.add(_run_in_thread(self._client.generate_content, prompt,
+                                               timeout=deadline - time.monotonic(), **kwargs))
+        raise error
+
+    # ---- streaming calls ----
+
+    def _stream(self, prompt, priority, kwargs) -> Iterator:
+        """
+        Stream with a deadline on the first chunk and on every gap between chunks.
+        Retries and hedges only happen before the first chunk has been yielded.
+        """
+        metric = f"llm_first_chunk_ms.{priority}"
+        deadline = time.monotonic() + self.timeout
+        retry = 0
+        while True:
+            events = queue.Queue()
+            cancel = threading.Event()
+            started = time.perf_counter()
+            self._start_pump(0, prompt, kwargs, events, cancel)
+            hedge_delay = self._hedge_delay(metric)
+            pumps, failed, winner = 1, 0, None
+            hedge_pending = hedge_delay is not None
+            error = None
+            try:
+                while True:
+                    if winner is None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            metrics.increment("llm.timeouts")
+                            raise LLMTimeout(f"No LLM output within {self.timeout}s")
+                        wait_for = remaining
+                        if hedge_pending:
+                            wait_for = min(remaining, max(0.0, hedge_delay - (time.perf_counter() - started)))
+                    else:
+                        wait_for = self.timeout
+                    try:
+                        attempt, kind, payload = events.get(timeout=wait_for)
+                    except queue.Empty:
+                        if winner is not None:
+                            metrics.increment("llm.timeouts")
+                            raise LLMTimeout(f"LLM stream stalled for {self.timeout}s")
+                        if hedge_pending:
+                            hedge_pending = False
+                            if self._take_hedge_token(priority):
+                                self._start_pump(pumps, prompt, kwargs, events, cancel)
+                                pumps += 1
+                        continue
+                    if winner is not None and attempt != winner:
+                        continue
+                    if kind == "chunk":
+                        if winner is None:
+                            winner = attempt
+                            hedge_pending = False
+                            if attempt:
+                                metrics.increment("llm.hedge_wins")
+                            self._observe(metric, started)
+                        yield payload
+                    elif kind == "done":
+                        # An empty stream still counts as an answer
+                        return
+                    elif winner is not None:
+                        raise payload
+                    else:
+                        failed += 1
+                        error = payload
+                        if failed >= pumps:
+                            break
+            finally:
+                cancel.set()
+            if not self._retryable(error, retry, deadline):
+                raise error
+            logger.warning(f"⚠️ LLM stream failed before output ({error}), retrying ({retry + 1}/{self.max_retries})")
+            self._backoff(retry, deadline)
+            retry += 1
+
+    def _start_pump(self, attempt, prompt, kwargs, events, cancel):
+        def pump():
+            try:
+                upstream = self._client.generate_content(prompt, stream=True, timeout=self.stream_timeout, **kwargs)
+                try:
+                    for chunk in upstream:
+                        if cancel.is_set():
+                            return
+                        events.put((attempt, "chunk", chunk))
+                finally:
+                    close = getattr(upstream, "close", None)
+                    if close:
+                        close()
+                events.put((attempt, "done", None))
+            except Exception as e:
+                events.put((attempt, "error", e))
+
+        threading.Thread(target=pump, daemon=True, name="llm-stream-attempt").start()
+
+    # ---- async calls ----
+
+    async def generate_content_async(self, prompt, stream: bool = False, priority: str = "chat", **kwargs):
+        with self._lock:
+            self._calls += 1
+        kwargs["priority"] = priority
+        if stream:
+            return self._stream_async(prompt, priority, kwargs)
+
+        deadline = time.monotonic() + self.timeout
+        metric = f"llm_attempt_ms.{priority}"
+        retry = 0
+        while True:
+            try:
+                return await self._attempt_async(prompt, priority, kwargs, deadline, metric)
+            except LLMTimeout:
+                metrics.increment("llm.timeouts")
+                raise
+            except Exception as e:
+                if not self._retryable(e, retry, deadline):
+                    raise
+                logger.warning(f"⚠️ LLM call failed ({e}), retrying ({retry + 1}/{self.max_retries})")
+                await asyncio.sleep(self._backoff_delay(retry, deadline))
+                retry += 1
+
+    async def _attempt_async(self, prompt, priority, kwargs, deadline, metric):
+        """``_attempt`` with tasks: the losing or timed-out attempt is cancelled"""
+        started = time.perf_counter()
+        first = asyncio.ensure_future(self._client.generate_content_async(
+            prompt, timeout=deadline - time.monotonic(), **kwargs))
+        pending = {first}
+        hedge_delay = self._hedge_delay(metric)
+        hedged = False
+        error = None
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMTimeout(f"LLM call exceeded {self.timeout}s deadline")
+                wait_for = remaining
+                if not hedged and hedge_delay is not None:
+                    wait_for = min(remaining, max(0.0, hedge_delay - (time.perf_counter() - started)))
+                done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            metrics.increment("llm.hedge_wins")
+                        self._observe(metric, started)
+                        return task.result()
+                    error = task.exception()
+                if not done and not hedged and hedge_delay is not None:
+                    hedged = True
+                    if self._take_hedge_token(priority):
+                        pending.add(asyncio.ensure_future(self._client.generate_content_async(
+                            prompt, timeout=deadline - time.monotonic(), **kwargs)))
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _stream_async(self, prompt, priority, kwargs) -> AsyncIterator:
+        """``_stream`` with tasks: attempts that lose the race to the first chunk are cancelled"""
+        metric = f"llm_first_chunk_ms.{priority}"
+        deadline = time.monotonic() + self.timeout
+        retry = 0
+        while True:
+            events = asyncio.Queue()
+            started = time.perf_counter()
+            attempts = [asyncio.ensure_future(self._pump_async(0, prompt, kwargs, events))]
+            hedge_delay = self._hedge_delay(metric)
+            failed, winner = 0, None
+            hedge_pending = hedge_delay is not None
+            error = None
+            try:
+                while True:
+                    if winner is None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            metrics.increment("llm.timeouts")
+                            raise LLMTimeout(f"No LLM output within {self.timeout}s")
+                        wait_for = remaining
+                        if hedge_pending:
+                            wait_for = min(remaining, max(0.0, hedge_delay - (time.perf_counter() - started)))
+                    else:
+                        wait_for = self.timeout
+                    try:
+                        attempt, kind, payload = await asyncio.wait_for(events.get(), wait_for)
+                    except asyncio.TimeoutError:
+                        if winner is not None:
+                            metrics.increment("llm.timeouts")
+                            raise LLMTimeout(f"LLM stream stalled for {self.timeout}s")
+                        if hedge_pending:
+                            hedge_pending = False
+                            if self._take_hedge_token(priority):
+                                attempts.append(asyncio.ensure_future(
+                                    self._pump_async(len(attempts), prompt, kwargs, events)))
+                        continue
+                    if winner is not None and attempt != winner:
+                        continue
+                    if kind == "chunk":
+                        if winner is None:
+                            winner = attempt
+                            hedge_pending = False
+                            if attempt:
+                                metrics.increment("llm.hedge_wins")
+                            self._observe(metric, started)
+                            for index, task in enumerate(attempts):
+                                if index != winner:
+                                    task.cancel()
+                        yield payload
+                    elif kind == "done":
+                        # An empty stream still counts as an answer
+                        return
+                    elif winner is not None:
+                        raise payload
+                    else:
+                        failed += 1
+                        error = payload
+                        if failed >= len(attempts):
+                            break
+            finally:
+                for task in attempts:
+                    task.cancel()
+            if not self._retryable(error, retry, deadline):
+                raise error
+            logger.warning(f"⚠️ LLM stream failed before output ({error}), retrying ({retry + 1}/{self.max_retries})")
+            await asyncio.sleep(self._backoff_delay(retry, deadline))
+            retry += 1
+
+    async def _pump_async(self, attempt, prompt, kwargs, events):
+        try:
+            async for chunk in await self._client.generate_content_async(
+                    prompt, stream=True, timeout=self.stream_timeout, **kwargs):
+                events.put_nowait((attempt, "chunk", chunk))
+            events.put_nowait((attempt, "done", None))
+        except Exception as e:
+            events.put_nowait((attempt, "error", e))
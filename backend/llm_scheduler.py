@@ -0,0 +1,267 @@
+"""
+LLM Scheduler
+Bounded concurrency for outbound LLM calls with priority classes. User-facing
+chat answers go first; follow-up suggestions and titles wait behind them, are
+rejected quickly when their queue is full and are shed first under load.
+Threads and coroutines wait in the same queue.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from llm_client import LLMClient
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+PRIORITIES = {"chat": 0, "followup": 1, "title": 2}
+
+
+class LLMOverloaded(Exception):
+    """An LLM call was rejected or shed because the scheduler is saturated"""
+
+
+class _LoopEvent:
+    """``threading.Event`` look-alike that wakes a coroutine; safe to set from any thread"""
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        self._set = False
+
+    def is_set(self) -> bool:
+        return self._set
+
+    def set(self):
+        self._set = True
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            # The loop has closed; nobody is waiting any more
+            pass
+
+    async def wait(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+class _Waiter:
+    def __init__(self, priority_class: str, event=None):
+        self.priority_class = priority_class
+        self.event = event or threading.Event()
+        self.granted = False
+        self.shed = False
+
+
+class LLMScheduler:
+    """Priority queue in front of a fixed number of concurrent LLM calls"""
+
+    def __init__(self, max_concurrency: int = 8, queue_limits: Optional[Dict[str, int]] = None,
+                 queue_timeout: float = 30.0):
+        """
+        Args:
+            max_concurrency: LLM calls allowed in flight at once
+            queue_limits: Waiting calls allowed per priority class; more are rejected at once
+            queue_timeout: Seconds a call may wait for a slot
+        """
+        self.max_concurrency = max_concurrency
+        self.queue_limits = queue_limits or {}
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._queued = {name: 0 for name in PRIORITIES}
+
+    def _grant_next(self):
+        """Hand free slots to the highest-priority waiters. Caller holds the lock."""
+        while self._heap and self._active < self.max_concurrency:
+            _, _, waiter = heapq.heappop(self._heap)
+            if waiter.shed or waiter.event.is_set():
+                continue
+            self._queued[waiter.priority_class] -= 1
+            self._active += 1
+            waiter.granted = True
+            waiter.event.set()
+
+    def _shed_lowest(self, below: int) -> bool:
+        """Reject the newest queued call of the lowest class below priority ``below``. Caller holds the lock."""
+        candidates = [entry for entry in self._heap
+                      if entry[0] > below and not entry[2].shed and not entry[2].event.is_set()]
+        if not candidates:
+            return False
+        victim = max(candidates)[2]
+        victim.shed = True
+        self._queued[victim.priority_class] -= 1
+        victim.event.set()
+        metrics.increment(f"llm_scheduler.shed.{victim.priority_class}")
+        return True
+
+    def _enqueue(self, waiter: _Waiter) -> bool:
+        """
+        Take a free slot (True) or queue ``waiter`` for one (False)
+
+        Raises:
+            LLMOverloaded: The class queue is full
+        """
+        priority_class = waiter.priority_class
+        priority = PRIORITIES.get(priority_class, PRIORITIES["chat"])
+        with self._lock:
+            if self._active < self.max_concurrency and not self._heap:
+                self._active += 1
+                return True
+            if self._queued[priority_class] >= self.queue_limits.get(priority_class, self.max_concurrency * 4):
+                metrics.increment(f"llm_scheduler.rejected.{priority_class}")
+                raise LLMOverloaded(f"LLM queue for '{priority_class}' is full")
+            # Under contention, decorative calls give way to more important ones
+            self._shed_lowest(priority)
+            self._queued[priority_class] += 1
+            heapq.heappush(self._heap, (priority, next(self._seq), waiter))
+            self._grant_next()
+        return False
+
+    def _settle(self, waiter: _Waiter) -> bool:
+        """After waiting: True if ``waiter`` was granted a slot, otherwise retire it"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            if not waiter.shed:
+                # Timed out; leave it in the heap marked dead
+                waiter.shed = True
+                self._queued[waiter.priority_class] -= 1
+                metrics.increment(f"llm_scheduler.timeouts.{waiter.priority_class}")
+        return False
+
+    def acquire(self, priority_class: str = "chat", timeout: Optional[float] = None):
+        """
+        Wait for a slot
+
+        Raises:
+            LLMOverloaded: The class queue is full, the call was shed for a
+                higher-priority one, or no slot freed up within the timeout
+        """
+        waiter = _Waiter(priority_class)
+        if self._enqueue(waiter):
+            return
+        waiter.event.wait(self.queue_timeout if timeout is None else timeout)
+        if not self._settle(waiter):
+            raise LLMOverloaded(f"No LLM capacity for '{priority_class}'")
+
+    async def acquire_async(self, priority_class: str = "chat", timeout: Optional[float] = None):
+        """
+        ``acquire`` for coroutines: waiting holds no thread
+
+        Raises:
+            LLMOverloaded: As for ``acquire``
+        """
+        waiter = _Waiter(priority_class, _LoopEvent())
+        if self._enqueue(waiter):
+            return
+        try:
+            await waiter.event.wait(self.queue_timeout if timeout is None else timeout)
+        except asyncio.CancelledError:
+            # A slot granted while the caller went away is handed straight on
+            if self._settle(waiter):
+                self.release()
+            raise
+        if not self._settle(waiter):
+            raise LLMOverloaded(f"No LLM capacity for '{priority_class}'")
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._grant_next()
+
+    @contextmanager
+    def slot(self, priority_class: str = "chat"):
+        started = time.perf_counter()
+        self.acquire(priority_class)
+        metrics.observe(f"llm_queue_wait_ms.{priority_class}", (time.perf_counter() - started) * 1000)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, priority_class: str = "chat") -> AsyncIterator[None]:
+        started = time.perf_counter()
+        await self.acquire_async(priority_class)
+        metrics.observe(f"llm_queue_wait_ms.{priority_class}", (time.perf_counter() - started) * 1000)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "active": self._active,
+                "max_concurrency": self.max_concurrency,
+                "queued": dict(self._queued)
+            }
+
+
+class ScheduledLLM(LLMClient):
+    """Runs every call on a wrapped client through an LLMScheduler slot"""
+
+    def __init__(self, client: LLMClient, scheduler: LLMScheduler):
+        self._client = client
+        self._scheduler = scheduler
+        self.model_name = client.model_name
+
+    @staticmethod
+    def _remaining(timeout: Optional[float], queued_at: float) -> Optional[float]:
+        """The caller's timeout less the time spent waiting for a slot"""
+        if timeout is None:
+            return None
+        remaining = timeout - (time.monotonic() - queued_at)
+        if remaining <= 0:
+            raise TimeoutError("LLM call timed out while waiting for a slot")
+        return remaining
+
+    def generate_content(self, prompt, stream: bool = False, priority: str = "chat",
+                         timeout: Optional[float] = None, **kwargs):
+        if stream:
+            return self._stream(prompt, priority, timeout, kwargs)
+
+        queued_at = time.monotonic()
+        with self._scheduler.slot(priority):
+            with metrics.timer(f"llm_call_ms.{priority}"):
+                return self._client.generate_content(prompt, timeout=self._remaining(timeout, queued_at), **kwargs)
+
+    def _stream(self, prompt, priority, timeout, kwargs) -> Iterator:
+        # The slot is taken on first iteration and held until the stream ends or is closed
+        queued_at = time.monotonic()
+        with self._scheduler.slot(priority):
+            with metrics.timer(f"llm_call_ms.{priority}"):
+                yield from self._client.generate_content(
+                    prompt, stream=True, timeout=self._remaining(timeout, queued_at), **kwargs
+                )
+
+    async def generate_content_async(self, prompt, stream: bool = False, priority: str = "chat",
+                                     timeout: Optional[float] = None, **kwargs):
+        if stream:
+            return self._stream_async(prompt, priority, timeout, kwargs)
+
+        queued_at = time.monotonic()
+        async with self._scheduler.slot_async(priority):
+            with metrics.timer(f"llm_call_ms.{priority}"):
+                return await self._client.generate_content_async(
+                    prompt, timeout=self._remaining(timeout, queued_at), **kwargs
+                )
+
+    async def _stream_async(self, prompt, priority, timeout, kwargs) -> AsyncIterator:
+        queued_at = time.monotonic()
+        async with self._scheduler.slot_async(priority):
+            with metrics.timer(f"llm_call_ms.{priority}"):
+                async for chunk in await self._client.generate_content_async(
+                        prompt, stream=True, timeout=self._remaining(timeout, queued_at), **kwargs):
+                    yield chunk
@@ -0,0 +1,101 @@
+"""
+Metrics
+In-process counters and latency summaries, exposed at GET /api/metrics
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+
+class Metrics:
+    """Thread-safe registry of counters, observed values and gauges"""
+
+    def __init__(self, reservoir_size: int = 1024):
+        """
+        Args:
+            reservoir_size: Recent samples kept per observed metric for percentiles
+        """
+        self._lock = threading.Lock()
+        self._reservoir_size = reservoir_size
+        self._counters = {}
+        self._observations = {}
+        self._gauges = {}
+
+    def increment(self, name: str, value: int = 1):
+        """Add to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        """Record a sample (e.g. a latency in ms or a token count)"""
+        with self._lock:
+            obs = self._observations.get(name)
+            if obs is None:
+                obs = self._observations[name] = {
+                    "count": 0, "sum": 0.0, "min": value, "max": value,
+                    "recent": deque(maxlen=self._reservoir_size)
+                }
+            obs["count"] += 1
+            obs["sum"] += value
+            obs["min"] = min(obs["min"], value)
+            obs["max"] = max(obs["max"], value)
+            obs["recent"].append(value)
+
+    def register_gauge(self, name: str, fn: Callable[[], object]):
+        """Register a callable evaluated on every snapshot"""
+        with self._lock:
+            self._gauges[name] = fn
+
+    def percentile(self, name: str, q: float) -> Optional[float]:
+        """q-th percentile (0-100) over the recent samples of an observed metric"""
+        with self._lock:
+            obs = self._observations.get(name)
+            if not obs or not obs["recent"]:
+                return None
+            samples = sorted(obs["recent"])
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100.0))]
+
+    @contextmanager
+    def timer(self, name: str):
+        """Observe the wall time of a block in milliseconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000.0)
+
+    def snapshot(self) -> Dict:
+        """All metrics as plain JSON-serializable data"""
+        with self._lock:
+            counters = dict(self._counters)
+            observations = {
+                name: {
+                    "count": obs["count"],
+                    "avg": obs["sum"] / obs["count"],
+                    "min": obs["min"],
+                    "max": obs["max"],
+                    "recent": sorted(obs["recent"])
+                }
+                for name, obs in self._observations.items()
+            }
+            gauges = dict(self._gauges)
+
+        for obs in observations.values():
+            recent = obs.pop("recent")
+            for q in (50, 95, 99):
+                obs[f"p{q}"] = recent[min(len(recent) - 1, int(len(recent) * q / 100.0))]
+
+        gauge_values = {}
+        for name, fn in gauges.items():
+            try:
+                gauge_values[name] = fn()
+            except Exception as e:
+                gauge_values[name] = f"error: {e}"
+
+        return {"counters": counters, "observations": observations, "gauges": gauge_values}
+
+
+# Process-wide registry
+metrics = Metrics()
@@ -0,0 +1,131 @@
+"""
+Prompt Builder
+Assembles chat prompts within a per-request token budget. The static persona and
+instructions are sent once as the model's system instruction rather than being
+repeated in every prompt; conversation and retrieved context are trimmed to fit.
+"""
+import logging
+from typing import Dict, List, NamedTuple, Optional
+
+from langchain_core.documents import Document
+
+from config import PROMPT_TOKEN_BUDGET, CONVERSATION_TOKEN_BUDGET
+from keyword_matcher import KeywordMatcher
+from llm_client import estimate_tokens
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_INSTRUCTION = """You are Pasupathy, Arvind's personal AI assistant. You know Arvind personally and answer questions about him naturally.
+
+Instructions:
+1. Answer as if you simply know about Arvind - never mention "documents," "context," or "information provided"
+2. STAY FOCUSED on the current topic - don't list unrelated achievements or switch topics
+3. Use your creativity and reasoning to answer questions even when you're not completely certain
+4. Make educated inferences from what you know about Arvind
+5. When you're uncertain, use phrases like "As far as I know..." or "From what I understand..."
+6. If recent conversation is provided, use it to understand pronouns and references
+7. Synthesize information naturally when relevant
+8. Provide detailed, thoughtful answers as a personal assistant would
+9. Be conversational and helpful
+10. NEVER say "I don't have information" or reveal your information sources"""
+
+# Words and phrases that lean on earlier turns when they open a message
+FOLLOW_UP_INDICATORS = ['he', 'his', 'him', 'that', 'those', 'them', 'this', 'these', 'it', 'also', 'more', 'tell me more', 'what about', 'and']
+FOLLOW_UP_WINDOW = 5
+_follow_up_matcher = KeywordMatcher({'follow_up': FOLLOW_UP_INDICATORS}, whole_words=True)
+
+# Per-message cap when quoting recent conversation
+CONVERSATION_MESSAGE_CHARS = 200
+
+
+class ChatPrompt(NamedTuple):
+    """A user-turn prompt, the documents it includes and its token count per section"""
+    text: str
+    system_instruction: str
+    docs: List[Document]
+    tokens: Dict[str, int]
+
+
+def is_follow_up(user_message: str) -> bool:
+    """Whether the message leans on earlier turns (pronouns, 'tell me more', ...) in its first words"""
+    return _follow_up_matcher.matches(" ".join(user_message.split()[:FOLLOW_UP_WINDOW]))
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max(0, max_tokens) * 4
+    return text if len(text) <= max_chars else text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+
+def _conversation_section(recent_messages: List[Dict], budget: int) -> str:
+    """Recent turns, newest kept first when over budget"""
+    lines = []
+    used = 0
+    for msg in reversed(recent_messages):
+        role = "User" if msg["role"] == "user" else "Pasupathy"
+        line = f"{role}: {msg['content'][:CONVERSATION_MESSAGE_CHARS]}...\n"
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    if not lines:
+        return ""
+    return "\n\nRecent Conversation (for context):\n" + "".join(reversed(lines)) + "\n"
+
+
+def build_chat_prompt(user_message: str, source_docs: List[Document], query_context: Optional[str] = None,
+                      recent_messages: Optional[List[Dict]] = None, budget: int = PROMPT_TOKEN_BUDGET) -> ChatPrompt:
+    """
+    Build the user-turn prompt for a chat answer
+
+    Args:
+        user_message: The current question
+        source_docs: Retrieved documents, most relevant first
+        query_context: Detected topic, which adds a focus instruction
+        recent_messages: Recent session messages to quote for follow-up questions
+        budget: Token budget for the whole prompt, system instruction included
+
+    Returns:
+        ChatPrompt with the prompt text and the documents that fit the budget
+    """
+    context_instruction = f"**IMPORTANT**: This question is specifically about Arvind's {query_context.replace('_', ' ')} work. ONLY provide information related to {query_context.replace('_', ' ')}. Do NOT mention unrelated projects, skills, or achievements unless explicitly asked.\n" if query_context else ""
+    question = f"\nQuestion: {user_message}\n\nTake your time to provide a thorough answer:"
+
+    tokens = {
+        "system": estimate_tokens(SYSTEM_INSTRUCTION),
+        "instructions": estimate_tokens(context_instruction),
+        "question": estimate_tokens(question)
+    }
+    remaining = budget - sum(tokens.values())
+
+    conv_context = _conversation_section(recent_messages or [], min(CONVERSATION_TOKEN_BUDGET, max(0, remaining)))
+    tokens["conversation"] = estimate_tokens(conv_context)
+    remaining -= tokens["conversation"]
+
+    # Whole documents in relevance order; the first that doesn't fit is cut short
+    context_parts, docs = [], []
+    for i, doc in enumerate(source_docs):
+        part = f"Context {i+1}:\n{doc.page_content}"
+        cost = estimate_tokens(part) + 1
+        if cost > remaining:
+            if remaining > 50:
+                context_parts.append(_truncate_to_tokens(part, remaining - 1))
+                docs.append(doc)
+            break
+        context_parts.append(part)
+        docs.append(doc)
+        remaining -= cost
+    context = "\n\n".join(context_parts)
+    tokens["context"] = estimate_tokens(context)
+
+    text = f"{context_instruction}{conv_context}\nContext from Dataset:\n{context}\n{question}"
+    tokens["total"] = sum(tokens.values())
+
+    for section, count in tokens.items():
+        metrics.observe(f"prompt_tokens.{section}", count)
+    if len(docs) < len(source_docs):
+        metrics.increment("prompt.docs_dropped", len(source_docs) - len(docs))
+    logger.info(f"🧾 Prompt tokens: {tokens} ({len(docs)}/{len(source_docs)} docs)")
+
+    return ChatPrompt(text=text, system_instruction=SYSTEM_INSTRUCTION, docs=docs, tokens=tokens)
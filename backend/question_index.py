@@ -0,0 +1,84 @@
+"""
+Question Index
+Hash index of the dataset's question/answer pairs so an exact repeat of a known
+question is answered straight from the dataset, without retrieval or an LLM call
+"""
+import hashlib
+import logging
+import re
+import threading
+from typing import Dict, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Words that don't change what is being asked ("What is Arvind's GPA?" == "what arvind gpa")
+STOPWORDS = frozenset("""
+a an the is are was were be been am do does did of to in on at for with by from
+about and or please can could would will you your me tell s
+""".split())
+
+
+def normalize_question(text: str) -> str:
+    """Casefold, strip punctuation and drop stopwords"""
+    tokens = _TOKEN_RE.findall(text.casefold())
+    kept = [token for token in tokens if token not in STOPWORDS]
+    # A question made only of stopwords keeps them rather than collapsing to ""
+    return " ".join(kept or tokens)
+
+
+class QuestionIndex:
+    """Maps normalized question hashes to their stored answers"""
+
+    def __init__(self):
+        self._answers: Dict[bytes, Dict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(question: str) -> Optional[bytes]:
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+    def add(self, question: str, answer: str, source: str = "dataset", category: str = "general") -> bool:
+        """Index one question; the first answer seen for a question wins"""
+        key = self._key(question or "")
+        if key is None or not answer:
+            return False
+        with self._lock:
+            self._answers.setdefault(key, {
+                "response": answer,
+                "sources": [{"source": source, "category": category}]
+            })
+        return True
+
+    def lookup(self, question: str) -> Optional[Dict]:
+        """Stored answer payload for an exact (normalized) match, or None"""
+        key = self._key(question)
+        with self._lock:
+            answer = self._answers.get(key) if key else None
+            if answer:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.increment("question_index.hits" if answer else "question_index.misses")
+        return answer
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._answers),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
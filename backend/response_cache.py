@@ -0,0 +1,124 @@
+"""
+Semantic Response Cache
+Serves stored answers for near-duplicate first-turn questions without calling
+the LLM. Entries are scoped to (query_context, index generation) and matched by
+cosine similarity of query embeddings.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticResponseCache:
+    """Bounded LRU/TTL cache of answers looked up by embedding similarity"""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl: float = 3600.0):
+        """
+        Args:
+            threshold: Minimum cosine similarity for a cached answer to be reused
+            max_entries: Maximum number of cached answers across all scopes
+            ttl: Seconds an answer stays valid
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # entry_id -> entry, in LRU order
+        self._entries = OrderedDict()
+        # (query_context, generation) -> {entry_id: unit vector}
+        self._scopes = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _scope(query_context: Optional[str], generation) -> tuple:
+        return (query_context or "general", generation)
+
+    def _remove(self, entry_id: str):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        scope = self._scopes.get(entry["scope"])
+        if scope is not None:
+            scope.pop(entry_id, None)
+            if not scope:
+                del self._scopes[entry["scope"]]
+
+    def lookup(self, query_vector: List[float], query_context: Optional[str], generation) -> Optional[Dict]:
+        """Best cached entry above the similarity threshold, or None"""
+        vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        vector /= norm
+
+        with self._lock:
+            now = time.monotonic()
+            scope = self._scopes.get(self._scope(query_context, generation), {})
+            expired = [eid for eid in scope if now - self._entries[eid]["created"] > self.ttl]
+            for entry_id in expired:
+                self._remove(entry_id)
+
+            best_id, best_score = None, self.threshold
+            if scope:
+                ids = list(scope.keys())
+                scores = np.vstack([scope[eid] for eid in ids]) @ vector
+                top = int(np.argmax(scores))
+                if scores[top] >= best_score:
+                    best_id, best_score = ids[top], float(scores[top])
+
+            if best_id is None:
+                self.misses += 1
+                hit = None
+            else:
+                self._entries.move_to_end(best_id)
+                self.hits += 1
+                hit = dict(self._entries[best_id]["payload"], similarity=best_score)
+
+        metrics.increment("response_cache.hits" if hit else "response_cache.misses")
+        return hit
+
+    def store(self, query_vector: List[float], query_context: Optional[str], generation, payload: Dict):
+        """Cache an answer payload (e.g. response text and sources) for this query"""
+        vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return
+        entry_id = str(uuid.uuid4())
+        scope_key = self._scope(query_context, generation)
+        with self._lock:
+            self._entries[entry_id] = {
+                "scope": scope_key,
+                "payload": payload,
+                "created": time.monotonic()
+            }
+            self._scopes.setdefault(scope_key, {})[entry_id] = vector / norm
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, keep_generation=None):
+        """Drop cached answers, optionally keeping those of one index generation"""
+        with self._lock:
+            for entry_id in [eid for eid, e in self._entries.items() if e["scope"][1] != keep_generation]:
+                self._remove(entry_id)
+        logger.info(f"🧹 Response cache invalidated (kept generation {keep_generation})")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
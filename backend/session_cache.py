@@ -0,0 +1,184 @@
+"""
+Session Cache
+Bounded LRU of live chat sessions with write-through persistence. Turns in one
+session are serialized by a per-session lock. Every write bumps the stored
+session's version; when a write comes back with a version this process did not
+expect, another worker wrote in between and the cached copy is dropped.
+Coroutines share the same entries and locks through ``get_async``/``lock_async``.
+"""
+import asyncio
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SessionBusy(Exception):
+    """Another request held the session's lock for too long"""
+
+
+class SessionLock:
+    """Per-session lock handle; ``release`` is idempotent so it can be handed to a streamed response"""
+
+    def __init__(self, cache: "SessionCache", session_id: str, lock: threading.Lock):
+        self._cache = cache
+        self._session_id = session_id
+        self._lock = lock
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._lock.release()
+            self._cache._unref_lock(self._session_id)
+
+
+class SessionCache:
+    """Write-through cache of ChatSession objects keyed by session id"""
+
+    def __init__(self, loader: Callable[[str], Optional[object]], max_entries: int = 1000, ttl: float = 300.0,
+                 async_loader: Optional[Callable[[str], Awaitable[Optional[object]]]] = None):
+        """
+        Args:
+            loader: Reads a session from the database, or returns None if it doesn't exist
+            max_entries: Sessions kept in memory
+            ttl: Seconds a cached session is trusted without a write confirming its version
+            async_loader: Awaitable ``loader`` used by ``get_async``; set by the async server
+        """
+        self.loader = loader
+        self.async_loader = async_loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # session_id -> [lock, holders and waiters]
+        self._session_locks: Dict[str, list] = {}
+
+    @staticmethod
+    def _copy(session):
+        """Working copy: callers mutate messages and metadata before the write succeeds"""
+        working = copy.copy(session)
+        working.messages = [dict(message) for message in session.messages]
+        working.metadata = dict(session.metadata)
+        return working
+
+    def _cached(self, session_id: str):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[session_id]
+                entry = None
+            if entry:
+                self._entries.move_to_end(session_id)
+        metrics.increment("session_cache.hits" if entry else "session_cache.misses")
+        return self._copy(entry[1]) if entry else None
+
+    def get(self, session_id: str):
+        """A working copy of the session, loading it on a miss; None if it doesn't exist"""
+        session = self._cached(session_id)
+        if session is not None:
+            return session
+        return self._loaded(self.loader(session_id))
+
+    async def get_async(self, session_id: str):
+        """``get`` loading misses with ``async_loader``"""
+        session = self._cached(session_id)
+        if session is not None:
+            return session
+        return self._loaded(await self.async_loader(session_id))
+
+    def _loaded(self, session):
+        if session is not None:
+            self._put(session)
+            return self._copy(session)
+        return None
+
+    def _put(self, session):
+        with self._lock:
+            self._entries[session.session_id] = (time.monotonic(), self._copy(session))
+            self._entries.move_to_end(session.session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def store(self, session, written_version: Optional[int]):
+        """
+        Record a session after a successful write
+
+        Args:
+            session: The session as written; its ``version`` is the one it was read at
+            written_version: Version the database returned for the write
+        """
+        if written_version is None or written_version != session.version + 1:
+            # Someone else wrote since we read it; reload on next use
+            metrics.increment("session_cache.version_conflicts")
+            self.invalidate(session.session_id)
+            return
+        session.version = written_version
+        self._put(session)
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def lock(self, session_id: str, timeout: float = 60.0) -> SessionLock:
+        """
+        Acquire the session's lock
+
+        Raises:
+            SessionBusy: Not acquired within ``timeout`` seconds
+        """
+        holder = self._ref_lock(session_id)
+        started = time.perf_counter()
+        if not holder[0].acquire(timeout=timeout):
+            self._unref_lock(session_id)
+            raise SessionBusy(f"Session {session_id} is busy")
+        metrics.observe("session_lock_wait_ms", (time.perf_counter() - started) * 1000)
+        return SessionLock(self, session_id, holder[0])
+
+    async def lock_async(self, session_id: str, timeout: float = 60.0) -> SessionLock:
+        """
+        ``lock`` for coroutines. The lock is shared with threaded requests, so it is
+        polled with backoff rather than blocked on; a waiting turn holds no thread.
+
+        Raises:
+            SessionBusy: Not acquired within ``timeout`` seconds
+        """
+        holder = self._ref_lock(session_id)
+        started = time.perf_counter()
+        delay = 0.005
+        try:
+            while not holder[0].acquire(blocking=False):
+                if time.perf_counter() - started >= timeout:
+                    raise SessionBusy(f"Session {session_id} is busy")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.1)
+        except BaseException:
+            self._unref_lock(session_id)
+            raise
+        metrics.observe("session_lock_wait_ms", (time.perf_counter() - started) * 1000)
+        return SessionLock(self, session_id, holder[0])
+
+    def _ref_lock(self, session_id: str) -> list:
+        with self._lock:
+            holder = self._session_locks.setdefault(session_id, [threading.Lock(), 0])
+            holder[1] += 1
+            return holder
+
+    def _unref_lock(self, session_id: str):
+        with self._lock:
+            holder = self._session_locks.get(session_id)
+            if holder:
+                holder[1] -= 1
+                if holder[1] <= 0:
+                    del self._session_locks[session_id]
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "max_entries": self.max_entries,
+                    "locked_sessions": len(self._session_locks)}
@@ -0,0 +1,129 @@
+"""
+Session Export
+Streams chat sessions as NDJSON or Markdown, optionally gzipped, straight from a
+batched MongoDB cursor. Memory stays bounded by one cursor batch however many
+sessions are exported. Bulk exports walk sessions in (updated_at, session_id)
+order and end with a continuation token, so a long export can resume where it
+stopped.
+"""
+import json
+import logging
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
+
+from pymongo import ASCENDING
+
+from metrics import metrics
+from session_store import encode_cursor, decode_cursor
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "markdown": ("text/markdown", "md")
+}
+EXPORT_SORT = [("updated_at", ASCENDING), ("session_id", ASCENDING)]
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[str]:
+    """
+    Normalize an ISO date or datetime to the format sessions store updated_at in:
+    naive local time, so a timezone-aware value is converted before comparing
+
+    Raises:
+        ValueError: Not an ISO date
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def session_markdown(session: Dict) -> Iterator[str]:
+    """A session as Markdown, one piece per message"""
+    yield f"# {session.get('title', 'New Chat')}\n\n"
+    yield f"Created: {session.get('created_at', '')}\n\n"
+    for msg in session.get('messages', []):
+        role = "**User**" if msg['role'] == 'user' else "**Pasupathy**"
+        yield f"{role}: {msg['content']}\n\n---\n\n"
+
+
+def session_ndjson(session: Dict) -> str:
+    return json.dumps(session, default=str, ensure_ascii=False) + "\n"
+
+
+def export_query(since: Optional[str] = None, until: Optional[str] = None, token: Optional[str] = None) -> Dict:
+    """
+    Filter for sessions updated in [since, until) after the continuation ``token``
+
+    Raises:
+        ValueError: The token is malformed
+    """
+    clauses = []
+    if since or until:
+        updated = {}
+        if since:
+            updated["$gte"] = since
+        if until:
+            updated["$lt"] = until
+        clauses.append({"updated_at": updated})
+    if token:
+        updated_at, session_id = decode_cursor(token)
+        clauses.append({"$or": [
+            {"updated_at": {"$gt": updated_at}},
+            {"updated_at": updated_at, "session_id": {"$gt": session_id}}
+        ]})
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def export_sessions(collection, fmt: str, query: Dict, limit: int, batch_size: int = 100) -> Iterator[str]:
+    """
+    Up to ``limit`` sessions matching ``query``, oldest update first, followed by a
+    trailer with the token to continue from (null once everything was exported)
+    """
+    cursor = collection.find(query, {"_id": 0}).sort(EXPORT_SORT).batch_size(batch_size).limit(limit + 1)
+    exported = 0
+    last = None
+    more = False
+    try:
+        for session in cursor:
+            if exported == limit:
+                more = True
+                break
+            if fmt == "markdown":
+                yield from session_markdown(session)
+            else:
+                yield session_ndjson(session)
+            exported += 1
+            last = {"updated_at": session.get("updated_at", ""), "session_id": session["session_id"]}
+    finally:
+        cursor.close()
+
+    next_token = encode_cursor(last) if more and last else None
+    metrics.increment("export.sessions", exported)
+    logger.info(f"📤 Exported {exported} sessions ({fmt}), more: {more}")
+    if fmt == "markdown":
+        yield f"<!-- exported: {exported}, next_token: {next_token or ''} -->\n"
+    else:
+        yield json.dumps({"export": {"sessions": exported, "next_token": next_token}}) + "\n"
+
+
+def gzip_stream(chunks: Iterable[str], flush_bytes: int = 64 * 1024) -> Iterator[bytes]:
+    """Gzip a text stream incrementally, emitting output every ``flush_bytes`` of input"""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    pending = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        pending += len(data)
+        out = compressor.compress(data)
+        if pending >= flush_bytes:
+            out += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if out:
+            yield out
+    yield compressor.flush()
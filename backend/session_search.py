@@ -0,0 +1,195 @@
+"""
+Session Search
+Ranked full-text search over chat sessions backed by MongoDB's text index. Only
+matching sessions are read, ordered by text score, and each result carries the
+best matching messages as short snippets with highlight offsets.
+"""
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Tuple
+
+import snowballstemmer
+from pymongo import TEXT
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Same keys as the index this collection always had; a collection allows one text index
+TEXT_INDEX_KEYS = [("title", TEXT), ("messages.content", TEXT)]
+
+# MongoDB's text index stems English with Snowball too, so highlights agree with its matches
+_stemmer = snowballstemmer.stemmer("english")
+_WORD = re.compile(r"\w+")
+_stem_lock = threading.Lock()
+
+# MongoDB's English $text stop words, which it never matches; contractions are
+# listed as the parts \w+ splits them into
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are aren as at be because been before
+being below between both but by can cannot could couldn d did didn do does doesn doing don
+down during each few for from further had hadn has hasn have haven having he her here hers
+herself him himself his how i if in into is isn it its itself let ll m me more most mustn my
+myself no nor not of off on once only or other ought our ours ourselves out over own re s
+same shan she should shouldn so some such t than that the their theirs them themselves then
+there these they this those through to too under until up ve very was wasn we were weren
+what when where which while who whom why with won would wouldn you your yours yourself
+yourselves
+""".split())
+
+
+def stem(word: str) -> str:
+    with _stem_lock:
+        return _stemmer.stemWord(word.lower())
+
+
+def query_terms(query: str) -> List[str]:
+    """Searchable terms in a $text query (negated terms and stopwords dropped)"""
+    terms = []
+    for term in re.findall(r"-?\w+", query.lower()):
+        if term.startswith("-") or term in STOPWORDS or term in terms:
+            continue
+        terms.append(term)
+    return terms
+
+
+def query_stems(query: str) -> List[str]:
+    """Stems of the searchable terms in a $text query"""
+    stems = []
+    for term in query_terms(query):
+        term_stem = stem(term)
+        if term_stem not in stems:
+            stems.append(term_stem)
+    return stems
+
+
+def _message_prefilter(terms: List[str]) -> str:
+    """
+    Regex for messages that may contain a query term: some word starts like it.
+    Stems can differ from the word's spelling ("cry" -> "cri"), so only the first
+    letters the term shares with its stem are used; exact matching is by stem.
+    """
+    if not terms:
+        return "$^"
+    prefixes = {os.path.commonprefix([term, stem(term)])[:3] for term in terms}
+    return r"\b(" + "|".join(re.escape(prefix) for prefix in sorted(prefixes)) + ")"
+
+
+def highlight_spans(text: str, stems: List[str]) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the words in ``text`` whose stem is one of ``stems``"""
+    if not stems:
+        return []
+    wanted = set(stems)
+    return [(m.start(), m.end()) for m in _WORD.finditer(text) if stem(m.group()) in wanted]
+
+
+def make_snippet(text: str, spans: List[Tuple[int, int]], width: int = 160) -> Dict:
+    """
+    Window of ``text`` around its first hit
+
+    Returns:
+        {"text", "highlights"} with highlight offsets relative to the snippet text
+    """
+    if len(text) <= width:
+        start, end = 0, len(text)
+    else:
+        first = spans[0][0] if spans else 0
+        start = max(0, min(first - width // 4, len(text) - width))
+        end = start + width
+        # Don't cut words at the window edges
+        if start > 0:
+            space = text.find(" ", start, first)
+            start = space + 1 if space != -1 else start
+        if end < len(text):
+            space = text.rfind(" ", start, end)
+            end = space if space > start else end
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if end < len(text) else ""
+    highlights = [[s - start + len(prefix), e - start + len(prefix)] for s, e in spans if s >= start and e <= end]
+    return {"text": prefix + text[start:end] + suffix, "highlights": highlights}
+
+
+class SessionSearch:
+    """Text-index search over the chat_sessions collection"""
+
+    def __init__(self, collection, snippets_per_session: int = 3, max_scanned_messages: int = 50,
+                 snippet_chars: int = 160):
+        """
+        Args:
+            collection: The chat_sessions collection
+            snippets_per_session: Best matching messages returned per session
+            max_scanned_messages: Matching messages read per session to pick them from
+            snippet_chars: Snippet window length
+        """
+        self.collection = collection
+        self.snippets_per_session = snippets_per_session
+        self.max_scanned_messages = max_scanned_messages
+        self.snippet_chars = snippet_chars
+
+    def ensure_index(self):
+        self.collection.create_index(TEXT_INDEX_KEYS)
+
+    def search(self, query: str, page: int = 1, limit: int = 20) -> Tuple[List[Dict], int]:
+        """
+        One page of sessions matching ``query``, best text score first
+
+        Returns:
+            The results and the total number of matching sessions
+        """
+        terms = query_terms(query)
+        stems = query_stems(query)
+        # Only messages that may contain a query term leave the server
+        message_filter = {"$regexMatch": {
+            "input": "$$m.content",
+            "regex": _message_prefilter(terms),
+            "options": "i"
+        }}
+        # The page and the total come from one pass over the text index
+        pipeline = [
+            {"$match": {"$text": {"$search": query}}},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+            {"$facet": {
+                "sessions": [
+                    {"$sort": {"score": -1, "updated_at": -1}},
+                    {"$skip": (page - 1) * limit},
+                    {"$limit": limit},
+                    {"$project": {
+                        "_id": 0, "session_id": 1, "title": 1, "updated_at": 1, "message_count": 1, "score": 1,
+                        "messages": {"$slice": [
+                            {"$filter": {"input": {"$ifNull": ["$messages", []]}, "as": "m",
+                                         "cond": message_filter}},
+                            self.max_scanned_messages
+                        ]}
+                    }}
+                ],
+                "total": [{"$count": "count"}]
+            }}
+        ]
+
+        with metrics.timer("session_search_ms"):
+            facets = next(self.collection.aggregate(pipeline), {})
+        sessions = facets.get("sessions", [])
+        total = facets["total"][0]["count"] if facets.get("total") else 0
+
+        results = []
+        for session in sessions:
+            hits = []
+            for message in session.pop("messages", []):
+                spans = highlight_spans(message["content"], stems)
+                if spans:
+                    hits.append((len(spans), message, spans))
+            # Most hits first; stable, so ties keep conversation order
+            hits.sort(key=lambda hit: -hit[0])
+            session["title_highlights"] = [list(span) for span in highlight_spans(session.get("title", ""), stems)]
+            session["hits"] = [
+                {
+                    "message_id": message["id"],
+                    "role": message["role"],
+                    "snippet": make_snippet(message["content"], spans, self.snippet_chars)
+                }
+                for _, message, spans in hits[:self.snippets_per_session]
+            ]
+            results.append(session)
+        return results, total
@@ -0,0 +1,261 @@
+"""
+Session Store
+Incremental writes for chat sessions. A turn appends its messages with $push and
+an edit rewrites one message in place, so the bytes written per operation do not
+grow with the length of the conversation. Each write also maintains the summary
+fields (message count, preview) that session listings read instead of messages,
+and bumps the session's version so caches can tell whether they missed a write.
+"""
+import base64
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import bson
+from pymongo import DESCENDING, ReturnDocument, UpdateOne
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fields returned by session listings
+SUMMARY_PROJECTION = {
+    "_id": 0, "session_id": 1, "title": 1, "created_at": 1, "updated_at": 1,
+    "message_count": 1, "preview": 1
+}
+LISTING_SORT = [("updated_at", DESCENDING), ("session_id", DESCENDING)]
+
+
+def make_preview(content: str, max_chars: int = 100) -> str:
+    """One-line excerpt of a message for the session list"""
+    text = " ".join(content.split())
+    return text if len(text) <= max_chars else text[:max_chars].rsplit(" ", 1)[0] + "..."
+
+
+def encode_cursor(session: Dict) -> str:
+    """Opaque keyset cursor positioned after ``session``"""
+    key = json.dumps([session["updated_at"], session["session_id"]])
+    return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Raises:
+        ValueError: The cursor is malformed
+    """
+    try:
+        updated_at, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return updated_at, session_id
+
+
+class SessionWrite(NamedTuple):
+    """One versioned update of a session document, ready for find_one_and_update"""
+    operation: str
+    query: Dict
+    update: Dict
+    upsert: bool = False
+
+
+def _versioned(operation: str, query: Dict, update: Dict, upsert: bool = False) -> SessionWrite:
+    """Bump the session's version with the update and record its size"""
+    update.setdefault("$inc", {})["version"] = 1
+    metrics.observe(f"session_write_bytes.{operation}", len(bson.encode(update)))
+    return SessionWrite(operation, query, update, upsert)
+
+
+def _new_version(write: SessionWrite, before: Optional[Dict]) -> Optional[int]:
+    """
+    Version after ``write`` from the document as it was just before it, which the
+    atomic update makes exact; None if nothing matched
+    """
+    if before is None:
+        # An upsert that found nothing inserted the first version
+        return 1 if write.upsert else None
+    return before.get("version", 0) + 1
+
+
+def append_write(session, messages: List[Dict], fields: Optional[Dict] = None,
+                 preview_chars: int = 100) -> SessionWrite:
+    """
+    Append messages to a session, creating the session document if needed
+
+    Args:
+        session: ChatSession the messages belong to (supplies defaults for a new document)
+        messages: Messages to push, oldest first
+        fields: Extra top-level or dotted fields to $set, e.g. {"metadata.last_sources": [...]}
+        preview_chars: Length of the stored last-message preview
+    """
+    fields = dict(fields or {})
+    fields["updated_at"] = datetime.now().isoformat()
+    fields["preview"] = make_preview(messages[-1]["content"], preview_chars)
+    on_insert = {"created_at": session.created_at.isoformat()}
+    if "title" not in fields:
+        on_insert["title"] = session.title
+    # Only defaults not being $set, or Mongo rejects the update as conflicting
+    for key, value in session.metadata.items():
+        if f"metadata.{key}" not in fields:
+            on_insert[f"metadata.{key}"] = value
+
+    return _versioned("append", {"session_id": session.session_id}, {
+        "$push": {"messages": {"$each": messages}},
+        "$inc": {"message_count": len(messages)},
+        "$set": fields,
+        "$setOnInsert": on_insert
+    }, upsert=True)
+
+
+def replace_write(session_id: str, index: int, old_message_id: str, message: Dict,
+                  fields: Optional[Dict] = None, preview_chars: int = 100) -> SessionWrite:
+    """Overwrite the message at ``index`` if it is still ``old_message_id``"""
+    fields = dict(fields or {})
+    fields[f"messages.{index}"] = message
+    fields["updated_at"] = datetime.now().isoformat()
+    fields["preview"] = make_preview(message["content"], preview_chars)
+    return _versioned("replace", {"session_id": session_id, f"messages.{index}.id": old_message_id},
+                      {"$set": fields})
+
+
+def edit_write(session_id: str, message_id: str, changes: Dict, is_last: bool = False,
+               preview_chars: int = 100) -> SessionWrite:
+    """
+    Positional update of one message's fields
+
+    Args:
+        is_last: The message is the session's latest, so the preview follows its content
+    """
+    update = {f"messages.$.{key}": value for key, value in changes.items()}
+    update["updated_at"] = datetime.now().isoformat()
+    if is_last and "content" in changes:
+        update["preview"] = make_preview(changes["content"], preview_chars)
+    return _versioned("edit", {"session_id": session_id, "messages.id": message_id}, {"$set": update})
+
+
+class SessionStore:
+    """Append-only message persistence on the chat_sessions collection"""
+
+    def __init__(self, collection, preview_chars: int = 100, count_ttl: float = 60.0):
+        """
+        Args:
+            collection: The chat_sessions collection
+            preview_chars: Length of the stored last-message preview
+            count_ttl: Seconds the estimated session total is reused
+        """
+        self.collection = collection
+        self.preview_chars = preview_chars
+        self.count_ttl = count_ttl
+        self._count_lock = threading.Lock()
+        self._count = None
+        self._count_at = 0.0
+
+    def _apply(self, write: SessionWrite) -> Optional[int]:
+        """Run ``write``; returns the new version, or None if nothing matched"""
+        before = self.collection.find_one_and_update(write.query, write.update, projection={"_id": 0, "version": 1},
+                                                     upsert=write.upsert, return_document=ReturnDocument.BEFORE)
+        return _new_version(write, before)
+
+    def append_messages(self, session, messages: List[Dict], fields: Optional[Dict] = None) -> int:
+        """``append_write``; returns the session's new version"""
+        return self._apply(append_write(session, messages, fields, self.preview_chars))
+
+    def replace_last_message(self, session_id: str, index: int, old_message_id: str, message: Dict,
+                             fields: Optional[Dict] = None) -> Optional[int]:
+        """``replace_write``; returns the new version, or None if the message was replaced meanwhile"""
+        return self._apply(replace_write(session_id, index, old_message_id, message, fields, self.preview_chars))
+
+    def update_message(self, session_id: str, message_id: str, changes: Dict, is_last: bool = False) -> Optional[int]:
+        """``edit_write``; returns the new version, or None if no such message exists"""
+        return self._apply(edit_write(session_id, message_id, changes, is_last, self.preview_chars))
+
+    def list_summaries(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        One page of session summaries, most recently updated first
+
+        Keyset pagination on (updated_at, session_id): each page is an index range
+        scan from the cursor, however deep it is.
+
+        Returns:
+            The summaries and the cursor of the next page (None on the last page)
+
+        Raises:
+            ValueError: The cursor is malformed
+        """
+        query = {}
+        if cursor:
+            updated_at, session_id = decode_cursor(cursor)
+            query = {"$or": [
+                {"updated_at": {"$lt": updated_at}},
+                {"updated_at": updated_at, "session_id": {"$lt": session_id}}
+            ]}
+        sessions = list(self.collection.find(query, SUMMARY_PROJECTION).sort(LISTING_SORT).limit(limit + 1))
+        next_cursor = encode_cursor(sessions[limit - 1]) if len(sessions) > limit else None
+        sessions = sessions[:limit]
+        for session in sessions:
+            # Sessions written before the summary fields existed
+            session.setdefault("message_count", 0)
+            session.setdefault("preview", "")
+        return sessions, next_cursor
+
+    def estimated_total(self) -> int:
+        """Session count from collection metadata, refreshed at most every ``count_ttl`` seconds"""
+        with self._count_lock:
+            if self._count is None or time.monotonic() - self._count_at > self.count_ttl:
+                self._count = self.collection.estimated_document_count()
+                self._count_at = time.monotonic()
+            return self._count
+
+    def ensure_indexes(self, batch_size: int = 500):
+        """Listing index, plus summary fields for sessions saved before they existed"""
+        self.collection.create_index(LISTING_SORT)
+        backfilled = 0
+        batch = []
+        # Previews are cut by make_preview, exactly as new writes cut them
+        for session in self.collection.find({"message_count": {"$exists": False}}, {"_id": 1, "messages.content": 1}):
+            messages = session.get("messages") or []
+            batch.append(UpdateOne({"_id": session["_id"], "message_count": {"$exists": False}}, {"$set": {
+                "message_count": len(messages),
+                "preview": make_preview(messages[-1].get("content", ""), self.preview_chars) if messages else ""
+            }}))
+            if len(batch) >= batch_size:
+                backfilled += self.collection.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            backfilled += self.collection.bulk_write(batch, ordered=False).modified_count
+        if backfilled:
+            logger.info(f"🗂️ Added summary fields to {backfilled} sessions")
+
+
+class AsyncSessionStore:
+    """The write half of SessionStore over an async (Motor) collection, used by the async chat path"""
+
+    def __init__(self, collection, preview_chars: int = 100):
+        """
+        Args:
+            collection: The chat_sessions collection, from a Motor client
+            preview_chars: Length of the stored last-message preview
+        """
+        self.collection = collection
+        self.preview_chars = preview_chars
+
+    async def _apply(self, write: SessionWrite) -> Optional[int]:
+        before = await self.collection.find_one_and_update(
+            write.query, write.update, projection={"_id": 0, "version": 1},
+            upsert=write.upsert, return_document=ReturnDocument.BEFORE
+        )
+        return _new_version(write, before)
+
+    async def append_messages(self, session, messages: List[Dict], fields: Optional[Dict] = None) -> int:
+        return await self._apply(append_write(session, messages, fields, self.preview_chars))
+
+    async def replace_last_message(self, session_id: str, index: int, old_message_id: str, message: Dict,
+                                   fields: Optional[Dict] = None) -> Optional[int]:
+        return await self._apply(replace_write(session_id, index, old_message_id, message, fields,
+                                               self.preview_chars))
+
+    async def update_message(self, session_id: str, message_id: str, changes: Dict,
+                             is_last: bool = False) -> Optional[int]:
+        return await self._apply(edit_write(session_id, message_id, changes, is_last, self.preview_chars))
@@ -0,0 +1,85 @@
+"""
+Tag Index
+Per-tag bitmaps over FAISS ids so a context-filtered search only scores the
+vectors carrying the requested tag
+"""
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import faiss
+import numpy as np
+
+
+class TagIndex:
+    """Maps each context tag to a bitmap of the FAISS ids tagged with it"""
+
+    def __init__(self, capacity: int = 1024):
+        self._capacity_bytes = max(1, (capacity + 7) // 8)
+        self._bitmaps: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _grow(self, size: int):
+        needed = (size + 7) // 8
+        if needed <= self._capacity_bytes:
+            return
+        while self._capacity_bytes < needed:
+            self._capacity_bytes *= 2
+        for tag, bitmap in self._bitmaps.items():
+            grown = np.zeros(self._capacity_bytes, dtype=np.uint8)
+            grown[:len(bitmap)] = bitmap
+            self._bitmaps[tag] = grown
+
+    def add(self, faiss_id: int, tags: Iterable[str]):
+        """Record the tags of one vector"""
+        self.add_many(faiss_id, [tags])
+
+    def add_many(self, start_id: int, tags_per_id: List[Iterable[str]]):
+        """Record tags for consecutive FAISS ids starting at ``start_id``"""
+        with self._lock:
+            self._grow(start_id + len(tags_per_id))
+            for offset, tags in enumerate(tags_per_id):
+                faiss_id = start_id + offset
+                byte, bit = faiss_id >> 3, np.uint8(1 << (faiss_id & 7))
+                for tag in tags:
+                    bitmap = self._bitmaps.get(tag)
+                    if bitmap is None:
+                        bitmap = self._bitmaps[tag] = np.zeros(self._capacity_bytes, dtype=np.uint8)
+                        self._counts[tag] = 0
+                    if not bitmap[byte] & bit:
+                        bitmap[byte] |= bit
+                        self._counts[tag] += 1
+            self._size = max(self._size, start_id + len(tags_per_id))
+
+    def count(self, tag: str) -> int:
+        """Number of vectors carrying ``tag``"""
+        with self._lock:
+            return self._counts.get(tag, 0)
+
+    def contains(self, tag: str, faiss_id: int) -> bool:
+        """Whether the vector ``faiss_id`` carries ``tag``"""
+        with self._lock:
+            bitmap = self._bitmaps.get(tag)
+            if bitmap is None or faiss_id >= self._size:
+                return False
+            return bool(bitmap[faiss_id >> 3] & (1 << (faiss_id & 7)))
+
+    def selector(self, tag: str) -> Optional[faiss.IDSelector]:
+        """
+        FAISS selector restricting a search to ``tag``, or None if nothing carries it.
+        The bitmap is copied, so the selector stays valid while new ids are added.
+        """
+        with self._lock:
+            bitmap = self._bitmaps.get(tag)
+            if bitmap is None or not self._counts.get(tag):
+                return None
+            bitmap = bitmap[:(self._size + 7) // 8].copy()
+        selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+        # The selector only holds a raw pointer; keep the array alive with it
+        selector.bitmap_array = bitmap
+        return selector
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
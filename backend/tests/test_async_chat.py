@@ -0,0 +1,125 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import httpx
+import mongomock
+
+import app
+import asgi
+from llm_client import LocalLLMClient
+from session_store import AsyncSessionStore
+
+
+class AsyncCollection:
+    """The Motor calls the chat path makes, answered by a mongomock collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        return self.collection.find_one_and_update(*args, **kwargs)
+
+
+def sse_events(body):
+    return [json.loads(line[len("data: "):]) for line in body.split("\n\n") if line.startswith("data: ")]
+
+
+class AsyncChatTest(unittest.TestCase):
+    def setUp(self):
+        self.sessions = mongomock.MongoClient().db.chat_sessions
+        collection = AsyncCollection(self.sessions)
+        chain = {
+            "gemini_model": LocalLLMClient(latency_distribution="fixed", latency_ms=5, chunk_interval_ms=1,
+                                           chunk_words=3, response_words=12, error_rate=0),
+            # Far ahead of any generation the background model load could publish
+            "generation": 10 ** 6,
+        }
+        self.cached_answer = None
+
+        async def load_session(session_id):
+            document = await collection.find_one({"session_id": session_id}, {"_id": 0})
+            return app.session_from_document(document) if document else None
+
+        patches = [
+            mock.patch.object(app, "llm_chain", chain),
+            mock.patch.object(app, "user_knowledge_manager", None),
+            mock.patch.object(app, "get_context_filtered_docs", lambda *args, **kwargs: []),
+            mock.patch.object(app, "lookup_cached_response", lambda *args, **kwargs: (self.cached_answer, None)),
+            mock.patch.object(asgi, "async_session_store", AsyncSessionStore(collection)),
+            mock.patch.object(app.session_cache, "async_loader", load_session),
+            mock.patch.object(asgi.title_worker, "submit", return_value=True),
+            mock.patch.dict(app.request_counts, clear=True),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.title_submit = asgi.title_worker.submit
+
+    def post(self, *payloads):
+        """POST each payload to /api/chat in turn over the ASGI app"""
+        async def run():
+            transport = httpx.ASGITransport(app=asgi.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return [await client.post("/api/chat", json=payload) for payload in payloads]
+        return asyncio.run(run())
+
+    def stored(self, session_id):
+        return self.sessions.find_one({"session_id": session_id}, {"_id": 0})
+
+    def test_turns_are_answered_and_saved(self):
+        first, = self.post({"message": "Which robots has Arvind built?"})
+        self.assertEqual(first.status_code, 200)
+        body = first.json()
+        self.assertEqual(body["status"], "success")
+        self.assertTrue(body["response"])
+        self.assertFalse(body["cached"])
+        self.assertTrue(body["title_pending"])
+        self.title_submit.assert_called_once()
+
+        second, = self.post({"message": "Tell me more", "session_id": body["session_id"]})
+        self.assertEqual(second.json()["status"], "success")
+        stored = self.stored(body["session_id"])
+        self.assertEqual((stored["version"], stored["message_count"]), (2, 4))
+        self.assertEqual(stored["messages"][1]["content"], body["response"])
+        self.assertEqual(stored["messages"][3]["content"], second.json()["response"])
+
+    def test_streamed_answer_matches_the_saved_message(self):
+        response, = self.post({"message": "Which robots has Arvind built?", "stream": True})
+        self.assertEqual(response.headers["content-type"].split(";")[0], "text/event-stream")
+        events = sse_events(response.text)
+        chunks = [event["content"] for event in events if "content" in event]
+        done, = [event for event in events if event.get("done")]
+        self.assertGreater(len(chunks), 1)
+        self.assertFalse(done["cached"])
+        self.assertIn("followups", events[-1])
+        stored = self.stored(done["session_id"])
+        self.assertEqual(stored["messages"][1]["content"], "".join(chunks))
+
+    def test_cached_answer_is_streamed_in_one_event(self):
+        self.cached_answer = {"response": "Several, including a line follower.", "sources": [{"source": "cv.pdf"}]}
+        response, = self.post({"message": "Which robots has Arvind built?", "stream": True})
+        events = sse_events(response.text)
+        self.assertEqual(events[0], {"content": "Several, including a line follower."})
+        done, = [event for event in events if event.get("done")]
+        self.assertTrue(done["cached"])
+        stored = self.stored(done["session_id"])
+        self.assertEqual(stored["messages"][1]["content"], "Several, including a line follower.")
+        self.assertEqual(stored["metadata"]["last_sources"], ["cv.pdf"])
+
+    def test_empty_message_is_rejected(self):
+        response, = self.post({"message": "   "})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unready_model_is_reported(self):
+        with mock.patch.object(app, "llm_chain", None):
+            response, = self.post({"message": "hello"})
+        self.assertEqual(response.status_code, 503)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+from bm25_index import BM25Index, reciprocal_rank_fusion, tokenize
+from llm_model import _hybrid_search
+from tag_index import TagIndex
+
+
+class BM25IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = BM25Index()
+        self.index.add_many(0, [
+            "Worked at Acme Robotics as an intern",
+            "Studied computer vision at university",
+            "Acme Acme Acme internship notes",
+        ])
+
+    def test_tokenize_folds_case_and_drops_punctuation(self):
+        self.assertEqual(tokenize("Hello, World! C3PO"), ["hello", "world", "c3po"])
+
+    def test_rare_terms_outscore_common_ones(self):
+        results = self.index.search("university", k=3)
+        self.assertEqual([doc_id for doc_id, _ in results], [1])
+        acme = dict(self.index.search("acme", k=3))
+        self.assertLess(acme[0], self.index.search("robotics", k=1)[0][1])
+
+    def test_term_frequency_raises_the_score(self):
+        self.assertEqual([doc_id for doc_id, _ in self.index.search("acme", k=3)], [2, 0])
+
+    def test_unknown_and_empty_queries_find_nothing(self):
+        self.assertEqual(self.index.search("zeppelin", k=3), [])
+        self.assertEqual(self.index.search("?!", k=3), [])
+        self.assertEqual(BM25Index().search("acme", k=3), [])
+
+    def test_allowed_restricts_the_ids(self):
+        results = self.index.search("acme", k=3, allowed=lambda doc_id: doc_id != 2)
+        self.assertEqual([doc_id for doc_id, _ in results], [0])
+
+    def test_appended_documents_are_searchable(self):
+        self.index.add_many(3, ["Zarek joined as a research intern"])
+        self.assertEqual(self.index.search("zarek", k=3)[0][0], 3)
+        self.assertEqual(len(self.index), 4)
+
+    def test_replayed_ids_are_not_indexed_twice(self):
+        self.index.add_many(2, ["Acme Acme Acme internship notes", "A fresh chunk"])
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual([doc_id for doc_id, _ in self.index.search("notes", k=3)], [2])
+        self.assertEqual([doc_id for doc_id, _ in self.index.search("fresh", k=3)], [3])
+
+    def test_gaps_in_the_ids_are_padded(self):
+        self.index.add_many(5, ["late arrival"])
+        self.assertEqual(len(self.index), 6)
+        self.assertEqual(self.index.search("arrival", k=1)[0][0], 5)
+
+
+class ReciprocalRankFusionTest(unittest.TestCase):
+    def test_ids_ranked_well_by_both_lists_come_first(self):
+        fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+        self.assertEqual([doc_id for doc_id, _ in fused], [1, 3, 2])
+        self.assertAlmostEqual(dict(fused)[1], 1 / 61 + 1 / 62)
+
+    def test_empty_rankings(self):
+        self.assertEqual(reciprocal_rank_fusion([[], []]), [])
+
+
+class QueryEmbeddings:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def make_chain(chunks, query_vectors):
+    """A chain whose FAISS store holds ``chunks`` as (text, vector, tags) triples"""
+    index = faiss.IndexFlatIP(len(chunks[0][1]))
+    index.add(np.asarray([vector for _, vector, _ in chunks], dtype=np.float32))
+    docstore = InMemoryDocstore({f"chunk-{i}": Document(page_content=text) for i, (text, _, _) in enumerate(chunks)})
+    bm25_index, tag_index = BM25Index(), TagIndex()
+    bm25_index.add_many(0, [text for text, _, _ in chunks])
+    tag_index.add_many(0, [tags for _, _, tags in chunks])
+    vectorstore = SimpleNamespace(
+        embeddings=QueryEmbeddings(query_vectors),
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id={i: f"chunk-{i}" for i in range(len(chunks))}
+    )
+    return {"vectorstore": vectorstore, "bm25_index": bm25_index, "tag_index": tag_index}
+
+
+class HybridSearchTest(unittest.TestCase):
+    def setUp(self):
+        # Dense ranking: overview, internship, gardening; only BM25 knows the name
+        self.chain = make_chain([
+            ("Overview of the portfolio projects", [1.0, 0.0, 0.0], {"projects"}),
+            ("Zarek internship at Acme", [0.8, 0.6, 0.0], {"experience"}),
+            ("Gardening notes", [0.0, 0.0, 1.0], set()),
+        ], {"Zarek internship": [1.0, 0.0, 0.0]})
+
+    def test_ids_ranked_by_both_retrievers_win(self):
+        docs = _hybrid_search(self.chain, "Zarek internship", k=1)
+        self.assertEqual([doc.page_content for doc in docs], ["Zarek internship at Acme"])
+        self.assertEqual(docs[0].metadata["chunk_id"], "chunk-1")
+
+    def test_every_candidate_is_returned_once(self):
+        docs = _hybrid_search(self.chain, "Zarek internship", k=3)
+        self.assertEqual(sorted(doc.metadata["chunk_id"] for doc in docs), ["chunk-0", "chunk-1", "chunk-2"])
+
+    def test_context_filter_limits_both_retrievers(self):
+        docs = _hybrid_search(self.chain, "Zarek internship", k=3, context_filter="projects")
+        self.assertEqual([doc.metadata["chunk_id"] for doc in docs], ["chunk-0"])
+        self.assertEqual(_hybrid_search(self.chain, "Zarek internship", k=3, context_filter="research"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+
+import index_writer
+from index_writer import (
+    IndexWriter, abort_index_build, begin_index_build, claim_index_files, index_file_lock, read_log
+)
+
+
+class FakeEmbeddings:
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+
+class FakeVectorStore:
+    """The slice of the LangChain FAISS store the writer uses"""
+
+    def __init__(self, texts=()):
+        self.embeddings = FakeEmbeddings()
+        self.index = SimpleNamespace(ntotal=0)
+        self.index_to_docstore_id = {}
+        self.texts = {}
+        self.add_embeddings([(text, None) for text in texts], ids=[f"base-{i}" for i in range(len(texts))])
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None):
+        for (text, _), doc_id in zip(text_embeddings, ids):
+            self.index_to_docstore_id[self.index.ntotal] = doc_id
+            self.texts[doc_id] = text
+            self.index.ntotal += 1
+
+    def save_local(self, folder_path, index_name="index"):
+        for ext in ("faiss", "pkl"):
+            with open(os.path.join(folder_path, f"{index_name}.{ext}"), "w") as f:
+                json.dump(sorted(self.texts.values()), f)
+
+
+def docs(*texts):
+    return [Document(page_content=text, metadata={}) for text in texts]
+
+
+class IndexWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.index_path = tempfile.mkdtemp()
+        with open(os.path.join(self.index_path, "manifest.json"), "w") as f:
+            json.dump({"fingerprint": "abc", "chunk_count": 2}, f)
+        self.writers = []
+        index_writer._disk_owner = None
+        index_writer._owner_before_build = None
+
+    def tearDown(self):
+        for writer in self.writers:
+            writer.close()
+        shutil.rmtree(self.index_path)
+
+    def writer_for(self, vectorstore, claim=True):
+        if claim:
+            with index_file_lock:
+                claim_index_files(vectorstore, self.index_path)
+        writer = IndexWriter(vectorstore, self.index_path, flush_batch_size=100, flush_interval=3600)
+        self.writers.append(writer)
+        return writer
+
+    def saved_texts(self):
+        with open(os.path.join(self.index_path, "index.faiss")) as f:
+            return json.load(f)
+
+    def log_texts(self):
+        return [entry["page_content"] for entry in read_log(self.index_path)]
+
+    def test_additions_are_searchable_and_journaled_before_the_flush(self):
+        vectorstore = FakeVectorStore(["a", "b"])
+        writer = self.writer_for(vectorstore)
+        writer.add_documents(docs("c"))
+        self.assertEqual(vectorstore.index.ntotal, 3)
+        self.assertEqual(self.log_texts(), ["c"])
+        self.assertEqual(writer.pending_count(), 1)
+
+    def test_flush_replaces_the_index_and_compacts_the_log(self):
+        writer = self.writer_for(FakeVectorStore(["a", "b"]))
+        writer.add_documents(docs("c", "d"))
+        self.assertTrue(writer.flush())
+        self.assertEqual(self.saved_texts(), ["a", "b", "c", "d"])
+        self.assertEqual(self.log_texts(), [])
+        self.assertFalse([name for name in os.listdir(self.index_path) if "staging" in name])
+        with open(os.path.join(self.index_path, "manifest.json")) as f:
+            self.assertEqual(json.load(f), {"fingerprint": "abc", "chunk_count": 4})
+
+    def test_retired_generation_does_not_flush(self):
+        old_store = FakeVectorStore(["a"])
+        old_writer = self.writer_for(old_store)
+        self.writer_for(FakeVectorStore(["a", "b"]))
+        old_writer.add_documents(docs("late"))
+        self.assertFalse(old_writer.flush())
+        self.assertEqual(self.log_texts(), ["late"])
+
+    def test_replay_restores_unflushed_additions(self):
+        crashed = self.writer_for(FakeVectorStore(["a"]))
+        crashed.add_documents(docs("c"))
+        restarted_store = FakeVectorStore(["a"])
+        restarted = self.writer_for(restarted_store)
+        self.assertEqual(restarted.replay_log(), 1)
+        self.assertIn("c", restarted_store.texts.values())
+        # Replaying twice adds nothing
+        self.assertEqual(restarted.replay_log(), 0)
+
+    def test_build_keeps_additions_made_while_it_runs(self):
+        live_store = FakeVectorStore(["a"])
+        live = self.writer_for(live_store)
+        live.add_documents(docs("before"))
+        journaled = begin_index_build(self.index_path)
+        live.add_documents(docs("during"))
+        # The build owns the files now; the live generation keeps its log
+        self.assertFalse(live.flush())
+        self.assertEqual(self.log_texts(), ["before", "during"])
+
+        # The build read "before" from the database; publish it
+        built_store = FakeVectorStore(["a", "before"])
+        with index_file_lock:
+            claim_index_files(built_store, self.index_path, drop_ids=set(journaled))
+        built = self.writer_for(built_store, claim=False)
+        self.assertEqual(built.replay_log(), 1)
+        self.assertEqual(sorted(built_store.texts.values()), ["a", "before", "during"])
+        self.assertTrue(built.flush())
+        self.assertEqual(self.log_texts(), [])
+
+    def test_aborted_build_returns_the_files_to_the_live_generation(self):
+        live = self.writer_for(FakeVectorStore(["a"]))
+        begin_index_build(self.index_path)
+        live.add_documents(docs("c"))
+        self.assertFalse(live.flush())
+        abort_index_build()
+        self.assertTrue(live.flush())
+        self.assertEqual(self.saved_texts(), ["a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from keyword_matcher import KeywordMatcher
+
+
+class KeywordMatcherTest(unittest.TestCase):
+    def test_short_keywords_match_whole_words_only(self):
+        matcher = KeywordMatcher({"resume": ["cv"], "ml": ["ml"]})
+        self.assertEqual(matcher.match("Can I see his CV?"), ["resume"])
+        self.assertEqual(matcher.match("He knows CVS and HTML"), [])
+        self.assertEqual(matcher.match("ML and cv work"), ["resume", "ml"])
+
+    def test_short_keyword_must_start_a_word(self):
+        matcher = KeywordMatcher({"ml": ["ml"]})
+        self.assertFalse(matcher.matches("html"))
+        self.assertTrue(matcher.matches("ml-based"))
+
+    def test_long_keywords_match_word_prefixes(self):
+        matcher = KeywordMatcher({"robotics": ["robot"]})
+        self.assertEqual(matcher.match("Robotics lab"), ["robotics"])
+        self.assertEqual(matcher.match("a robot arm"), ["robotics"])
+        self.assertEqual(matcher.match("microrobot"), [])
+
+    def test_multi_word_keywords(self):
+        matcher = KeywordMatcher({"follow_up": ["tell me more", "what about"], "more": ["more"]})
+        self.assertEqual(matcher.match("Tell me more about it"), ["follow_up", "more"])
+        self.assertEqual(matcher.match("what about Python?"), ["follow_up"])
+        self.assertEqual(matcher.match("tell me about it"), [])
+
+    def test_overlapping_keywords_report_every_label(self):
+        matcher = KeywordMatcher({"data": ["data"], "science": ["data science"]})
+        self.assertEqual(matcher.match("data science projects"), ["data", "science"])
+        self.assertEqual(matcher.match("database"), ["data"])
+
+    def test_labels_come_back_in_declaration_order(self):
+        matcher = KeywordMatcher({"b": ["beta"], "a": ["alpha"], "c": ["gamma"]})
+        self.assertEqual(matcher.match("gamma alpha beta"), ["b", "a", "c"])
+        self.assertEqual(matcher.first("gamma then alpha"), "a")
+        self.assertIsNone(matcher.first("nothing here"))
+
+    def test_whole_words_stops_long_keywords_matching_prefixes(self):
+        matcher = KeywordMatcher({"pronoun": ["them", "these"]}, whole_words=True)
+        self.assertTrue(matcher.matches("what about them?"))
+        self.assertFalse(matcher.matches("themes and theses"))
+
+    def test_matching_ignores_case(self):
+        matcher = KeywordMatcher({"python": ["Python"]})
+        self.assertTrue(matcher.matches("PYTHON developer"))
+
+
+if __name__ == "__main__":
+    unittest.main()
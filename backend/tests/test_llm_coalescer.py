@@ -0,0 +1,72 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from llm_client import LLMClient
+from llm_coalescer import SingleFlightLLM
+
+
+class SlowClient(LLMClient):
+    """Answers after a short delay and counts upstream calls per prompt"""
+
+    model_name = "slow"
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False, system_instruction=None, timeout=None, **kwargs):
+        with self._lock:
+            self.calls[prompt] = self.calls.get(prompt, 0) + 1
+        time.sleep(self.delay)
+        if stream:
+            return iter([SimpleNamespace(text=word) for word in ("one ", "two ", "three")])
+        return SimpleNamespace(text=f"answer to {prompt}")
+
+
+def run_concurrently(fn, arguments):
+    results = [None] * len(arguments)
+
+    def worker(i):
+        results[i] = fn(arguments[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(arguments))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class SingleFlightLLMTest(unittest.TestCase):
+    def setUp(self):
+        self.client = SlowClient()
+        self.llm = SingleFlightLLM(self.client)
+
+    def test_identical_prompts_share_one_call(self):
+        results = run_concurrently(lambda prompt: self.llm.generate_content(prompt).text, ["same"] * 5)
+        self.assertEqual(results, ["answer to same"] * 5)
+        self.assertEqual(self.client.calls, {"same": 1})
+
+    def test_different_prompts_are_not_coalesced(self):
+        run_concurrently(lambda prompt: self.llm.generate_content(prompt), ["a", "b"])
+        self.assertEqual(self.client.calls, {"a": 1, "b": 1})
+
+    def test_sequential_calls_are_not_coalesced(self):
+        self.llm.generate_content("q")
+        self.llm.generate_content("q")
+        self.assertEqual(self.client.calls, {"q": 2})
+
+    def test_stream_subscribers_each_get_every_chunk(self):
+        results = run_concurrently(
+            lambda prompt: "".join(chunk.text for chunk in self.llm.generate_content(prompt, stream=True)),
+            ["streamed"] * 3
+        )
+        self.assertEqual(results, ["one two three"] * 3)
+        self.assertEqual(self.client.calls, {"streamed": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
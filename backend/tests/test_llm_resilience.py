@@ -0,0 +1,83 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+
+from llm_client import LLMClient, LocalLLMClient
+from llm_resilience import LLMTimeout, ResilientLLM
+from llm_scheduler import LLMOverloaded, LLMScheduler, ScheduledLLM
+
+
+class ScriptedClient(LLMClient):
+    """Raises the scripted errors in turn, then answers"""
+
+    model_name = "scripted"
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def generate_content(self, prompt, stream=False, system_instruction=None, timeout=None, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return SimpleNamespace(text=f"answer to {prompt}")
+
+
+def slow_client(latency_ms=5000):
+    return LocalLLMClient(latency_distribution="fixed", latency_ms=latency_ms, error_rate=0)
+
+
+class ResilientLLMTest(unittest.TestCase):
+    def wrap(self, client, **kwargs):
+        options = dict(timeout=2.0, max_retries=2, retry_delay=0.01, hedge_percentile=None)
+        options.update(kwargs)
+        return ResilientLLM(client, **options)
+
+    def test_transient_errors_are_retried(self):
+        client = ScriptedClient([ConnectionError("reset"), ConnectionError("reset")])
+        self.assertEqual(self.wrap(client).generate_content("q").text, "answer to q")
+        self.assertEqual(client.calls, 3)
+
+    def test_overload_is_not_retried(self):
+        client = ScriptedClient([LLMOverloaded("full")])
+        with self.assertRaises(LLMOverloaded):
+            self.wrap(client).generate_content("q")
+        self.assertEqual(client.calls, 1)
+
+    def test_deadline_raises_llm_timeout(self):
+        started = time.monotonic()
+        with self.assertRaises(LLMTimeout):
+            self.wrap(slow_client(), timeout=0.2).generate_content("q")
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_abandoned_attempt_gives_back_its_slot(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        llm = self.wrap(ScheduledLLM(slow_client(), scheduler), timeout=0.2, max_retries=0)
+        with self.assertRaises(LLMTimeout):
+            llm.generate_content("q")
+        # The upstream call times out with the deadline instead of running on
+        deadline = time.monotonic() + 1.0
+        while scheduler.stats()["active"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(scheduler.stats()["active"], 0)
+
+    def test_stalled_stream_raises_llm_timeout(self):
+        with self.assertRaises(LLMTimeout):
+            list(self.wrap(slow_client(), timeout=0.2).generate_content("q", stream=True))
+
+    def test_async_deadline_cancels_the_attempt(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        llm = self.wrap(ScheduledLLM(slow_client(), scheduler), timeout=0.2, max_retries=0)
+
+        async def call():
+            with self.assertRaises(LLMTimeout):
+                await llm.generate_content_async("q")
+            await asyncio.sleep(0.05)
+
+        asyncio.run(call())
+        self.assertEqual(scheduler.stats()["active"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
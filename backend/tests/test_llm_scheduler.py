@@ -0,0 +1,116 @@
+import threading
+import time
+import unittest
+
+from llm_scheduler import LLMOverloaded, LLMScheduler
+
+
+class Waiter(threading.Thread):
+    """Acquires a slot on its own thread and records the outcome"""
+
+    def __init__(self, scheduler, priority_class, order=None):
+        super().__init__(daemon=True)
+        self.scheduler = scheduler
+        self.priority_class = priority_class
+        self.order = order
+        self.outcome = None
+
+    def run(self):
+        try:
+            self.scheduler.acquire(self.priority_class)
+        except LLMOverloaded:
+            self.outcome = "rejected"
+            return
+        self.outcome = "granted"
+        if self.order is not None:
+            self.order.append(self.priority_class)
+        self.scheduler.release()
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.005)
+
+
+class LLMSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = LLMScheduler(max_concurrency=1, queue_limits={"chat": 4, "followup": 4, "title": 4},
+                                      queue_timeout=2.0)
+        # Occupy the only slot so later calls queue
+        self.scheduler.acquire("chat")
+
+    def queued(self, priority_class):
+        return self.scheduler.stats()["queued"][priority_class]
+
+    def test_lower_priority_call_is_shed_for_a_chat_answer(self):
+        title = Waiter(self.scheduler, "title")
+        title.start()
+        wait_until(lambda: self.queued("title") == 1)
+
+        chat = Waiter(self.scheduler, "chat")
+        chat.start()
+        title.join(timeout=1)
+        self.assertEqual(title.outcome, "rejected")
+
+        self.scheduler.release()
+        chat.join(timeout=1)
+        self.assertEqual(chat.outcome, "granted")
+        self.assertEqual(self.scheduler.stats()["active"], 0)
+
+    def test_chat_is_never_shed_for_a_lower_class(self):
+        chat = Waiter(self.scheduler, "chat")
+        chat.start()
+        wait_until(lambda: self.queued("chat") == 1)
+
+        followup = Waiter(self.scheduler, "followup")
+        followup.start()
+        wait_until(lambda: self.queued("followup") == 1)
+        self.assertIsNone(chat.outcome)
+
+        self.scheduler.release()
+        chat.join(timeout=1)
+        followup.join(timeout=1)
+        self.assertEqual((chat.outcome, followup.outcome), ("granted", "granted"))
+
+    def test_lowest_class_is_shed_and_the_rest_served_by_priority(self):
+        order = []
+        followup = Waiter(self.scheduler, "followup", order)
+        followup.start()
+        wait_until(lambda: self.queued("followup") == 1)
+        title = Waiter(self.scheduler, "title", order)
+        title.start()
+        wait_until(lambda: self.queued("title") == 1)
+        chat = Waiter(self.scheduler, "chat", order)
+        chat.start()
+        title.join(timeout=1)
+        self.assertEqual(title.outcome, "rejected")
+
+        self.scheduler.release()
+        chat.join(timeout=1)
+        followup.join(timeout=1)
+        self.assertEqual(order, ["chat", "followup"])
+
+    def test_full_class_queue_rejects_at_once(self):
+        scheduler = LLMScheduler(max_concurrency=1, queue_limits={"title": 0})
+        scheduler.acquire("chat")
+        started = time.monotonic()
+        with self.assertRaises(LLMOverloaded):
+            scheduler.acquire("title")
+        self.assertLess(time.monotonic() - started, 0.5)
+        scheduler.release()
+
+    def test_queue_timeout_rejects_and_frees_the_queue_place(self):
+        with self.assertRaises(LLMOverloaded):
+            self.scheduler.acquire("chat", timeout=0.05)
+        self.assertEqual(self.queued("chat"), 0)
+        self.scheduler.release()
+        self.scheduler.acquire("chat", timeout=0.1)
+        self.scheduler.release()
+        self.assertEqual(self.scheduler.stats()["active"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from langchain_core.documents import Document
+
+from config import CONVERSATION_TOKEN_BUDGET
+from prompt_builder import SYSTEM_INSTRUCTION, build_chat_prompt, is_follow_up
+
+
+def doc(name, tokens):
+    # estimate_tokens counts about 4 characters per token
+    return Document(page_content=(name + " ") * (tokens * 4 // (len(name) + 1)), metadata={"name": name})
+
+
+def names(docs):
+    return [d.metadata["name"] for d in docs]
+
+
+class FollowUpTest(unittest.TestCase):
+    def test_phrases_count(self):
+        for message in ("Tell me more", "tell me more about the robot", "What about his internship?",
+                        "and the second one?"):
+            with self.subTest(message=message):
+                self.assertTrue(is_follow_up(message))
+
+    def test_pronouns_count_as_whole_words_only(self):
+        self.assertTrue(is_follow_up("Did he win?"))
+        self.assertTrue(is_follow_up("Was it hard?"))
+        self.assertFalse(is_follow_up("Which themes does Arvind research?"))
+        self.assertFalse(is_follow_up("Hello there"))
+
+    def test_only_the_first_words_are_checked(self):
+        self.assertFalse(is_follow_up("Which university did Arvind attend and why?"))
+        self.assertTrue(is_follow_up("Which university did he attend?"))
+
+    def test_unrelated_questions_are_not_follow_ups(self):
+        self.assertFalse(is_follow_up("What is Arvind's GPA?"))
+        self.assertFalse(is_follow_up(""))
+
+
+class BuildChatPromptTest(unittest.TestCase):
+    def setUp(self):
+        self.base = build_chat_prompt("Which robots?", []).tokens["total"]
+
+    def test_everything_fits_a_roomy_budget(self):
+        docs = [doc("alpha", 100), doc("beta", 100)]
+        prompt = build_chat_prompt("Which robots?", docs, budget=self.base + 500)
+        self.assertEqual(names(prompt.docs), ["alpha", "beta"])
+        self.assertEqual(prompt.system_instruction, SYSTEM_INSTRUCTION)
+        self.assertNotIn(SYSTEM_INSTRUCTION, prompt.text)
+        self.assertLessEqual(prompt.tokens["total"], self.base + 500)
+
+    def test_first_doc_over_budget_is_cut_and_the_rest_dropped(self):
+        docs = [doc("alpha", 400), doc("beta", 400), doc("gamma", 400)]
+        prompt = build_chat_prompt("Which robots?", docs, budget=self.base + 650)
+        self.assertEqual(names(prompt.docs), ["alpha", "beta"])
+        self.assertIn("Context 2:", prompt.text)
+        self.assertNotIn("Context 3:", prompt.text)
+        self.assertTrue(prompt.text.split("Context 2:")[1].split("\nQuestion:")[0].rstrip().endswith("..."))
+        self.assertLessEqual(prompt.tokens["total"], self.base + 650)
+
+    def test_small_remainder_drops_the_doc_instead_of_cutting_it(self):
+        docs = [doc("alpha", 400), doc("beta", 400)]
+        prompt = build_chat_prompt("Which robots?", docs, budget=self.base + 430)
+        self.assertEqual(names(prompt.docs), ["alpha"])
+        self.assertNotIn("Context 2:", prompt.text)
+
+    def test_conversation_keeps_the_newest_messages(self):
+        messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "x" * 180}
+                    for i in range(20)]
+        prompt = build_chat_prompt("And then?", [], recent_messages=messages)
+        self.assertIn("message 19 ", prompt.text)
+        self.assertNotIn("message 0 ", prompt.text)
+        self.assertLessEqual(prompt.tokens["conversation"], CONVERSATION_TOKEN_BUDGET)
+        # Oldest kept message first
+        self.assertLess(prompt.text.index("message 18 "), prompt.text.index("message 19 "))
+
+    def test_query_context_adds_a_focus_instruction(self):
+        prompt = build_chat_prompt("Which robots?", [], query_context="computer_vision")
+        self.assertIn("specifically about Arvind's computer vision work", prompt.text)
+        self.assertGreater(prompt.tokens["instructions"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
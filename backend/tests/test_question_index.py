@@ -0,0 +1,51 @@
+import unittest
+
+from question_index import QuestionIndex, normalize_question
+
+
+class NormalizeQuestionTest(unittest.TestCase):
+    def test_case_punctuation_and_stopwords_are_dropped(self):
+        self.assertEqual(normalize_question("What is Arvind's GPA?"), "what arvind gpa")
+        self.assertEqual(normalize_question("  what   ARVIND gpa!!"), "what arvind gpa")
+
+    def test_question_of_only_stopwords_keeps_them(self):
+        self.assertEqual(normalize_question("Can you tell me?"), "can you tell me")
+
+    def test_empty_question(self):
+        self.assertEqual(normalize_question("?!"), "")
+
+
+class QuestionIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = QuestionIndex()
+        self.index.add("What is Arvind's GPA?", "3.9", category="education")
+
+    def test_rephrased_punctuation_case_and_stopwords_hit(self):
+        for question in ("what is arvind's gpa", "WHAT IS ARVIND'S GPA???", "Could you tell me what Arvind's GPA is?"):
+            with self.subTest(question=question):
+                answer = self.index.lookup(question)
+                self.assertEqual(answer["response"], "3.9")
+                self.assertEqual(answer["sources"], [{"source": "dataset", "category": "education"}])
+
+    def test_near_miss_does_not_hit(self):
+        self.assertIsNone(self.index.lookup("What was Arvind's GPA in high school?"))
+        self.assertIsNone(self.index.lookup("What is Arvind's major?"))
+
+    def test_first_answer_wins(self):
+        self.index.add("what is arvind gpa", "4.0")
+        self.assertEqual(self.index.lookup("What is Arvind's GPA?")["response"], "3.9")
+
+    def test_questions_without_content_are_not_indexed(self):
+        self.assertFalse(self.index.add("", "answer"))
+        self.assertFalse(self.index.add("?!", "answer"))
+        self.assertFalse(self.index.add("Where does he live?", ""))
+        self.assertEqual(len(self.index), 1)
+
+    def test_stats_count_hits_and_misses(self):
+        self.index.lookup("what is arvind gpa")
+        self.index.lookup("something else")
+        self.assertEqual(self.index.stats(), {"size": 1, "hits": 1, "misses": 1, "hit_rate": 0.5})
+
+
+if __name__ == "__main__":
+    unittest.main()
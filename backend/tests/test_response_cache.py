@@ -0,0 +1,108 @@
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import app
+from question_index import QuestionIndex
+from response_cache import SemanticResponseCache
+
+
+class StubEmbedder:
+    """Embeds each known question as a fixed vector and counts the calls"""
+
+    VECTORS = {
+        "What is Arvind's GPA?": [1.0, 0.0, 0.0],
+        "what's arvind's gpa": [0.99, 0.14, 0.0],
+        "Where did Arvind intern?": [0.6, 0.8, 0.0],
+        "Which robots has he built?": [0.0, 0.0, 1.0],
+    }
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self.VECTORS[text]
+
+
+def answer(text):
+    return {"response": text, "sources": []}
+
+
+class SemanticResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.embed = StubEmbedder().embed_query
+        self.cache = SemanticResponseCache(threshold=0.95, max_entries=2, ttl=3600)
+        self.cache.store(self.embed("What is Arvind's GPA?"), "education", 1, answer("3.9"))
+
+    def test_near_duplicate_above_the_threshold_hits(self):
+        hit = self.cache.lookup(self.embed("what's arvind's gpa"), "education", 1)
+        self.assertEqual(hit["response"], "3.9")
+        self.assertGreaterEqual(hit["similarity"], 0.95)
+
+    def test_related_question_below_the_threshold_misses(self):
+        self.assertIsNone(self.cache.lookup(self.embed("Where did Arvind intern?"), "education", 1))
+
+    def test_entries_are_scoped_by_context_and_generation(self):
+        vector = self.embed("What is Arvind's GPA?")
+        self.assertIsNone(self.cache.lookup(vector, "experience", 1))
+        self.assertIsNone(self.cache.lookup(vector, "education", 2))
+
+    def test_expired_entries_are_not_served(self):
+        cache = SemanticResponseCache(threshold=0.95, ttl=0.05)
+        vector = self.embed("What is Arvind's GPA?")
+        cache.store(vector, None, 1, answer("3.9"))
+        time.sleep(0.1)
+        self.assertIsNone(cache.lookup(vector, None, 1))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.store(self.embed("Where did Arvind intern?"), "education", 1, answer("Acme"))
+        # Reading the GPA answer makes the internship answer the oldest
+        self.assertIsNotNone(self.cache.lookup(self.embed("What is Arvind's GPA?"), "education", 1))
+        self.cache.store(self.embed("Which robots has he built?"), "education", 1, answer("Many"))
+        self.assertEqual(self.cache.stats()["size"], 2)
+        self.assertIsNone(self.cache.lookup(self.embed("Where did Arvind intern?"), "education", 1))
+        self.assertIsNotNone(self.cache.lookup(self.embed("What is Arvind's GPA?"), "education", 1))
+
+    def test_invalidate_keeps_one_generation(self):
+        self.cache.store(self.embed("Which robots has he built?"), "robotics", 2, answer("Many"))
+        self.cache.invalidate(keep_generation=2)
+        self.assertIsNone(self.cache.lookup(self.embed("What is Arvind's GPA?"), "education", 1))
+        self.assertIsNotNone(self.cache.lookup(self.embed("Which robots has he built?"), "robotics", 2))
+
+
+class LookupCachedResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.embedder = StubEmbedder()
+        self.chain = {
+            "vectorstore": SimpleNamespace(embeddings=self.embedder),
+            "question_index": QuestionIndex(),
+            "generation": 1,
+        }
+        self.cache = SemanticResponseCache(threshold=0.95)
+        self.cache.store([1.0, 0.0, 0.0], "education", 1, answer("3.9"))
+        patcher = mock.patch.object(app, "response_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_turn_is_served_from_the_cache(self):
+        cached, query_vector = app.lookup_cached_response(self.chain, "what's arvind's gpa", "education", False)
+        self.assertEqual(cached["response"], "3.9")
+        self.assertEqual(query_vector, StubEmbedder.VECTORS["what's arvind's gpa"])
+
+    def test_later_turns_skip_the_semantic_cache(self):
+        cached, query_vector = app.lookup_cached_response(self.chain, "what's arvind's gpa", "education", True)
+        self.assertEqual((cached, query_vector), (None, None))
+        self.assertEqual(self.embedder.calls, 0)
+
+    def test_exact_dataset_question_hits_on_any_turn(self):
+        self.chain["question_index"].add("What is Arvind's GPA?", "3.9 out of 4")
+        cached, query_vector = app.lookup_cached_response(self.chain, "what is arvind's gpa", "education", True)
+        self.assertEqual(cached["response"], "3.9 out of 4")
+        self.assertIsNone(query_vector)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from session_cache import SessionBusy, SessionCache
+
+
+def make_session(session_id="s1", version=0):
+    return SimpleNamespace(session_id=session_id, version=version,
+                           messages=[{"id": "m1", "role": "user", "content": "hi"}], metadata={})
+
+
+class CountingLoader:
+    """Stands in for the database: returns the stored session and counts reads"""
+
+    def __init__(self, session):
+        self.session = session
+        self.loads = 0
+
+    def __call__(self, session_id):
+        self.loads += 1
+        return self.session if session_id == self.session.session_id else None
+
+
+class SessionLockTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = SessionCache(CountingLoader(make_session()))
+
+    def test_turns_in_one_session_run_one_at_a_time(self):
+        inside, overlaps = [0], []
+
+        def turn():
+            lock = self.cache.lock("s1", timeout=5)
+            try:
+                inside[0] += 1
+                overlaps.append(inside[0])
+                time.sleep(0.01)
+                inside[0] -= 1
+            finally:
+                lock.release()
+
+        threads = [threading.Thread(target=turn) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [1] * 8)
+        self.assertEqual(self.cache.stats()["locked_sessions"], 0)
+
+    def test_other_sessions_are_not_blocked(self):
+        lock = self.cache.lock("s1")
+        try:
+            self.cache.lock("s2", timeout=0.1).release()
+        finally:
+            lock.release()
+
+    def test_busy_session_times_out(self):
+        lock = self.cache.lock("s1")
+        try:
+            with self.assertRaises(SessionBusy):
+                self.cache.lock("s1", timeout=0.05)
+        finally:
+            lock.release()
+        self.assertEqual(self.cache.stats()["locked_sessions"], 0)
+
+    def test_release_is_idempotent(self):
+        lock = self.cache.lock("s1")
+        lock.release()
+        lock.release()
+        self.cache.lock("s1", timeout=0.1).release()
+
+    def test_async_turns_share_the_threaded_lock(self):
+        lock = self.cache.lock("s1")
+
+        async def contend():
+            with self.assertRaises(SessionBusy):
+                await self.cache.lock_async("s1", timeout=0.05)
+            threading.Timer(0.05, lock.release).start()
+            (await self.cache.lock_async("s1", timeout=2)).release()
+
+        asyncio.run(contend())
+        self.assertEqual(self.cache.stats()["locked_sessions"], 0)
+
+
+class SessionVersionTest(unittest.TestCase):
+    def setUp(self):
+        self.loader = CountingLoader(make_session(version=3))
+        self.cache = SessionCache(self.loader)
+
+    def test_expected_version_keeps_the_session_cached(self):
+        session = self.cache.get("s1")
+        session.messages.append({"id": "m2", "role": "assistant", "content": "hello"})
+        self.cache.store(session, 4)
+        cached = self.cache.get("s1")
+        self.assertEqual(self.loader.loads, 1)
+        self.assertEqual(cached.version, 4)
+        self.assertEqual(len(cached.messages), 2)
+
+    def test_unexpected_version_invalidates(self):
+        session = self.cache.get("s1")
+        # Another worker wrote version 4 in between
+        self.cache.store(session, 5)
+        self.cache.get("s1")
+        self.assertEqual(self.loader.loads, 2)
+
+    def test_failed_write_invalidates(self):
+        session = self.cache.get("s1")
+        self.cache.store(session, None)
+        self.cache.get("s1")
+        self.assertEqual(self.loader.loads, 2)
+
+    def test_callers_get_working_copies(self):
+        session = self.cache.get("s1")
+        session.messages.append({"id": "m2", "role": "user", "content": "unsaved"})
+        session.metadata["unsaved"] = True
+        cached = self.cache.get("s1")
+        self.assertEqual(len(cached.messages), 1)
+        self.assertNotIn("unsaved", cached.metadata)
+
+    def test_missing_session(self):
+        self.assertIsNone(self.cache.get("missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
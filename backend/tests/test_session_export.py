@@ -0,0 +1,158 @@
+import gzip
+import json
+import os
+import time
+import unittest
+
+from session_export import export_query, export_sessions, gzip_stream, parse_timestamp, session_markdown
+from session_store import decode_cursor, encode_cursor
+
+
+class FakeCursor:
+    """A find() cursor over ready-made sessions that records how it was shaped"""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.sort_keys = self.batch = self.limit_count = None
+        self.closed = False
+
+    def sort(self, keys):
+        self.sort_keys = keys
+        return self
+
+    def batch_size(self, size):
+        self.batch = size
+        return self
+
+    def limit(self, count):
+        self.limit_count = count
+        return self
+
+    def __iter__(self):
+        return iter(self.sessions[:self.limit_count])
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCollection:
+    def __init__(self, sessions):
+        self.cursor = FakeCursor(sessions)
+        self.queries = []
+
+    def find(self, query, projection):
+        self.queries.append((query, projection))
+        return self.cursor
+
+
+def make_sessions(count):
+    return [{
+        "session_id": f"s{i}", "title": f"Chat {i}", "created_at": "2024-05-01T09:00:00",
+        "updated_at": f"2024-05-0{i + 1}T10:00:00",
+        "messages": [{"role": "user", "content": f"question {i}"}, {"role": "assistant", "content": "ünïcode answer"}]
+    } for i in range(count)]
+
+
+class ExportSessionsTest(unittest.TestCase):
+    def test_ndjson_is_one_session_per_line_then_a_trailer(self):
+        collection = FakeCollection(make_sessions(3))
+        lines = list(export_sessions(collection, "ndjson", {}, limit=5, batch_size=2))
+        self.assertTrue(all(line.endswith("\n") and line.count("\n") == 1 for line in lines))
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([record["session_id"] for record in records[:3]], ["s0", "s1", "s2"])
+        self.assertEqual(records[1]["messages"][1]["content"], "ünïcode answer")
+        self.assertEqual(records[3], {"export": {"sessions": 3, "next_token": None}})
+        self.assertEqual(collection.cursor.batch, 2)
+        self.assertTrue(collection.cursor.closed)
+
+    def test_limit_ends_with_a_token_after_the_last_session(self):
+        collection = FakeCollection(make_sessions(3))
+        lines = list(export_sessions(collection, "ndjson", {}, limit=2))
+        trailer = json.loads(lines[-1])["export"]
+        self.assertEqual(trailer["sessions"], 2)
+        self.assertEqual(decode_cursor(trailer["next_token"]), ("2024-05-02T10:00:00", "s1"))
+        # One extra session is read to learn whether more remain
+        self.assertEqual(collection.cursor.limit_count, 3)
+
+    def test_markdown_output(self):
+        collection = FakeCollection(make_sessions(1))
+        text = "".join(export_sessions(collection, "markdown", {}, limit=5))
+        self.assertEqual(text, (
+            "# Chat 0\n\nCreated: 2024-05-01T09:00:00\n\n"
+            "**User**: question 0\n\n---\n\n"
+            "**Pasupathy**: ünïcode answer\n\n---\n\n"
+            "<!-- exported: 1, next_token:  -->\n"
+        ))
+
+    def test_markdown_defaults_for_sparse_sessions(self):
+        self.assertEqual("".join(session_markdown({})), "# New Chat\n\nCreated: \n\n")
+
+    def test_cursor_is_closed_when_the_client_stops_reading(self):
+        collection = FakeCollection(make_sessions(3))
+        stream = export_sessions(collection, "ndjson", {}, limit=5)
+        next(stream)
+        stream.close()
+        self.assertTrue(collection.cursor.closed)
+
+
+class ExportQueryTest(unittest.TestCase):
+    def test_bounds_and_token_are_combined(self):
+        token = encode_cursor({"updated_at": "2024-05-01T10:00:00", "session_id": "s0"})
+        query = export_query("2024-05-01T00:00:00", "2024-06-01T00:00:00", token)
+        self.assertEqual(query, {"$and": [
+            {"updated_at": {"$gte": "2024-05-01T00:00:00", "$lt": "2024-06-01T00:00:00"}},
+            {"$or": [
+                {"updated_at": {"$gt": "2024-05-01T10:00:00"}},
+                {"updated_at": "2024-05-01T10:00:00", "session_id": {"$gt": "s0"}}
+            ]}
+        ]})
+
+    def test_no_filters(self):
+        self.assertEqual(export_query(), {})
+
+    def test_malformed_token_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            export_query(token="garbage")
+
+
+class ParseTimestampTest(unittest.TestCase):
+    def setUp(self):
+        self.tz = os.environ.get("TZ")
+        os.environ["TZ"] = "Asia/Kolkata"
+        time.tzset()
+
+    def tearDown(self):
+        if self.tz is None:
+            del os.environ["TZ"]
+        else:
+            os.environ["TZ"] = self.tz
+        time.tzset()
+
+    def test_aware_bounds_become_naive_local_time(self):
+        self.assertEqual(parse_timestamp("2024-05-01T10:00:00+00:00"), "2024-05-01T15:30:00")
+        self.assertEqual(parse_timestamp("2024-05-01T10:00:00-04:00"), "2024-05-01T19:30:00")
+
+    def test_naive_values_and_dates_are_kept(self):
+        self.assertEqual(parse_timestamp("2024-05-01T10:00:00"), "2024-05-01T10:00:00")
+        self.assertEqual(parse_timestamp("2024-05-01"), "2024-05-01T00:00:00")
+        self.assertIsNone(parse_timestamp(""))
+
+    def test_invalid_value_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            parse_timestamp("last tuesday")
+
+
+class GzipStreamTest(unittest.TestCase):
+    def test_round_trip(self):
+        chunks = [json.dumps({"n": i, "text": "ünïcode " * 20}) + "\n" for i in range(500)]
+        compressed = list(gzip_stream(chunks, flush_bytes=4096))
+        # Output is emitted while the input streams, not only at the end
+        self.assertGreater(len(compressed), 2)
+        self.assertEqual(gzip.decompress(b"".join(compressed)).decode("utf-8"), "".join(chunks))
+
+    def test_empty_stream_is_a_valid_gzip_file(self):
+        self.assertEqual(gzip.decompress(b"".join(gzip_stream([]))), b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
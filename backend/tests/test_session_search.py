@@ -0,0 +1,87 @@
+import unittest
+
+from session_search import SessionSearch, highlight_spans, make_snippet, query_stems, query_terms
+
+
+class QueryParsingTest(unittest.TestCase):
+    def test_terms_drop_stopwords_negations_and_repeats(self):
+        self.assertEqual(query_terms("What are the Robotics projects -draft robotics?"), ["robotics", "projects"])
+
+    def test_contractions_split_into_stopwords(self):
+        self.assertEqual(query_terms("Why didn't it compile"), ["compile"])
+
+    def test_words_mongo_still_indexes_are_kept(self):
+        # Stopwords of the question index, but not of the text index
+        self.assertEqual(query_terms("tell me please"), ["tell", "please"])
+
+    def test_stems_merge_inflections(self):
+        self.assertEqual(query_stems("training trained trains"), ["train"])
+        self.assertEqual(query_stems("studies"), ["studi"])
+
+    def test_query_of_only_stopwords_has_no_terms(self):
+        self.assertEqual(query_terms("what is the"), [])
+        self.assertEqual(query_stems("-excluded"), [])
+
+
+class HighlightTest(unittest.TestCase):
+    def test_words_with_a_query_stem_are_highlighted(self):
+        text = "He trained models; training took days."
+        spans = highlight_spans(text, query_stems("train"))
+        self.assertEqual([text[s:e] for s, e in spans], ["trained", "training"])
+
+    def test_words_sharing_only_a_prefix_are_not_highlighted(self):
+        self.assertEqual(highlight_spans("trainee trailer", query_stems("train")), [])
+
+    def test_matching_ignores_case(self):
+        self.assertEqual(highlight_spans("ROBOTS and Gears", query_stems("robot")), [(0, 6)])
+
+    def test_no_stems_no_highlights(self):
+        self.assertEqual(highlight_spans("anything", []), [])
+
+    def test_snippet_offsets_follow_the_window(self):
+        text = "filler " * 40 + "the robot arm" + " filler" * 40
+        spans = highlight_spans(text, query_stems("robot"))
+        snippet = make_snippet(text, spans, width=60)
+        self.assertTrue(snippet["text"].startswith("...") and snippet["text"].endswith("..."))
+        (start, end), = snippet["highlights"]
+        self.assertEqual(snippet["text"][start:end], "robot")
+
+
+class FakeCollection:
+    """Answers the search aggregation with a canned $facet result"""
+
+    def __init__(self, facets):
+        self.facets = facets
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return iter(self.facets)
+
+
+class SessionSearchTest(unittest.TestCase):
+    def test_page_and_total_come_from_one_aggregation(self):
+        collection = FakeCollection([{
+            "sessions": [{"session_id": "s1", "title": "Robot arm", "score": 1.5, "messages": [
+                {"id": "m1", "role": "user", "content": "Tell me about the robot"},
+                {"id": "m2", "role": "assistant", "content": "Robots, robots and a robot arm"},
+                {"id": "m3", "role": "user", "content": "Nothing relevant here"},
+            ]}],
+            "total": [{"count": 12}]
+        }])
+        results, total = SessionSearch(collection, snippets_per_session=2).search("robots", page=2, limit=5)
+        self.assertEqual(total, 12)
+        self.assertEqual(len(collection.pipelines), 1)
+        facet = collection.pipelines[0][-1]["$facet"]["sessions"]
+        self.assertEqual((facet[1], facet[2]), ({"$skip": 5}, {"$limit": 5}))
+        session, = results
+        self.assertEqual(session["title_highlights"], [[0, 5]])
+        self.assertEqual([hit["message_id"] for hit in session["hits"]], ["m2", "m1"])
+
+    def test_no_matches(self):
+        collection = FakeCollection([{"sessions": [], "total": []}])
+        self.assertEqual(SessionSearch(collection).search("nothing"), ([], 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+import mongomock
+
+from session_store import SessionStore, append_write, decode_cursor, edit_write, encode_cursor, replace_write
+
+
+class CursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        cursor = encode_cursor({"updated_at": "2024-05-01T10:00:00", "session_id": "abc", "title": "ignored"})
+        self.assertEqual(decode_cursor(cursor), ("2024-05-01T10:00:00", "abc"))
+
+    def test_malformed_cursors_raise_value_error(self):
+        for cursor in ("not base64 at all!", "bm90IGpzb24=", encode_cursor({"updated_at": 1, "session_id": 2})[:-4],
+                       "WyJvbmx5IG9uZSJd"):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+class ListSummariesTest(unittest.TestCase):
+    def setUp(self):
+        self.collection = mongomock.MongoClient().db.chat_sessions
+        self.store = SessionStore(self.collection)
+        # Several sessions share an updated_at, so pages must break ties by session_id
+        for session_id, updated_at in [("a", "2024-05-01T10:00"), ("b", "2024-05-03T10:00"),
+                                       ("c", "2024-05-02T10:00"), ("d", "2024-05-02T10:00"),
+                                       ("e", "2024-05-02T10:00"), ("f", "2024-05-03T10:00"),
+                                       ("g", "2024-04-30T10:00")]:
+            self.collection.insert_one({"session_id": session_id, "title": session_id, "updated_at": updated_at,
+                                        "created_at": updated_at, "message_count": 2, "preview": "hi",
+                                        "messages": [{"id": "m1", "content": "hi"}]})
+
+    def all_pages(self, limit):
+        pages, cursor = [], None
+        while True:
+            sessions, cursor = self.store.list_summaries(limit, cursor)
+            pages.append([session["session_id"] for session in sessions])
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_every_session_once_in_order(self):
+        for limit in (1, 2, 3, 7):
+            with self.subTest(limit=limit):
+                pages = self.all_pages(limit)
+                self.assertEqual([sid for page in pages for sid in page], ["f", "b", "e", "d", "c", "a", "g"])
+                self.assertTrue(all(pages))
+
+    def test_pages_split_inside_a_tie(self):
+        self.assertEqual(self.all_pages(3), [["f", "b", "e"], ["d", "c", "a"], ["g"]])
+
+    def test_summaries_leave_out_the_messages(self):
+        sessions, _ = self.store.list_summaries(1)
+        self.assertEqual(set(sessions[0]), {"session_id", "title", "created_at", "updated_at",
+                                            "message_count", "preview"})
+
+    def test_sessions_without_summary_fields_get_defaults(self):
+        self.collection.insert_one({"session_id": "z", "title": "old", "updated_at": "2024-06-01T10:00",
+                                    "created_at": "2024-06-01T10:00"})
+        sessions, _ = self.store.list_summaries(1)
+        self.assertEqual((sessions[0]["message_count"], sessions[0]["preview"]), (0, ""))
+
+    def test_malformed_cursor_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.store.list_summaries(2, "garbage")
+
+
+def make_session(session_id="s1"):
+    return SimpleNamespace(session_id=session_id, title="New Chat", created_at=datetime(2024, 5, 1, 9, 0),
+                           metadata={"context": "general", "last_sources": []})
+
+
+def message(message_id, content, role="user"):
+    return {"id": message_id, "role": role, "content": content}
+
+
+class SessionWriteTest(unittest.TestCase):
+    def test_append_pushes_the_messages_and_upserts(self):
+        write = append_write(make_session(), [message("m1", "Hi"), message("m2", "Hello   there", "assistant")],
+                             fields={"metadata.last_sources": ["cv.pdf"]})
+        self.assertEqual((write.operation, write.query, write.upsert), ("append", {"session_id": "s1"}, True))
+        self.assertEqual(write.update["$push"], {"messages": {"$each": [message("m1", "Hi"),
+                                                                        message("m2", "Hello   there", "assistant")]}})
+        self.assertEqual(write.update["$inc"], {"message_count": 2, "version": 1})
+        self.assertEqual(write.update["$set"]["preview"], "Hello there")
+        self.assertEqual(write.update["$set"]["metadata.last_sources"], ["cv.pdf"])
+        self.assertIn("updated_at", write.update["$set"])
+        # Defaults only for fields the update doesn't $set
+        self.assertEqual(write.update["$setOnInsert"], {"created_at": "2024-05-01T09:00:00", "title": "New Chat",
+                                                        "metadata.context": "general"})
+
+    def test_append_with_a_title_leaves_it_out_of_the_insert_defaults(self):
+        write = append_write(make_session(), [message("m1", "Hi")], fields={"title": "Robots"})
+        self.assertNotIn("title", write.update["$setOnInsert"])
+        self.assertEqual(write.update["$set"]["title"], "Robots")
+
+    def test_replace_is_guarded_by_the_old_message_id(self):
+        write = replace_write("s1", 3, "m4", message("m5", "Regenerated", "assistant"))
+        self.assertEqual((write.operation, write.upsert), ("replace", False))
+        self.assertEqual(write.query, {"session_id": "s1", "messages.3.id": "m4"})
+        self.assertEqual(write.update["$set"]["messages.3"], message("m5", "Regenerated", "assistant"))
+        self.assertEqual(write.update["$set"]["preview"], "Regenerated")
+        self.assertEqual(write.update["$inc"], {"version": 1})
+
+    def test_edit_is_a_positional_update(self):
+        write = edit_write("s1", "m2", {"content": "Edited", "edited": True}, is_last=True)
+        self.assertEqual(write.query, {"session_id": "s1", "messages.id": "m2"})
+        self.assertEqual(write.update["$set"]["messages.$.content"], "Edited")
+        self.assertEqual(write.update["$set"]["messages.$.edited"], True)
+        self.assertEqual(write.update["$set"]["preview"], "Edited")
+        self.assertEqual(write.update["$inc"], {"version": 1})
+
+    def test_editing_an_earlier_message_keeps_the_preview(self):
+        write = edit_write("s1", "m1", {"content": "Edited"})
+        self.assertNotIn("preview", write.update["$set"])
+
+
+class SessionStoreWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.collection = mongomock.MongoClient().db.chat_sessions
+        self.store = SessionStore(self.collection)
+        self.session = make_session()
+
+    def stored(self):
+        return self.collection.find_one({"session_id": "s1"}, {"_id": 0})
+
+    def test_versions_count_every_write(self):
+        self.assertEqual(self.store.append_messages(self.session, [message("m1", "Hi")]), 1)
+        self.assertEqual(self.store.append_messages(self.session, [message("m2", "Hello", "assistant")]), 2)
+        self.assertEqual(self.store.update_message("s1", "m1", {"content": "Hi!"}), 3)
+        stored = self.stored()
+        self.assertEqual((stored["version"], stored["message_count"]), (3, 2))
+        self.assertEqual(stored["messages"][0]["content"], "Hi!")
+        self.assertEqual(stored["metadata"], {"context": "general", "last_sources": []})
+
+    def test_stale_replace_changes_nothing(self):
+        self.store.append_messages(self.session, [message("m1", "Hi"), message("m2", "Hello", "assistant")])
+        self.assertEqual(self.store.replace_last_message("s1", 1, "m2", message("m3", "Hey", "assistant")), 2)
+        # A second regenerate still expecting m2 lost the race
+        self.assertIsNone(self.store.replace_last_message("s1", 1, "m2", message("m4", "Yo", "assistant")))
+        stored = self.stored()
+        self.assertEqual((stored["version"], stored["messages"][1]["id"]), (2, "m3"))
+
+    def test_edit_of_a_missing_message_changes_nothing(self):
+        self.store.append_messages(self.session, [message("m1", "Hi")])
+        self.assertIsNone(self.store.update_message("s1", "missing", {"content": "x"}))
+        self.assertEqual(self.stored()["version"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
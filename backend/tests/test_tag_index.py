@@ -0,0 +1,95 @@
+import unittest
+from unittest import mock
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+import llm_model
+from index_factory import search_parameters
+from tag_index import TagIndex
+
+
+class TagIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tags = TagIndex(capacity=4)
+        self.tags.add_many(0, [{"robotics"}, {"education"}, {"robotics", "projects"}, set()])
+
+    def test_bitmaps_record_each_id(self):
+        self.assertEqual([self.tags.contains("robotics", i) for i in range(4)], [True, False, True, False])
+        self.assertEqual(self.tags.count("robotics"), 2)
+        self.assertFalse(self.tags.contains("robotics", 100))
+        self.assertFalse(self.tags.contains("unknown", 0))
+
+    def test_bitmaps_grow_past_the_initial_capacity(self):
+        self.tags.add(20, ["robotics"])
+        self.assertTrue(self.tags.contains("robotics", 20))
+        self.assertTrue(self.tags.contains("robotics", 2))
+        self.assertEqual(self.tags.count("robotics"), 3)
+
+    def test_tagging_an_id_twice_counts_it_once(self):
+        self.tags.add(0, ["robotics"])
+        self.assertEqual(self.tags.stats(), {"robotics": 2, "education": 1, "projects": 1})
+
+    def test_no_selector_for_an_unused_tag(self):
+        self.assertIsNone(self.tags.selector("research"))
+
+    def test_selector_maps_to_the_tagged_faiss_ids(self):
+        for i in range(4, 12):
+            self.tags.add(i, ["robotics"] if i % 3 == 0 else [])
+        expected = [i for i in range(12) if self.tags.contains("robotics", i)]
+
+        index = faiss.IndexFlatL2(2)
+        index.add(np.asarray([[float(i), 0.0] for i in range(12)], dtype=np.float32))
+        params = search_parameters(index, self.tags.selector("robotics"))
+        _, ids = index.search(np.asarray([[0.0, 0.0]], dtype=np.float32), 12, params=params)
+        self.assertEqual(sorted(int(i) for i in ids[0] if i != -1), expected)
+
+    def test_selector_is_a_snapshot(self):
+        selector = self.tags.selector("education")
+        self.tags.add_many(4, [{"education"}] * 20)
+        self.assertTrue(selector.is_member(1))
+        self.assertFalse(selector.is_member(0))
+
+
+def doc(chunk_id):
+    return Document(page_content=f"text of {chunk_id}", metadata={"chunk_id": chunk_id})
+
+
+class ContextFilteredDocsTest(unittest.TestCase):
+    def search_returning(self, filtered, unfiltered):
+        def search(qa_chain, query, k, context_filter=None):
+            return [doc(chunk_id) for chunk_id in (filtered if context_filter else unfiltered)][:k]
+        patcher = mock.patch.object(llm_model, "_hybrid_search", side_effect=search)
+        hybrid_search = patcher.start()
+        self.addCleanup(patcher.stop)
+        return hybrid_search
+
+    def chunk_ids(self, docs):
+        return [d.metadata["chunk_id"] for d in docs]
+
+    def test_enough_filtered_docs_skip_the_top_up(self):
+        hybrid_search = self.search_returning(["a", "b", "c"], ["x", "y", "z"])
+        docs = llm_model.get_context_filtered_docs({}, "q", context_filter="robotics", k=3)
+        self.assertEqual(self.chunk_ids(docs), ["a", "b", "c"])
+        self.assertEqual(hybrid_search.call_count, 1)
+
+    def test_top_up_adds_unfiltered_docs_without_duplicates(self):
+        self.search_returning(["a", "b"], ["b", "x", "a", "y", "z"])
+        docs = llm_model.get_context_filtered_docs({}, "q", context_filter="robotics", k=4)
+        self.assertEqual(self.chunk_ids(docs), ["a", "b", "x", "y"])
+
+    def test_top_up_stops_when_the_unfiltered_docs_run_out(self):
+        self.search_returning([], ["a", "b"])
+        docs = llm_model.get_context_filtered_docs({}, "q", context_filter="research", k=5)
+        self.assertEqual(self.chunk_ids(docs), ["a", "b"])
+
+    def test_no_filter_searches_once(self):
+        hybrid_search = self.search_returning(["a"], ["x", "y"])
+        docs = llm_model.get_context_filtered_docs({}, "q", k=5)
+        self.assertEqual(self.chunk_ids(docs), ["x", "y"])
+        self.assertEqual(hybrid_search.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Title Worker
+Generates creative session titles in the background. The chat response goes out
+with a local placeholder title, which is patched once the LLM title is ready.
+"""
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from metrics import metrics
+from question_index import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9+#.-]*")
+_FILLER_WORDS = frozenset({
+    "what", "which", "who", "whom", "where", "when", "why", "how", "has", "have", "had",
+    "he", "his", "him", "she", "her", "they", "their", "it", "its", "i", "my", "any", "some"
+})
+
+
+def placeholder_title(user_message: str, query_context: Optional[str] = None, max_words: int = 4) -> str:
+    """Instant title from the query context and the message's leading keywords"""
+    label = query_context.replace('_', ' ').title() if query_context else ""
+    label_words = set(label.lower().split())
+    keywords = []
+    for word in _WORD_RE.findall(user_message):
+        lowered = word.lower().rstrip(".")
+        if lowered in STOPWORDS or lowered in _FILLER_WORDS or lowered in label_words:
+            continue
+        keywords.append(word.rstrip(".") if word.isupper() else word.rstrip(".").capitalize())
+        if len(keywords) >= max_words:
+            break
+    if label:
+        title = f"{label}: {' '.join(keywords[:max_words - 1])}" if keywords else label
+    else:
+        title = " ".join(keywords)
+    if not title:
+        title = user_message[:40] + ("..." if len(user_message) > 40 else "")
+    return title if len(title) <= 50 else title[:47] + "..."
+
+
+class TitleWorker:
+    """Runs title generation on a background thread and hands each title to ``on_title``"""
+
+    def __init__(self, generate_fn: Callable[[str, str, Optional[str]], str],
+                 on_title: Callable[[str, str, str], None], max_pending: int = 100):
+        """
+        Args:
+            generate_fn: (user_message, bot_response, query_context) -> title
+            on_title: (session_id, placeholder, title) -> None, persists the title
+            max_pending: Titles queued beyond this are dropped; the placeholder stays
+        """
+        self._generate_fn = generate_fn
+        self._on_title = on_title
+        self._max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="title-worker")
+
+    def submit(self, session_id: str, placeholder: str, user_message: str,
+               bot_response: str, query_context: Optional[str] = None) -> bool:
+        """Queue title generation for a session. Returns False if the queue is full."""
+        with self._lock:
+            if self._pending >= self._max_pending:
+                metrics.increment("title_worker.dropped")
+                logger.warning(f"⚠️ Title queue full, keeping placeholder for session {session_id}")
+                return False
+            self._pending += 1
+        self._executor.submit(self._run, session_id, placeholder, user_message, bot_response, query_context)
+        return True
+
+    def _run(self, session_id, placeholder, user_message, bot_response, query_context):
+        try:
+            with metrics.timer("title_generation_ms"):
+                title = self._generate_fn(user_message, bot_response, query_context)
+            if title and title != placeholder:
+                self._on_title(session_id, placeholder, title)
+        except Exception as e:
+            logger.error(f"❌ Background title generation failed for session {session_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._pending
@@ -4,7 +4,7 @@ import {
   Pin, ThumbsUp, ThumbsDown, ChevronDown, ChevronUp, Search,
   FileText, Bookmark, MoreVertical, Share2, Printer
 } from 'lucide-react';
-import { sendMessage, sendMessageStream, regenerateResponse, exportSession, generateFollowUpQuestions } from '../services/api';
+import { sendMessage, sendMessageStream, regenerateResponse, exportSession, generateFollowUpQuestions, getSession } from '../services/api';
 import ReactMarkdown from 'react-markdown';
 import { Prism as SyntaxHighlighter } from 'react-syntax-highlighter';
 import { vscDarkPlus } from 'react-syntax-highlighter/dist/esm/styles/prism';
@@ -138,6 +138,8 @@ const ChatInterface = ({ session, onSessionUpdate, onRenameSession }) => {
     try {
       let fullResponse = '';
       let sessionId = session?.session_id;
+      let queryContext = null;
+      let receivedFollowUps = false;
       const currentMessages = [...messages, tempUserMsg];
 
       await sendMessageStream(
@@ -169,19 +171,36 @@ const ChatInterface = ({ session, onSessionUpdate, onRenameSession }) => {
               }));
             }
 
-            // Generate context-aware follow-up questions
-            const queryContext = data.query_context || null;
-            generateFollowUps(userMessage, fullResponse, queryContext);
+            queryContext = data.query_context || null;
             
             if (onSessionUpdate) {
               const updatedSession = {
                 session_id: sessionId,
                 messages: [...currentMessages, assistantMsg],
-                title: session?.title || userMessage.substring(0, 50)
+                title: data.title || session?.title || userMessage.substring(0, 50)
               };
               onSessionUpdate(updatedSession);
+
+              // The creative title is generated in the background; pick it up shortly
+              if (data.title_pending) {
+                setTimeout(async () => {
+                  try {
+                    const result = await getSession(sessionId);
+                    if (result.session?.title && result.session.title !== updatedSession.title) {
+                      onSessionUpdate({ ...updatedSession, title: result.session.title });
+                    }
+                  } catch (error) {
+                    console.error('Title refresh error:', error);
+                  }
+                }, 3000);
+              }
             }
           }
+          // Follow-up suggestions are generated server-side and close the stream
+          if (data.followups) {
+            receivedFollowUps = true;
+            setFollowUpQuestions(data.followups);
+          }
           if (data.error) {
             throw new Error(data.error);
           }
@@ -196,6 +215,11 @@ const ChatInterface = ({ session, onSessionUpdate, onRenameSession }) => {
           signal: controller.signal
         }
       );
+
+      // Older backends (or a dropped final event) still get suggestions
+      if (!receivedFollowUps && fullResponse && !controller.signal.aborted) {
+        generateFollowUps(userMessage, fullResponse, queryContext);
+      }
     } catch (error) {
       if (error.name === 'AbortError') {
         console.log('Request aborted');
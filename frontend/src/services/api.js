@@ -138,6 +138,11 @@ export const getChatSessions = async () => {
   }
 };
 
+export const getSession = async (sessionId) => {
+  const response = await api.get(`/chat/sessions/${sessionId}`, { timeout: 10000 });
+  return response.data;
+};
+
 export const clearChat = async (sessionId) => {
   try {
     if (!sessionId) {